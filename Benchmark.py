@@ -0,0 +1,379 @@
+"""
+Benchmarks for the ledger backend and the table view.
+
+Generates deterministic synthetic ledgers, times the main operations on
+each, and writes the results as JSON:
+
+    python Benchmark.py --sizes 1k,100k --output results.json
+    python Benchmark.py --sizes 1k,100k --compare results.json
+
+Generated ledgers are kept in --workdir and reused by later runs.
+"""
+import argparse
+import csv
+import datetime
+import gc
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import Code_Function as backend
+from ledger import config
+
+# --- Synthetic ledger generator ---
+# (category, type, share of rows, median amount, spread, merchants)
+CATEGORIES = [
+    ('Food', 'Expense', 0.30, 14.0, 0.6,
+     ['Mamak stall', 'Kopitiam', 'Nasi lemak', 'Grab Food', 'Foodpanda', 'Bakery', 'Sushi bar', 'Cafe latte']),
+    ('Groceries', 'Expense', 0.12, 65.0, 0.5, ['Tesco', 'Giant', 'Jaya Grocer', 'Village Grocer', 'Pasar malam']),
+    ('Transport', 'Expense', 0.15, 12.0, 0.7, ['Grab ride', 'LRT top-up', 'Petrol', 'Parking', 'Toll', 'Bus fare']),
+    ('Shopping', 'Expense', 0.10, 80.0, 0.9, ['Shopee', 'Lazada', 'Uniqlo', 'IKEA', 'Popular bookstore']),
+    ('Entertainment', 'Expense', 0.07, 35.0, 0.6, ['Cinema', 'Netflix', 'Spotify', 'Karaoke', 'Bowling']),
+    ('Bills', 'Expense', 0.06, 120.0, 0.4, ['TNB electricity', 'Water bill', 'Unifi internet', 'Phone plan']),
+    ('Health', 'Expense', 0.04, 60.0, 0.8, ['Clinic', 'Pharmacy', 'Dental', 'Gym membership']),
+    ('Rent', 'Expense', 0.03, 1200.0, 0.2, ['Monthly rent', 'Room rental']),
+    ('Salary', 'Income', 0.05, 4500.0, 0.25, ['Monthly salary', 'Bonus', 'Overtime pay']),
+    ('Freelance', 'Income', 0.05, 400.0, 0.8, ['Design job', 'Tutoring', 'Consulting', 'Refund']),
+    ('Transfer', 'Income', 0.03, 150.0, 0.9, ['DuitNow transfer', 'Bank transfer']),
+]
+NOTES = ['', '', '', 'with friends', 'weekend', 'for family', 'monthly', 'shared', 'reimbursable']
+# The ledger ends on a fixed day, so a seed always produces the same file.
+LEDGER_END = datetime.date(2024, 12, 31)
+LEDGER_YEARS = 10
+
+
+def generate_ledger(path, rows, seed=0):
+    """
+    Writes a synthetic ledger of `rows` transactions (with IDs) to `path`.
+    Rows are mostly in date order over LEDGER_YEARS years, with some entered
+    late. Categories and amounts follow CATEGORIES, and about one row in a
+    thousand is malformed or has a multi-line Description, like hand-edited files.
+    """
+    rng = random.Random(seed)
+    weights = [share for _, _, share, _, _, _ in CATEGORIES]
+    first_day = LEDGER_END.toordinal() - 365 * LEDGER_YEARS
+    span = LEDGER_END.toordinal() - first_day
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(backend.STORAGE_FIELDNAMES)
+        batch = []
+        for index in range(rows):
+            category, trans_type, _, median, spread, merchants = rng.choices(CATEGORIES, weights)[0]
+            day = first_day + index * span // max(rows, 1)
+            if rng.random() < 0.05:
+                day -= rng.randrange(30)  # Entered late
+            date = datetime.date.fromordinal(max(day, first_day)).isoformat()
+            description = rng.choice(merchants)
+            note = rng.choice(NOTES)
+            if note:
+                description = f"{description}, {note}"
+            amount = f"{median * math.exp(rng.gauss(0, spread)):.2f}"
+
+            damage = rng.random()
+            if damage < 0.0004:
+                amount = rng.choice(['', 'RM12', '12,50'])
+            elif damage < 0.0008:
+                date = rng.choice(['', '2024-02-30', '2024-3-5'])
+            elif damage < 0.001:
+                description = f"{description}\nsecond line"
+            batch.append([date, trans_type, description, category, amount, f"{rng.getrandbits(128):032x}"])
+            if len(batch) >= 10000:
+                writer.writerows(batch)
+                batch = []
+        writer.writerows(batch)
+
+
+def ledger_path(workdir, rows, seed):
+    """Returns the path of the generated ledger for (rows, seed), creating it if needed."""
+    path = os.path.join(workdir, f"ledger_{rows}_seed{seed}.csv")
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        generate_ledger(tmp_path, rows, seed)
+        os.replace(tmp_path, path)
+    return path
+
+
+def parse_size(text):
+    """Parses '1k', '100k', '1m', '10M' or plain digits into a row count."""
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+# --- Operations ---
+def _forget_ledgers():
+    """Drops the in-memory ledgers, so the next call starts from disk."""
+    backend._ledgers.clear()
+
+
+def _remove_caches(path):
+    for suffix in ('.snapshot', '.summary.json'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _cold_start(path):
+    _forget_ledgers()
+    _remove_caches(path)
+
+
+def _snapshot_start(path):
+    backend.get_transactions()
+    backend._flush_ledgers()
+    _forget_ledgers()
+
+
+def _warm(path):
+    backend.get_transactions()
+    backend.prepare_search()
+    # Write any snapshot now rather than from its timer in the middle of a measurement
+    backend._flush_ledgers()
+
+
+def backend_operations(path, backend_name):
+    """
+    Returns (name, setup, fn) triples for the backend. setup(path) runs
+    untimed before every timed call of fn().
+    """
+    middle = LEDGER_END - datetime.timedelta(days=365 * LEDGER_YEARS // 2)
+    month = (middle.replace(day=1), middle.replace(day=28))
+    operations = []
+    if backend_name == 'csv':
+        operations += [
+            ('get_transactions (cold parse)', _cold_start, backend.get_transactions),
+            ('get_transactions (snapshot)', _snapshot_start, backend.get_transactions),
+        ]
+    operations += [
+        ('get_transactions (warm)', _warm, backend.get_transactions),
+        ('search_transactions keyword', _warm, lambda: backend.search_transactions('grab')),
+        ('search_transactions category', _warm, lambda: backend.search_transactions(category='Food')),
+        ('search_transactions month', _warm,
+         lambda: backend.search_transactions(date_from=month[0], date_to=month[1])),
+        ('search_transactions combined', _warm,
+         lambda: backend.search_transactions('grab', 'Transport', date_from=month[0], date_to=month[1])),
+        ('sort_transactions_by_date', _warm,
+         lambda: backend.sort_transactions_by_date(backend.get_transactions())),
+        ('get_summary_text', _warm, backend.get_summary_text),
+        ('get_summary_text (streaming)', _warm, lambda: backend.get_summary_text(path)),
+        ('rollup_transactions month', _warm, lambda: backend.rollup_transactions('month', True)),
+    ]
+    return operations
+
+
+def gui_operations(path):
+    """
+    Returns (name, setup, fn) triples that time the table view, rendered
+    offscreen, or [] if PyQt6 isn't installed.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt6.QtCore import QThreadPool, Qt
+        from PyQt6.QtWidgets import QApplication
+    except ImportError:
+        print("PyQt6 is not installed; skipping the table benchmarks", file=sys.stderr)
+        return []
+    from GUI import AMOUNT_COLUMN, ExpenseTrackerApp
+
+    app = QApplication.instance() or QApplication([])
+    state = {}
+
+    def setup(path):
+        _warm(path)
+        if 'window' not in state:
+            state['window'] = ExpenseTrackerApp()
+            state['window'].show()
+        QThreadPool.globalInstance().waitForDone()
+        app.processEvents()
+        state['rows'] = backend.get_transactions()
+
+    def populate():
+        state['window'].populate_table(state['rows'])
+        app.processEvents()
+
+    def refresh():
+        state['window']._refresh_table_data(state['rows'])
+        app.processEvents()
+
+    def sorted_setup(path):
+        # Freshly loaded rows sorted on Date, so nothing is cached for other columns
+        setup(path)
+        model = state['window'].table_model
+        model.sort(0, Qt.SortOrder.AscendingOrder)
+        model.set_transactions(state['rows'])
+        app.processEvents()
+
+    def sort_amount():
+        state['window'].table_model.sort(AMOUNT_COLUMN, Qt.SortOrder.AscendingOrder)
+        app.processEvents()
+
+    def flip():
+        state['window'].table_model.sort(0, Qt.SortOrder.DescendingOrder)
+        app.processEvents()
+
+    def insert():
+        state['window'].table_model.insert_transaction(
+            {'Date': '2020-06-15', 'Type': 'Expense', 'Description': 'Benchmark insert',
+             'Category': 'Food', 'Amount': '12.30', 'ID': 'benchmark'})
+        app.processEvents()
+
+    return [
+        ('populate_table', setup, populate),
+        ('table refresh (populate + sort + paint)', setup, refresh),
+        ('table sort Amount, then Date', sorted_setup, sort_amount),
+        ('table flip sort direction', sorted_setup, flip),
+        ('table insert at sorted position', sorted_setup, insert),
+    ]
+
+
+# --- Measurement ---
+def measure(setup, fn, path, repeat, memory=True):
+    """
+    Returns (best wall seconds over `repeat` runs, every run's seconds, peak
+    traced bytes). Peak memory is taken from one extra run under
+    tracemalloc, so tracing doesn't skew the timings.
+    """
+    times = []
+    for _ in range(repeat):
+        setup(path)
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        setup(path)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return min(times), times, peak
+
+
+def max_rss_bytes():
+    """The process's peak resident set size so far, or None where it isn't available."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024  # Linux reports KiB
+
+
+def run(sizes, workdir, seed=0, backend_name='csv', repeat=None, memory=True, gui=True):
+    """Runs every benchmark for each size and returns the results document."""
+    results = []
+    for rows in sizes:
+        started = time.perf_counter()
+        path = ledger_path(workdir, rows, seed)
+        print(f"{rows:>10,} rows: ledger ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        backend.CSV_FILE = path
+        backend.SQLITE_FILE = os.path.join(workdir, f"ledger_{rows}_seed{seed}.db")
+        backend.PARTITION_DIR = os.path.join(workdir, f"ledger_{rows}_seed{seed}_partitions")
+        backend.set_backend(backend_name)
+        _forget_ledgers()
+        if backend_name == 'sqlite' and not os.path.exists(backend.SQLITE_FILE):
+            backend.import_csv_to_sqlite(path, backend.SQLITE_FILE)
+        if backend_name == 'partitioned' and not os.path.isdir(backend.PARTITION_DIR):
+            backend.import_csv_to_partitions(path, backend.PARTITION_DIR)
+            backend._flush_ledgers()
+
+        operations = backend_operations(path, backend_name)
+        if gui:
+            operations += gui_operations(path)
+        runs = repeat or (3 if rows <= 100000 else 1)
+        for name, setup, fn in operations:
+            best, times, peak = measure(setup, fn, path, runs, memory)
+            results.append({
+                'rows': rows, 'operation': name, 'seconds': best, 'runs': times, 'peak_bytes': peak,
+            })
+            peak_text = f"{peak / 1e6:9.1f} MB" if peak is not None else ''
+            print(f"{rows:>10,}  {name:<42} {best * 1000:10.1f} ms {peak_text}", file=sys.stderr)
+        _forget_ledgers()
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': config.USE_NUMPY,
+            'backend': backend_name,
+            'seed': seed,
+            'max_rss_bytes': max_rss_bytes(),
+        },
+        'results': results,
+    }
+
+
+def compare(previous, current, threshold=0.2):
+    """
+    Prints each operation's time against a previous run. Returns the
+    (rows, operation) pairs that got slower by more than `threshold`.
+    """
+    if previous['meta'].get('backend') != current['meta'].get('backend'):
+        print(f"Note: comparing the {previous['meta'].get('backend')} backend against "
+              f"{current['meta'].get('backend')}", file=sys.stderr)
+    before = {(r['rows'], r['operation']): r['seconds'] for r in previous['results']}
+    regressions = []
+    for result in current['results']:
+        key = (result['rows'], result['operation'])
+        if key not in before:
+            continue
+        ratio = result['seconds'] / before[key] if before[key] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"{key[0]:>10,}  {key[1]:<42} {before[key] * 1000:10.1f} -> "
+              f"{result['seconds'] * 1000:10.1f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ledger backend and table view.")
+    parser.add_argument('--sizes', default='1k,100k',
+                        help="comma-separated ledger sizes, e.g. 1k,100k,1m,10m (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="generator seed (default: %(default)s)")
+    parser.add_argument('--backend', choices=['csv', 'sqlite', 'partitioned'], default='csv')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'moneytracker-bench'),
+                        help="where generated ledgers are kept (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, help="timed runs per operation (default: 3, or 1 above 100k rows)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc peak-memory runs")
+    parser.add_argument('--no-gui', action='store_true', help="skip the Qt table benchmarks")
+    parser.add_argument('--output', default='benchmark_results.json', help="results file (default: %(default)s)")
+    parser.add_argument('--compare', metavar='PREVIOUS_JSON', help="report changes against an earlier results file")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="slowdown that counts as a regression with --compare (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    document = run(sizes, args.workdir, args.seed, args.backend, args.repeat,
+                   memory=not args.no_memory, gui=not args.no_gui)
+    with open(args.output, 'w') as output:
+        json.dump(document, output, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+        if compare(previous, document, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,79 +1,282 @@
-import csv
-import datetime
+"""
+Public API of the expense tracker: backend selection, edits, searches and
+summaries. The storage engines behind it live in the `ledger` package.
+"""
+import atexit
 import os
 
+import Instrumentation as instrumentation
+
+from ledger import bulk_import, config, pipeline, records
+from ledger.backend import LedgerBackend, _ledgers, shared_ledger
+from ledger.csv_backend import CsvLedger
+from ledger.index import _description_tokens
+from ledger.partitioned import PartitionedLedger
+from ledger.pipeline import filter_stage, iter_records, map_stage, rollup_aggregate, run_pipeline, summary_aggregate
+from ledger.records import (
+    FIELDNAMES, ID_FIELD, STORAGE_FIELDNAMES, _date_bounds, _filter_transactions, _iter_records, _read_header,
+    _sort_key, new_transaction_id,
+)
+from ledger.sqlite_backend import SqliteLedger
+from ledger.store import ChainedRows, TransactionRow, TransactionRows, TransactionStore
+from ledger.totals import ROLLUP_PERIODS, CategoryTotals
+
 # --- Constants for Data Handling ---
 CSV_FILE = 'expenses.csv'
-FIELDNAMES = ['Date', 'Type', 'Description', 'Category', 'Amount']
 
+# --- Backend selection ---
+SQLITE_FILE = 'expenses.db'
+# Directory of the 'partitioned' backend (config.PARTITION_PERIOD says how
+# a new one is split).
+PARTITION_DIR = 'expenses'
+# 'csv' (the default, plain expenses.csv), 'sqlite' or 'partitioned'. Can
+# also be changed at runtime with set_backend().
+STORAGE_BACKEND = os.environ.get('MONEYTRACKER_BACKEND', 'csv')
+
+_backend_override = None
+
+
+@atexit.register
+def _flush_ledgers():
+    """
+    Runs any compaction, then any snapshot, still waiting on its timer
+    before the process exits, and then updates partition manifests to match.
+    """
+    ledgers = list(_ledgers.values())
+    for ledger in ledgers:
+        if isinstance(ledger, CsvLedger):
+            ledger.flush_journal()
+            ledger.flush_snapshot()
+    for ledger in ledgers:
+        if isinstance(ledger, PartitionedLedger):
+            ledger.flush_manifest()
+
+
+def get_ledger(path=None):
+    """Returns the shared CsvLedger for `path` (defaults to CSV_FILE)."""
+    return shared_ledger(CsvLedger, path or CSV_FILE)
+
+
+def get_sqlite_ledger(path=None):
+    """Returns the shared SqliteLedger for `path` (defaults to SQLITE_FILE)."""
+    return shared_ledger(SqliteLedger, path or SQLITE_FILE)
+
+
+def get_partitioned_ledger(directory=None):
+    """Returns the shared PartitionedLedger for `directory` (defaults to PARTITION_DIR)."""
+    return shared_ledger(PartitionedLedger, directory or PARTITION_DIR)
+
+
+def get_backend():
+    """Returns the LedgerBackend the module-level functions operate on."""
+    if _backend_override is not None:
+        return _backend_override
+    if STORAGE_BACKEND == 'sqlite':
+        return get_sqlite_ledger()
+    if STORAGE_BACKEND == 'partitioned':
+        return get_partitioned_ledger()
+    return get_ledger()
+
+
+def set_backend(backend):
+    """Selects the backend by name ('csv', 'sqlite' or 'partitioned') or as a LedgerBackend instance."""
+    global STORAGE_BACKEND, _backend_override
+    if isinstance(backend, LedgerBackend):
+        _backend_override = backend
+        return
+    if backend not in ('csv', 'sqlite', 'partitioned'):
+        raise ValueError(f"Unknown storage backend: {backend!r}")
+    STORAGE_BACKEND = backend
+    _backend_override = None
+
+
+def initialize_csv(path=None):
+    """Creates the CSV file (defaults to CSV_FILE) with headers if it doesn't exist."""
+    records.initialize_csv(path or CSV_FILE)
 
-def initialize_csv():
-    """Creates the CSV file with headers if it doesn't exist."""
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
-            writer.writeheader()
 
+def _rows_to_import(csv_path):
+    """
+    Reads a ledger CSV (with or without an ID column) for a one-shot import.
+    Repeated IDs are cleared, so the target gives those rows new ones.
+    """
+    with open(csv_path or CSV_FILE, 'rb') as csvfile:
+        header = _read_header(csvfile)
+        rows = [row for _, _, row in _iter_records(csvfile, header)]
+    seen = set()
+    for row in rows:
+        if row.get(ID_FIELD) in seen:
+            row[ID_FIELD] = None
+        seen.add(row.get(ID_FIELD))
+    return rows
 
-def get_transactions():
-    """Reads all transactions from the CSV file."""
-    try:
-        with open(CSV_FILE, 'r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            return list(reader)
-    except FileNotFoundError:
-        return []
+
+def import_csv_to_sqlite(csv_path=None, db_path=None):
+    """
+    One-shot import of a ledger CSV (with or without an ID column) into a
+    SQLite database. The CSV itself is left untouched. Returns the row count.
+    """
+    return len(get_sqlite_ledger(db_path).append(_rows_to_import(csv_path)))
+
+
+def import_csv_to_partitions(csv_path=None, directory=None):
+    """
+    One-shot split of a ledger CSV (with or without an ID column) into the
+    partition files of a PartitionedLedger directory. The CSV itself is left
+    untouched. Returns the row count.
+    """
+    return len(get_partitioned_ledger(directory).append(_rows_to_import(csv_path)))
+
+
+def initialize_storage():
+    """
+    Prepares the selected backend. A freshly created SQLite database or
+    partition directory is seeded from an existing expenses.csv.
+    """
+    if _backend_override is None and STORAGE_BACKEND == 'sqlite':
+        is_new = not os.path.exists(SQLITE_FILE)
+        get_sqlite_ledger()
+        if is_new and os.path.exists(CSV_FILE):
+            import_csv_to_sqlite(CSV_FILE, SQLITE_FILE)
+    elif _backend_override is None and STORAGE_BACKEND == 'partitioned':
+        if not os.path.isdir(PARTITION_DIR) and os.path.exists(CSV_FILE):
+            import_csv_to_partitions(CSV_FILE, PARTITION_DIR)
+    else:
+        initialize_csv()
+
+
+def get_transactions(progress=None):
+    """
+    Reads all transactions from the selected backend. progress(done, total)
+    is called periodically during long reads and may raise to cancel.
+    """
+    return get_backend().transactions(progress)
 
 
 def save_all_transactions(transactions):
-    """Overwrites the CSV file with the provided list of transactions."""
-    with open(CSV_FILE, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
-        writer.writeheader()
-        writer.writerows(transactions)
-
-
-def search_transactions(keyword="", category="", filter_date=None):
-    """Filters transactions based on a keyword, category, and/or a specific date."""
-    all_transactions = get_transactions()
-
-    # Check if any filter is active
-    if not keyword and not category and not filter_date:
-        return all_transactions
-
-    filtered = []
-    for transaction in all_transactions:
-        # Assume a match until a criterion fails
-        keyword_match = True
-        category_match = True
-        date_match = True
-
-        # Keyword and Category checks (these are correct)
-        if keyword and keyword.lower() not in transaction.get('Description', '').lower():
-            keyword_match = False
-        if category and category.lower() != transaction.get('Category', '').lower():
-            category_match = False
-
-        if filter_date:
-            try:
-                trans_date_str = transaction.get('Date', '')
-                if not trans_date_str:
-                    date_match = False
-                else:
-                    # Convert the date string from the CSV to a date object for comparison
-                    trans_date = datetime.datetime.strptime(trans_date_str, '%Y-%m-%d').date()
-                    # Check for an exact match with the filter_date object
-                    if trans_date != filter_date:
-                        date_match = False
-            except ValueError:
-                date_match = False # Malformed date in CSV cannot match
-
-        # If all criteria are met, add the transaction to the list
-        if keyword_match and category_match and date_match:
-            filtered.append(transaction)
-
-    return filtered
+    """Overwrites the ledger with the provided list of transactions."""
+    get_backend().replace_all(transactions)
+
+
+def append_transaction(transaction):
+    """Appends a single transaction to the ledger. Returns its new ID."""
+    return get_backend().append([transaction])[0]
+
+
+def append_transactions(transactions):
+    """Appends a batch of transactions in a single write. Returns their IDs."""
+    return get_backend().append(transactions)
+
+
+def update_transaction_by_id(transaction_id, transaction):
+    """Replaces the stored transaction with the given ID. Raises KeyError if it's gone."""
+    get_backend().update(transaction_id, transaction)
+
+
+def delete_transaction_by_id(transaction_id):
+    """Deletes the stored transaction with the given ID. Raises KeyError if it's gone."""
+    get_backend().delete(transaction_id)
+
 
+def batch():
+    """
+    Groups edits into one unit, e.g. to delete many rows at the cost of a
+    single journal write and a single compaction of the CSV file:
+
+        with batch():
+            for transaction_id in selected_ids:
+                delete_transaction_by_id(transaction_id)
+
+    If the with-block raises, the CSV backend keeps none of its edits
+    (bulk imports included). save_all_transactions() and
+    compact_transactions() can't be called inside it.
+    """
+    return get_backend().batch()
+
+
+def compact_transactions():
+    """Folds journaled edits into the CSV file now, dropping the space left by deleted rows."""
+    get_ledger().compact()
+
+
+def search_transactions(keyword="", category="", filter_date=None, date_from=None, date_to=None,
+                        trans_type="", source=None):
+    """
+    Filters transactions based on a keyword, category, type ('Income' or
+    'Expense'), a specific date and/or an inclusive date range (date_from,
+    date_to). Given a `source` (a CSV path or an iterable of rows), returns a
+    lazy generator that filters it in a single streaming pass instead.
+    """
+    if source is not None:
+        stage = filter_stage(keyword=keyword, category=category, filter_date=filter_date,
+                             date_from=date_from, date_to=date_to, trans_type=trans_type)
+        return stage(iter_records(source))
+    return get_backend().search(keyword, category, filter_date, date_from, date_to, trans_type)
+
+
+def prepare_search():
+    """
+    Builds the keyword-search index. Searches only use it once it's built
+    and scan the rows until then. Safe to run in the background.
+    """
+    get_backend().prepare_search()
+
+
+@instrumentation.timed('search.refine')
+def refine_search(transactions, keyword="", category="", filter_date=None, date_from=None,
+                  date_to=None, trans_type=""):
+    """
+    Applies search_transactions' filters to an earlier result instead of the
+    whole ledger, keeping its order. Only meaningful when the new query is at
+    least as strict as the one that produced `transactions` (e.g. a longer
+    keyword, or an extra category).
+    """
+    if isinstance(transactions, ChainedRows):
+        return ChainedRows([
+            refine_search(part, keyword, category, filter_date, date_from, date_to, trans_type)
+            for part in transactions.parts
+        ])
+    if not isinstance(transactions, TransactionRows):
+        return _filter_transactions(transactions, keyword, category, filter_date, date_from, date_to, trans_type)
+    store = transactions.store
+    instrumentation.count('search.rows_scanned', len(transactions.positions))
+    positions = transactions.positions
+    low, high = _date_bounds(filter_date, date_from, date_to)
+    if low is not None or high is not None:
+        dates = store.dates
+        positions = [
+            p for p in positions
+            if dates[p] and (low is None or dates[p] >= low) and (high is None or dates[p] <= high)
+        ]
+    # Rows deleted since the earlier search are dropped last, from what's left.
+    positions = store.filter_positions(positions, keyword, category, trans_type)
+    return TransactionRows(store, store.live_positions(positions))
+
+
+def search_description_terms(query, prefix=True):
+    """
+    Word search over Description: returns the transactions whose description
+    contains every word of `query` (case-insensitive). With prefix=True a word
+    also matches longer words it starts, so 'gro sup' finds 'Grocery supplies'.
+    """
+    terms = sorted(_description_tokens(query))
+    return get_backend().search_terms(terms, prefix)
+
+
+def sort_keys(transactions, field):
+    """
+    Returns one sort key per row of `transactions` for `field` (see
+    _sort_key), comparable across rows from any backend. Rows of a
+    TransactionRows are keyed from their store's typed columns.
+    """
+    if isinstance(transactions, TransactionRows):
+        return transactions.store.sort_keys(transactions.positions, field)
+    if isinstance(transactions, ChainedRows):
+        return [key for part in transactions.parts for key in sort_keys(part, field)]
+    return [_sort_key(row, field) for row in transactions]
+
+
+@instrumentation.timed('sort')
 def sort_transactions_by_date(transactions, descending=False):
     """Sorts a list of expense dictionaries by date."""
     # The 'YYYY-MM-DD' format can be sorted correctly as strings.
@@ -82,42 +285,10 @@ def sort_transactions_by_date(transactions, descending=False):
     return sorted(transactions, key=lambda t: t.get('Date', ''), reverse=descending)
 
 
-def get_summary_text():
-    """Generates a summary of income, expenses, and balance as plain text."""
-    transactions = get_transactions()
-    if not transactions:
-        return "No transactions to summarize."
-
-    total_income = 0.0
-    total_expense = 0.0
-    income_categories = {}
-    expense_categories = {}
-
-    for row in transactions:
-        try:
-            # Check for empty or invalid data BEFORE trying to use it
-            amount_str = row.get('Amount')
-            category = row.get('Category')
-
-            if not amount_str or not category:
-                continue  # Skip rows with missing essential data
-
-            amount = float(amount_str)
-            trans_type = row.get('Type', 'Expense')
-
-            if trans_type == 'Income':
-                total_income += amount
-                income_categories[category] = income_categories.get(category, 0) + amount
-            else:
-                total_expense += amount
-                expense_categories[category] = expense_categories.get(category, 0) + amount
-        except (ValueError, KeyError, TypeError):
-            # This will now catch errors from float() or other unexpected issues
-            continue
-        except (ValueError, KeyError, TypeError):
-            continue
-
-    # ---Calculate net_balance here ---
+def _format_summary(income_categories, expense_categories):
+    """Builds the summary text from per-category totals."""
+    total_income = sum(income_categories.values(), 0.0)
+    total_expense = sum(expense_categories.values(), 0.0)
     net_balance = total_income - total_expense
 
     # Build the summary
@@ -125,7 +296,6 @@ def get_summary_text():
     summary += f"{'Total Income:':<18} RM {total_income:>10.2f}\n"
     summary += f"{'Total Expenses:':<18} RM {total_expense:>10.2f}\n"
     summary += "----------------------------------\n"
-    # --- FIX: Use the net_balance variable ---
     summary += f"{'Net Balance:':<18} RM {net_balance:>10.2f}\n\n"
 
     summary += "--- Income by Category ---\n"
@@ -142,4 +312,74 @@ def get_summary_text():
         for category, total in sorted(expense_categories.items()):
             summary += f"{category:<18}: RM {total:>9.2f}\n"
 
-    return summary
\ No newline at end of file
+    return summary
+
+
+@instrumentation.timed('summary')
+def get_summary_text(source=None):
+    """
+    Generates a summary of income, expenses, and balance as plain text.
+    Given a `source` (a CSV path or an iterable of rows), the summary is
+    computed in one streaming pass over it instead of from the backend.
+    """
+    if source is None:
+        row_count, income_categories, expense_categories = get_backend().summary_totals()
+    else:
+        row_count, income_categories, expense_categories = summary_aggregate(iter_records(source))
+    if not row_count:
+        return "No transactions to summarize."
+    return _format_summary(income_categories, expense_categories)
+
+
+def get_summary_totals():
+    """
+    The figures behind get_summary_text() as a dict, for scripts: row count,
+    overall income, expense and net balance, and per-category totals in RM.
+    """
+    row_count, income_categories, expense_categories = get_backend().summary_totals()
+    total_income = sum(income_categories.values(), 0.0)
+    total_expense = sum(expense_categories.values(), 0.0)
+    return {
+        'rows': row_count,
+        'total_income': round(total_income, 2),
+        'total_expense': round(total_expense, 2),
+        'net_balance': round(total_income - total_expense, 2),
+        'income': dict(sorted(income_categories.items())),
+        'expense': dict(sorted(expense_categories.items())),
+    }
+
+
+def verify_summary_cache():
+    """Checks the cached summary totals against a full recompute. Returns True if they agree."""
+    return get_backend().check_summary_totals()
+
+
+def rollup_transactions(period='month', by_category=False, date_from=None, date_to=None):
+    """
+    Income vs expense totals per 'day', 'week', 'month' or 'year' (optionally
+    per category too), over an optional inclusive date range. Returns a list
+    of dicts like {'Period': '2024-03', 'Income': 1200.0, 'Expense': 845.5}.
+    Rows the summary would skip, or with malformed dates, are left out.
+    """
+    return get_backend().rollup(period, by_category, date_from, date_to)
+
+
+# --- Streaming pipelines ---
+def iter_transactions(path=None):
+    """Yields the rows of a ledger CSV (defaults to CSV_FILE) one at a time, without loading the whole file."""
+    return pipeline.iter_transactions(path or CSV_FILE)
+
+
+# --- Bulk import ---
+def bulk_import_csv(source_path, workers=None, skip_malformed=False):
+    """
+    Appends every row of a FIELDNAMES-format CSV export (e.g. from a bank) to
+    the ledger, parsing it in parallel across `workers` processes (default:
+    one per CPU). Imported rows get fresh IDs. Scripts that call it must
+    guard their entry point with `if __name__ == '__main__':`.
+
+    Returns a report dict: {'imported': rows added, 'chunks': [...]}, with
+    one entry per chunk giving its byte range and its 'rows', 'imported',
+    'bad_dates', 'bad_amounts' and 'missing_categories' counts.
+    """
+    return bulk_import.import_csv(get_backend(), source_path, workers, skip_malformed)
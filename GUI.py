@@ -1,17 +1,310 @@
-from PyQt6.QtGui import QFont
+import bisect
+
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTableWidget, QTableWidgetItem, QPushButton, QLineEdit, QDateEdit,
-    QLabel, QHeaderView, QMessageBox, QFormLayout, QComboBox, QCheckBox
+    QTableView, QPushButton, QLineEdit, QDateEdit,
+    QLabel, QHeaderView, QMessageBox, QFormLayout, QComboBox, QCheckBox, QProgressBar
 )
 from PyQt6.QtGui import QColor, QFont
-from PyQt6.QtCore import QDate, Qt
+from PyQt6.QtCore import (
+    QAbstractTableModel, QDate, QModelIndex, QObject, QRunnable, QThreadPool, QTimer, Qt, pyqtSignal
+)
 
 # --- Import updated backend functions and constants ---
 from Code_Function import (
-    get_transactions, save_all_transactions, get_summary_text, FIELDNAMES,
-    search_transactions, sort_transactions_by_date
+    get_transactions, get_summary_text, FIELDNAMES, ID_FIELD,
+    search_transactions, refine_search, prepare_search, append_transaction,
+    update_transaction_by_id, delete_transaction_by_id, batch, sort_keys, TransactionRows
 )
+import Instrumentation as instrumentation
+
+# --- Amount cell colors ---
+INCOME_COLOR = QColor(220, 255, 220)  # Light green background
+EXPENSE_COLOR = QColor(255, 220, 220)  # Light red background
+AMOUNT_TEXT_COLOR = QColor(0, 0, 0)  # Black text on both
+AMOUNT_COLUMN = FIELDNAMES.index('Amount')
+
+# --- Live search ---
+SEARCH_DEBOUNCE_MS = 200  # Wait this long after the last keystroke before searching
+SEARCH_CACHE_SIZE = 8  # Recent results kept for narrowing, besides the full list
+
+# --- Sorting ---
+SORT_KEY_LIMIT = 3  # The clicked column, plus up to two earlier ones breaking its ties
+
+
+class TransactionTableModel(QAbstractTableModel):
+    """
+    Read-only table model over a sequence of transactions.
+
+    The backend hands over a TransactionRows sequence (row views over its
+    column store), so the model holds no per-cell data at all: cell text and
+    colors are decoded in data() only for the rows the view actually paints,
+    and sorting just reorders a permutation of row numbers.
+
+    Rows are sorted on up to SORT_KEY_LIMIT columns. The first time a column
+    is sorted on, its sort keys and its sorted permutation of row numbers are
+    computed once and then kept up to date as rows are inserted and removed,
+    so sorting on it again is a copy, flipping the direction only changes
+    how view rows map onto the order, and an insert is a binary search.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = ()
+        self._added = []  # rows inserted since set_transactions, numbered on from len(self._rows)
+        self._removed = set()  # row numbers no longer shown
+        self._order = range(0)  # row numbers in ascending sort order
+        self._sort_columns = (0,)  # primary first
+        self._descending = False
+        self._columns = {}  # column -> (sort key by row number, row numbers in key order)
+        self._ranks = {}  # column -> (dense rank of each row's key, number of ranks); dropped on edits
+
+    def set_transactions(self, transactions, presorted=False):
+        """
+        Replaces the model's rows with the given transactions, sorted on the
+        current sort columns. presorted=True means they already are in that
+        order (e.g. rows narrowed from an earlier result).
+        """
+        self.beginResetModel()
+        self._rows = transactions
+        self._added = []
+        self._removed = set()
+        self._columns = {}
+        self._ranks = {}
+        if not presorted:
+            self._order = self._sorted_order()
+        elif self._descending:
+            self._order = range(len(transactions) - 1, -1, -1)
+        else:
+            self._order = range(len(transactions))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(FIELDNAMES)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._transaction(index.row()).get(FIELDNAMES[column]) or ""
+        if column == AMOUNT_COLUMN:
+            if role == Qt.ItemDataRole.BackgroundRole:
+                trans_type = self._transaction(index.row()).get('Type', 'Expense')
+                return INCOME_COLOR if trans_type == 'Income' else EXPENSE_COLOR
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return AMOUNT_TEXT_COLOR
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return FIELDNAMES[section]
+        return super().headerData(section, orientation, role)
+
+    # --- Row numbers ---
+    def _order_index(self, row):
+        """Index into self._order of a view row."""
+        return len(self._order) - 1 - row if self._descending else row
+
+    def _row(self, number):
+        base = len(self._rows)
+        return self._rows[number] if number < base else self._added[number - base]
+
+    def _transaction(self, row):
+        return self._row(self._order[self._order_index(row)])
+
+    # --- Sorting ---
+    def _column(self, column):
+        """(sort key by row number, row numbers in key order) for a column, computed on first use."""
+        cached = self._columns.get(column)
+        if cached is None:
+            field = FIELDNAMES[column]
+            keys = sort_keys(self._rows, field) + sort_keys(self._added, field)
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            if self._removed:
+                order = [number for number in order if number not in self._removed]
+            cached = self._columns[column] = (keys, order)
+        return cached
+
+    def _column_ranks(self, column):
+        """(dense rank of each row's sort key, number of distinct keys) for a column."""
+        cached = self._ranks.get(column)
+        if cached is None:
+            keys = self._column(column)[0]
+            rank = {key: i for i, key in enumerate(sorted(set(keys)))}
+            cached = self._ranks[column] = (list(map(rank.__getitem__, keys)), len(rank))
+        return cached
+
+    def _sorted_order(self):
+        """Row numbers in ascending order of the sort columns; equal rows by row number."""
+        order = self._column(self._sort_columns[0])[1]
+        if len(self._sort_columns) == 1:
+            return list(order)
+        # Fold the columns' ranks into one int per row, which sorts far faster
+        # than tuples of keys. `order` is already in primary-column order, so
+        # the sort only has to reorder runs of ties.
+        combined, _ = self._column_ranks(self._sort_columns[0])
+        for column in self._sort_columns[1:]:
+            ranks, count = self._column_ranks(column)
+            combined = [high * count + low for high, low in zip(combined, ranks)]
+        return sorted(order, key=combined.__getitem__)
+
+    @instrumentation.timed('table.sort')
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """
+        Sorts by a column, with the columns sorted on before it breaking ties.
+        Sorting on the current column again in the other direction just
+        reverses the view.
+        """
+        self.layoutAboutToBeChanged.emit()
+        if column != self._sort_columns[0]:
+            columns = (column,) + tuple(c for c in self._sort_columns if c != column)
+            self._sort_columns = columns[:SORT_KEY_LIMIT]
+            self._order = self._sorted_order()
+        self._descending = order == Qt.SortOrder.DescendingOrder
+        self.layoutChanged.emit()
+
+    def sort_key(self):
+        """Returns (sort columns, primary first, descending) describing the current view order."""
+        return self._sort_columns, self._descending
+
+    # --- Edits ---
+    def insert_transaction(self, transaction):
+        """Adds a transaction at its sorted position. Returns the view row it lands on."""
+        sort_columns = [self._column(column)[0] for column in self._sort_columns]
+        number = len(self._rows) + len(self._added)
+        self._added.append(transaction)
+        self._ranks = {}
+        for column, (keys, order) in self._columns.items():
+            keys.append(sort_keys([transaction], FIELDNAMES[column])[0])
+            order.insert(bisect.bisect_right(order, keys[number], key=keys.__getitem__), number)
+
+        key = tuple(keys[number] for keys in sort_columns)
+        index = bisect.bisect_right(self._order, key, key=lambda n: tuple(keys[n] for keys in sort_columns))
+        row = len(self._order) - index if self._descending else index
+        self.beginInsertRows(QModelIndex(), row, row)
+        if not isinstance(self._order, list):
+            self._order = list(self._order)
+        self._order.insert(index, number)
+        self.endInsertRows()
+        return row
+
+    def remove_rows(self, rows):
+        """Removes the transactions shown at the given view rows."""
+        if not isinstance(self._order, list):
+            self._order = list(self._order)
+        for row in sorted(set(rows), reverse=True):
+            index = self._order_index(row)
+            number = self._order[index]
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._order[index]
+            self._removed.add(number)
+            self._ranks = {}
+            for keys, order in self._columns.values():
+                # Equal keys are kept in row-number order, so (key, number) pins the entry down
+                del order[bisect.bisect_left(order, (keys[number], number), key=lambda n: (keys[n], n))]
+            self.endRemoveRows()
+
+    # --- Access ---
+    def ordered_transactions(self):
+        """Returns the model's rows in their current view order."""
+        rows, order = self._rows, self._order
+        if self._descending:
+            order = order[::-1]
+        if not self._added:
+            if order == range(len(rows)):
+                return rows
+            if isinstance(rows, TransactionRows):
+                positions = rows.positions
+                return TransactionRows(rows.store, [positions[i] for i in order])
+        return [self._row(number) for number in order]
+
+    def transaction_id(self, row):
+        """Returns the stored ID of the transaction shown at a view row."""
+        return self._transaction(row).get(ID_FIELD)
+
+    def row_values(self, row):
+        """Returns {field: text} for the transaction shown at a view row."""
+        transaction = self._transaction(row)
+        return {field: transaction.get(field) or "" for field in FIELDNAMES}
+
+
+class TaskCancelled(Exception):
+    """Raised inside a background task once a newer request has replaced it."""
+
+
+class TaskSignals(QObject):
+    """Signals a BackendTask uses to report back to the GUI thread."""
+    finished = pyqtSignal(int, object)  # generation, result
+    failed = pyqtSignal(int, str)  # generation, error message
+    progress = pyqtSignal(int, int)  # generation, percent done
+
+
+class BackendTask(QRunnable):
+    """
+    Runs one backend call on the thread pool.
+
+    `is_current` tells the task whether it is still the newest request on its
+    channel. Calls that accept a `progress` callback get one that reports
+    percent done and raises TaskCancelled once the task has been superseded,
+    so a stale load stops at its next progress tick.
+    """
+
+    def __init__(self, generation, is_current, fn, *args, with_progress=False, **kwargs):
+        super().__init__()
+        self.generation = generation
+        self.is_current = is_current
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        if with_progress:
+            self.kwargs['progress'] = self._report_progress
+
+    def _report_progress(self, done, total):
+        if not self.is_current():
+            raise TaskCancelled()
+        percent = int(done * 100 / total) if total else 0
+        self.signals.progress.emit(self.generation, percent)
+
+    def run(self):
+        if not self.is_current():
+            return
+        try:
+            try:
+                result = self.fn(*self.args, **self.kwargs)
+            except TaskCancelled:
+                return
+            except Exception as e:
+                self.signals.failed.emit(self.generation, str(e))
+                return
+            self.signals.finished.emit(self.generation, result)
+        except RuntimeError:
+            pass  # The window (and our signals object) closed while we ran
+
+
+def _update_existing(transaction_id, transaction):
+    """Updates a transaction. Returns False if it no longer exists."""
+    try:
+        update_transaction_by_id(transaction_id, transaction)
+    except KeyError:
+        return False
+    return True
+
+
+def _delete_existing(transaction_ids):
+    """Deletes transactions in one batch (a single journal write). Returns how many no longer existed."""
+    missing = 0
+    with batch():
+        for transaction_id in transaction_ids:
+            try:
+                delete_transaction_by_id(transaction_id)
+            except KeyError:
+                missing += 1
+    return missing
 
 
 class ExpenseTrackerApp(QMainWindow):
@@ -20,9 +313,21 @@ class ExpenseTrackerApp(QMainWindow):
         self.setWindowTitle("Personal Finance Tracker")
         self.setGeometry(100, 100, 800, 600)
 
-        self.current_transactions = []
         self.sort_order = Qt.SortOrder.AscendingOrder
 
+        # Backend work runs on a thread pool. Each channel only delivers the
+        # result of its newest request; older ones are cancelled or dropped.
+        self.thread_pool = QThreadPool.globalInstance()
+        self._generations = {'table': 0, 'summary': 0, 'index': 0, 'edit': 0}
+        self._task_signals = {}
+
+        # Recent search results as (query, rows in view order, model sort
+        # key), newest last. The first entry is the unfiltered list.
+        self._recent_searches = []
+        # The query on show, and the 'table' generation that delivered it
+        self._shown_query = None
+        self._shown_generation = 0
+
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.layout = QVBoxLayout(self.central_widget)
@@ -31,34 +336,38 @@ class ExpenseTrackerApp(QMainWindow):
         self._create_table()
         self._create_input_form()
         self._create_buttons()
+        self._create_status_bar()
 
-        self.table.itemSelectionChanged.connect(self.populate_form_from_selection)
+        self.table.selectionModel().selectionChanged.connect(self.populate_form_from_selection)
         self.table.horizontalHeader().sectionClicked.connect(self.on_header_clicked)
 
         self.load_transactions()
 
-    def _refresh_table_data(self, transactions_list):
+    @instrumentation.timed('table.refresh')
+    def _refresh_table_data(self, transactions_list, presorted=False):
         """
         A central method to sort and display any list of transactions.
         This ensures the table is always sorted correctly.
         """
-        # 1. Sort the provided list according to the current sort order
-        descending = (self.sort_order == Qt.SortOrder.DescendingOrder)
-        self.current_transactions = sort_transactions_by_date(transactions_list, descending=descending)
+        # 1. Hand the rows to the model, which sorts them on the current sort columns
+        # (rows narrowed from an already sorted result are still in order)
+        self.populate_table(transactions_list, presorted)
 
-        # 2. Populate the table with the now-sorted data
-        self.populate_table(self.current_transactions)
+        # 2. Visually update the header's sort indicator arrow
+        self._update_sort_indicator()
 
-        # 3. Visually update the header's sort indicator arrow
-        # We know the date column is always at index 0
-        self.table.horizontalHeader().setSortIndicator(0, self.sort_order)
+    def _update_sort_indicator(self):
+        sort_columns, _ = self.table_model.sort_key()
+        self.table.horizontalHeader().setSortIndicator(sort_columns[0], self.sort_order)
 
     def _create_table(self):
-        self.table = QTableWidget()
-        self.table.setColumnCount(len(FIELDNAMES))
-        self.table.setHorizontalHeaderLabels(FIELDNAMES)
+        self.table_model = TransactionTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSortIndicatorShown(True)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
         self.layout.addWidget(self.table)
 
     def _create_input_form(self):
@@ -108,30 +417,100 @@ class ExpenseTrackerApp(QMainWindow):
 
         self.layout.addLayout(self.button_layout)
 
-    def populate_table(self, transactions):
-        self.table.setRowCount(0)
-        for row_num, transaction in enumerate(transactions):
-            self.table.insertRow(row_num)
-            for col_num, field in enumerate(FIELDNAMES):
-                item = QTableWidgetItem(transaction.get(field, ""))
-                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-
-                # --- NEW: Color coding block ---
-                if field == 'Amount':
-                    trans_type = transaction.get('Type', 'Expense')
-                    if trans_type == 'Income':
-                        item.setBackground(QColor(220, 255, 220))  # Light green background
-                        item.setForeground(QColor(0, 0, 0))  # Set text to black
-                    else:  # Expense
-                        item.setBackground(QColor(255, 220, 220))  # Light red background
-                        item.setForeground(QColor(0, 0, 0))  # Set text to black
-
-                self.table.setItem(row_num, col_num, item)
+    def _create_status_bar(self):
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
+    def _run_in_background(self, channel, on_result, fn, *args, with_progress=False, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on the thread pool and hands its result to
+        on_result on the GUI thread. A newer request on the same channel
+        supersedes this one.
+        """
+        self._generations[channel] += 1
+        generation = self._generations[channel]
+
+        def is_current():
+            return self._generations[channel] == generation
+
+        task = BackendTask(generation, is_current, fn, *args, with_progress=with_progress, **kwargs)
+        task.signals.finished.connect(
+            lambda gen, result: self._on_task_finished(channel, gen, result, on_result)
+        )
+        task.signals.failed.connect(lambda gen, message: self._on_task_failed(channel, gen, message))
+        if with_progress:
+            task.signals.progress.connect(lambda gen, percent: self._on_task_progress(channel, gen, percent))
+            self.progress_bar.setValue(0)
+            self.progress_bar.show()
+        # Keep the signal object alive until its results have been delivered
+        self._task_signals[channel] = task.signals
+        self.thread_pool.start(task)
+
+    def _run_edit(self, on_result, fn, *args):
+        """
+        Saves an edit in the background. The edit buttons stay disabled until
+        it is done, so edits are saved one at a time and in order.
+        """
+        self._set_edit_buttons_enabled(False)
+        self._run_in_background('edit', on_result, fn, *args)
+
+    def _set_edit_buttons_enabled(self, enabled):
+        for button in (self.add_button, self.update_button, self.delete_button):
+            button.setEnabled(enabled)
+
+    def _on_task_finished(self, channel, generation, result, on_result):
+        if channel == 'edit':
+            self._set_edit_buttons_enabled(True)
+        if generation != self._generations[channel]:
+            return  # A newer request replaced this one
+        self.progress_bar.hide()
+        on_result(result)
+
+    def _on_task_failed(self, channel, generation, message):
+        if channel == 'edit':
+            self._set_edit_buttons_enabled(True)
+        if generation != self._generations[channel]:
+            return
+        self.progress_bar.hide()
+        QMessageBox.warning(self, "Error", message)
+
+    def _on_task_progress(self, channel, generation, percent):
+        if generation == self._generations[channel]:
+            self.progress_bar.setValue(percent)
+
+    @instrumentation.timed('table.populate')
+    def populate_table(self, transactions, presorted=False):
+        self.table_model.set_transactions(transactions, presorted)
         self.clear_form()
 
+    def _selected_transaction_id(self):
+        """Returns the stored ID of the selected row, or None if nothing is selected."""
+        selected_rows = self.table.selectionModel().selectedRows()
+        if not selected_rows:
+            return None
+        return self.table_model.transaction_id(selected_rows[0].row())
+
+    def _selected_transaction_ids(self):
+        """Returns the stored IDs of every selected row."""
+        return [self.table_model.transaction_id(index.row())
+                for index in self.table.selectionModel().selectedRows()]
+
     def load_transactions(self):
-        all_transactions = get_transactions()
-        self._refresh_table_data(all_transactions)
+        """Reloads every transaction in the background, showing progress for long loads."""
+        self._run_in_background('table', self._show_all_transactions, get_transactions, with_progress=True)
+
+    def _show_all_transactions(self, transactions):
+        # Fresh data: earlier search results may hold stale rows
+        self._recent_searches = []
+        self._show_search_result(self._empty_query(), transactions)
+        # Get the keyword index ready before the user starts typing
+        self._run_in_background('index', lambda _: None, prepare_search)
+
+    def _empty_query(self):
+        return ("", "", None)
 
     def populate_form_from_selection(self):
         # ... (logic is the same, but now populates the type combo box) ...
@@ -139,15 +518,16 @@ class ExpenseTrackerApp(QMainWindow):
         if not selected_rows: return
         row_index = selected_rows[0].row()
         try:
+            values = self.table_model.row_values(row_index)
+
             # Set the type in the dropdown
-            trans_type = self.table.item(row_index, 1).text()
-            self.type_combo.setCurrentText(trans_type)
+            self.type_combo.setCurrentText(values['Type'])
 
-            date = QDate.fromString(self.table.item(row_index, 0).text(), "yyyy-MM-dd")
+            date = QDate.fromString(values['Date'], "yyyy-MM-dd")
             self.date_edit.setDate(date)
-            self.desc_edit.setText(self.table.item(row_index, 2).text())
-            self.cat_edit.setText(self.table.item(row_index, 3).text())
-            self.amount_edit.setText(self.table.item(row_index, 4).text())
+            self.desc_edit.setText(values['Description'])
+            self.cat_edit.setText(values['Category'])
+            self.amount_edit.setText(values['Amount'])
         except Exception as e:
             print(f"Error populating form: {e}")
             self.clear_form()
@@ -175,18 +555,17 @@ class ExpenseTrackerApp(QMainWindow):
             'Category': category, 'Amount': f"{float(amount_str):.2f}"
         }
 
-        transactions = get_transactions()
-        transactions.append(new_transaction)
-        save_all_transactions(transactions)
-        self.load_transactions()
+        self._run_edit(
+            lambda transaction_id: self._show_edit(added={**new_transaction, ID_FIELD: transaction_id}),
+            append_transaction, new_transaction,
+        )
 
     def update_transaction(self):
-        selected_rows = self.table.selectionModel().selectedRows()
-        if not selected_rows:
+        transaction_id = self._selected_transaction_id()
+        if not transaction_id:
             QMessageBox.warning(self, "Selection Error", "Please select an transaction to update.")
             return
-
-        row_index = selected_rows[0].row()
+        selected_row = (self.table.selectionModel().selectedRows()[0].row(), transaction_id)
 
         # Get updated data from the form
         trans_type = self.type_combo.currentText()
@@ -210,28 +589,59 @@ class ExpenseTrackerApp(QMainWindow):
             'Category': category, 'Amount': f"{amount:.2f}"
         }
 
-        transaction = get_transactions()
-        transaction[row_index] = updated_transaction
-        save_all_transactions(transaction)
-        self.load_transactions()
+        def on_updated(updated):
+            if not updated:
+                QMessageBox.warning(self, "Update Error", "This transaction no longer exists.")
+                self.load_transactions()
+                return
+            self._show_edit(removed=[selected_row], added={**updated_transaction, ID_FIELD: transaction_id})
+
+        self._run_edit(on_updated, _update_existing, transaction_id, updated_transaction)
 
     def delete_transaction(self):
-        selected_rows = self.table.selectionModel().selectedRows()
-        if not selected_rows:
+        transaction_ids = self._selected_transaction_ids()
+        selected_rows = [(index.row(), transaction_id) for index, transaction_id
+                         in zip(self.table.selectionModel().selectedRows(), transaction_ids)]
+        if not transaction_ids:
             QMessageBox.warning(self, "Selection Error", "Please select an transaction to delete.")
             return
 
-        row_index = selected_rows[0].row()
-
-        reply = QMessageBox.question(self, "Confirm Deletion",
-                                     "Are you sure you want to delete this transaction?",
+        if len(transaction_ids) == 1:
+            question = "Are you sure you want to delete this transaction?"
+        else:
+            question = f"Are you sure you want to delete these {len(transaction_ids)} transactions?"
+        reply = QMessageBox.question(self, "Confirm Deletion", question,
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
 
         if reply == QMessageBox.StandardButton.Yes:
-            transactions = get_transactions()
-            transactions.pop(row_index)  # Use pop() to remove the item
-            save_all_transactions(transactions)
+            def on_deleted(missing):
+                if missing:
+                    QMessageBox.warning(self, "Delete Error",
+                                        f"{missing} of the selected transactions no longer exist."
+                                        if len(transaction_ids) > 1 else "This transaction no longer exists.")
+                self._show_edit(removed=selected_rows)
+
+            self._run_edit(on_deleted, _delete_existing, transaction_ids)
+
+    def _show_edit(self, removed=(), added=None):
+        """
+        Shows a saved edit without reloading: drops the rows in `removed`
+        ((view row, ID) pairs from when the edit was made) and inserts `added`
+        at its sorted position. Falls back to a full reload unless the table
+        shows the whole, fully loaded ledger with those rows where they were.
+        """
+        if self._shown_query != self._empty_query() or self._shown_generation != self._generations['table'] \
+                or any(row >= self.table_model.rowCount() or self.table_model.transaction_id(row) != transaction_id
+                       for row, transaction_id in removed):
             self.load_transactions()
+            return
+        # Remembered search results no longer match the ledger
+        self._recent_searches = []
+        self.clear_form()
+        self.table_model.remove_rows([row for row, _ in removed])
+        if added is not None:
+            row = self.table_model.insert_transaction(added)
+            self.table.scrollTo(self.table_model.index(row, 0))
 
     def _create_search_bar(self):
         """Creates the search input fields and buttons."""
@@ -254,6 +664,18 @@ class ExpenseTrackerApp(QMainWindow):
             lambda state: self.search_date_edit.setEnabled(state == Qt.CheckState.Checked.value)
         )
 
+        # Search as the user types, once they pause for SEARCH_DEBOUNCE_MS
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.live_search)
+        self.search_keyword_edit.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_category_edit.textChanged.connect(lambda _: self.search_timer.start())
+        self.date_filter_check.stateChanged.connect(lambda _: self.search_timer.start())
+        self.search_date_edit.dateChanged.connect(
+            lambda _: self.search_timer.start() if self.date_filter_check.isChecked() else None
+        )
+
         self.search_button = QPushButton("Search")
         self.search_button.clicked.connect(self.perform_search)
         self.clear_search_button = QPushButton("Clear Search")
@@ -270,48 +692,124 @@ class ExpenseTrackerApp(QMainWindow):
 
         self.layout.addLayout(search_layout)
 
-    def perform_search(self):
-        """Executes the search and refreshes the table with sorted results."""
+    def _search_query(self):
+        """Returns the search bar's (keyword, category, filter_date)."""
         keyword = self.search_keyword_edit.text().strip()
         category = self.search_category_edit.text().strip()
 
         # Get the single date only if the checkbox is checked
         filter_date = self.search_date_edit.date().toPyDate() if self.date_filter_check.isChecked() else None
+        return keyword, category, filter_date
 
+    def perform_search(self):
+        """Executes the search and refreshes the table with sorted results."""
         # Error handling for an empty search
-        if not keyword and not category and not filter_date:
+        if self._search_query() == self._empty_query():
             QMessageBox.warning(self, "Empty Search", "Please enter a search term or select a date to filter.")
             return
+        self.search_timer.stop()
+        self.live_search()
+
+    def live_search(self):
+        """
+        Shows the rows matching the search bar. A query that only narrows a
+        recent one (a longer keyword, or an added category or date) filters
+        that earlier result in memory instead of searching the whole ledger.
+        """
+        query = self._search_query()
+        base = self._narrowest_recent_search(query)
+        if base is None:
+            instrumentation.cache_miss('search_cache')
+            if query == self._empty_query():
+                self.load_transactions()
+            else:
+                self._run_in_background('table', lambda result: self._show_search_result(query, result),
+                                        search_transactions, *query)
+            return
 
-        filtered_transactions = search_transactions(keyword, category, filter_date)
-        self._refresh_table_data(filtered_transactions)
+        instrumentation.cache_hit('search_cache')
+        base_query, base_rows, base_sort = base
+        presorted = base_sort == self.table_model.sort_key()
+        if base_query == query:
+            self._generations['table'] += 1  # Drop any search still running
+            self._show_search_result(query, base_rows, presorted=presorted)
+            return
+        # Only the filters that changed need checking against the earlier rows
+        keyword, category, filter_date = query
+        old_keyword, old_category, old_date = base_query
+        self._run_in_background(
+            'table',
+            lambda result: self._show_search_result(query, result, presorted=presorted),
+            refine_search, base_rows,
+            keyword if keyword != old_keyword else "",
+            category if category != old_category else "",
+            filter_date if filter_date != old_date else None
+        )
+
+    def _narrowest_recent_search(self, query):
+        """
+        Returns the remembered search for `query` itself, or else the smallest
+        (then newest) one that `query` narrows. None if there is none.
+        """
+        keyword, category, filter_date = query
+        candidates = [
+            entry for entry in reversed(self._recent_searches)
+            if entry[0][0].lower() in keyword.lower()
+            and entry[0][1].lower() in ("", category.lower())
+            and entry[0][2] in (None, filter_date)
+        ]
+        for entry in candidates:
+            if entry[0] == query:
+                return entry
+        return min(candidates, key=lambda entry: len(entry[1]), default=None)
+
+    def _show_search_result(self, query, transactions, presorted=False):
+        self._refresh_table_data(transactions, presorted)
+        self._shown_query = query
+        self._shown_generation = self._generations['table']
+        entry = (query, self.table_model.ordered_transactions(), self.table_model.sort_key())
+        self._recent_searches = [e for e in self._recent_searches if e[0] != query]
+        if query == self._empty_query():
+            self._recent_searches.insert(0, entry)
+        else:
+            self._recent_searches.append(entry)
+        # Keep the unfiltered list (if any) plus the newest results
+        pinned = 1 if self._recent_searches[0][0] == self._empty_query() else 0
+        while len(self._recent_searches) > pinned + SEARCH_CACHE_SIZE:
+            del self._recent_searches[pinned]
 
     def clear_search(self):
         """Clears search fields and reloads all expenses."""
         self.search_keyword_edit.clear()
         self.search_category_edit.clear()
         self.date_filter_check.setChecked(False)
+        self.search_timer.stop()
         self.load_transactions()
 
     def on_header_clicked(self, logicalIndex):
-        """Handles clicks on the table header to sort columns."""
-        # We only want to sort the 'Date' column, which is at index 0
-        if logicalIndex == 0:
+        """
+        Handles clicks on the table header to sort columns. Clicking the sorted
+        column again flips the direction; clicking another one sorts by it,
+        with the previous sort columns breaking ties.
+        """
+        sort_columns, _ = self.table_model.sort_key()
+        if logicalIndex == sort_columns[0]:
             # Toggle the sort order
             if self.sort_order == Qt.SortOrder.AscendingOrder:
                 self.sort_order = Qt.SortOrder.DescendingOrder
             else:
                 self.sort_order = Qt.SortOrder.AscendingOrder
+        else:
+            self.sort_order = Qt.SortOrder.AscendingOrder
 
-            # Re-sort and refresh the *currently visible* data
-            self._refresh_table_data(self.current_transactions)
-
-            # Update the table with the sorted data
-            self.populate_table(self.current_transactions)
+        # Re-sort the *currently visible* rows in the model
+        self.table_model.sort(logicalIndex, self.sort_order)
+        self._update_sort_indicator()
 
     def show_summary(self):
-        summary_text = get_summary_text()
+        self._run_in_background('summary', self._show_summary_text, get_summary_text)
 
+    def _show_summary_text(self, summary_text):
         # Create a monospaced font for perfect alignment
         mono_font = QFont()
         mono_font.setFamily("Courier New")
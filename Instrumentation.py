@@ -0,0 +1,264 @@
+"""
+Timers, counters and profiling hooks for the tracker's hot paths.
+
+Set MONEYTRACKER_INSTRUMENT=1 to turn them on. When it is off, timed()
+hands functions back unwrapped and span()/count()/cache_hit()/cache_miss()
+are bound to no-ops at import, so an instrumented call costs at most one
+empty function call.
+
+Other settings:
+  MONEYTRACKER_INSTRUMENT_REPORT=path   write the report there at exit
+                                        (.json for JSON, anything else as text)
+  MONEYTRACKER_PROFILE=name[,name...]   run those timed operations under
+                                        cProfile, saving <name>.prof files
+
+profiled() and traced() work whether or not instrumentation is on, for
+wrapping any one operation by hand.
+"""
+import atexit
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+# --- Settings ---
+ENABLED = os.environ.get('MONEYTRACKER_INSTRUMENT', '') not in ('', '0')
+REPORT_PATH = os.environ.get('MONEYTRACKER_INSTRUMENT_REPORT')
+PROFILE_OPERATIONS = {name.strip() for name in os.environ.get('MONEYTRACKER_PROFILE', '').split(',') if name.strip()}
+
+_lock = threading.Lock()
+_timings = {}  # operation -> [calls, total seconds, max seconds]
+_counters = {}  # name -> int
+_gauges = {}  # name -> callable returning a JSON-able value at report time
+
+
+# --- Recording ---
+def _record(name, seconds):
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = [0, 0.0, 0.0]
+        timing[0] += 1
+        timing[1] += seconds
+        if seconds > timing[2]:
+            timing[2] = seconds
+
+
+def _count(name, amount=1):
+    """Adds `amount` to counter `name` (rows scanned, bytes read, ...)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+class _Span:
+    """Times a with-block as one call of an operation."""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def _timed(name):
+    """Decorator: records every call of the function as operation `name`."""
+    def decorate(fn):
+        profile_path = f"{name}.prof" if name in PROFILE_OPERATIONS else None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                if profile_path is not None:
+                    with profiled(profile_path):
+                        return fn(*args, **kwargs)
+                return fn(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def _untimed(name):
+    def decorate(fn):
+        return fn
+    return decorate
+
+
+def _no_count(name, amount=1):
+    pass
+
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+def _no_span(name):
+    return _NO_SPAN
+
+
+if ENABLED:
+    timed = _timed
+    span = _Span
+    count = _count
+else:
+    timed = _untimed
+    span = _no_span
+    count = _no_count
+
+
+def cache_hit(name):
+    """Records a hit for cache `name`; the report turns hits and misses into a hit rate."""
+    count(name + '.hits')
+
+
+def cache_miss(name):
+    """Records a miss for cache `name`."""
+    count(name + '.misses')
+
+
+if not ENABLED:
+    cache_hit = cache_miss = _no_count
+
+
+def register_gauge(name, fn):
+    """Adds fn() to every report under `name`, for state that's cheaper to read than to count."""
+    _gauges[name] = fn
+
+
+# --- Reports ---
+def report():
+    """
+    Returns everything recorded so far: per-operation timings, counters,
+    cache hit rates and gauges.
+    """
+    with _lock:
+        timings = {name: list(timing) for name, timing in _timings.items()}
+        counters = dict(_counters)
+    operations = {
+        name: {
+            'calls': calls,
+            'total_seconds': total,
+            'mean_seconds': total / calls if calls else 0.0,
+            'max_seconds': longest,
+        }
+        for name, (calls, total, longest) in sorted(timings.items())
+    }
+    hit_rates = {}
+    for name in sorted(counters):
+        if name.endswith('.hits') or name.endswith('.misses'):
+            cache = name.rsplit('.', 1)[0]
+            hits, misses = counters.get(cache + '.hits', 0), counters.get(cache + '.misses', 0)
+            hit_rates[cache] = {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses)}
+    gauges = {}
+    for name, fn in _gauges.items():
+        try:
+            gauges[name] = fn()
+        except Exception as e:
+            gauges[name] = f"error: {e}"
+    return {
+        'enabled': ENABLED,
+        'operations': operations,
+        'counters': dict(sorted(counters.items())),
+        'cache_hit_rates': hit_rates,
+        'gauges': gauges,
+    }
+
+
+def format_report(data=None):
+    """Renders report() as a plain-text table."""
+    data = data or report()
+    lines = [f"{'operation':<32} {'calls':>8} {'total ms':>11} {'mean ms':>10} {'max ms':>10}"]
+    for name, timing in data['operations'].items():
+        lines.append(f"{name:<32} {timing['calls']:>8} {timing['total_seconds'] * 1000:>11.1f} "
+                     f"{timing['mean_seconds'] * 1000:>10.2f} {timing['max_seconds'] * 1000:>10.2f}")
+    if data['counters']:
+        lines.append("")
+        lines.extend(f"{name:<32} {value:>12,}" for name, value in data['counters'].items())
+    if data['cache_hit_rates']:
+        lines.append("")
+        lines.extend(f"{name:<32} {rate['hit_rate']:>11.1%} of {rate['hits'] + rate['misses']:,}"
+                     for name, rate in data['cache_hit_rates'].items())
+    if data['gauges']:
+        lines.append("")
+        lines.extend(f"{name:<32} {value}" for name, value in data['gauges'].items())
+    return "\n".join(lines)
+
+
+def export_report(path):
+    """Writes the report to `path`: JSON if it ends in .json, the text table otherwise."""
+    data = report()
+    with open(path, 'w') as report_file:
+        if path.endswith('.json'):
+            json.dump(data, report_file, indent=2)
+        else:
+            report_file.write(format_report(data) + "\n")
+
+
+def reset():
+    """Forgets everything recorded so far."""
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+# --- On-demand profiling ---
+@contextlib.contextmanager
+def profiled(path=None, sort='cumulative', limit=30):
+    """
+    Runs the with-block under cProfile. Saves raw stats to `path` if given
+    (open them with pstats or snakeviz), otherwise prints the top `limit`
+    entries to stderr.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        else:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+            print(output.getvalue(), file=sys.stderr)
+
+
+@contextlib.contextmanager
+def traced(label='', limit=10):
+    """
+    Runs the with-block under tracemalloc and prints its peak traced memory
+    plus the `limit` biggest allocation sites still alive at the end.
+    """
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+        if not already_tracing:
+            tracemalloc.stop()
+        print(f"{label or 'traced block'}: peak {peak / 1e6:.1f} MB, {current / 1e6:.1f} MB still allocated",
+              file=sys.stderr)
+        for stat in top:
+            print(f"  {stat}", file=sys.stderr)
+
+
+if ENABLED and REPORT_PATH:
+    atexit.register(export_report, REPORT_PATH)
@@ -1,17 +1,48 @@
+"""
+MoneyTracker entry point.
+
+With no arguments (or `gui`) this opens the desktop app. Any other command
+runs headless on top of Code_Function and never imports Qt, so it works on
+servers without a display and starts quickly enough to run from cron:
+
+    python MoneySpending.py import bank.csv --skip-malformed
+    python MoneySpending.py search --category Food --from 2024-01-01 --format csv
+    python MoneySpending.py summary
+    python MoneySpending.py report --period month --by-category --from 2024-01-01
+    python MoneySpending.py --ledger other.csv export --output backup.csv
+
+Results go to stdout (or --output) as JSON or CSV; errors go to stderr with
+exit status 1.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
 import sys
-from PyQt6.QtWidgets import QApplication
 
-# --- Import the GUI class and the initialization function ---
-from GUI import ExpenseTrackerApp
-from Code_Function import initialize_csv
+import Code_Function
+from Code_Function import (
+    STORAGE_FIELDNAMES,
+    bulk_import_csv,
+    get_summary_text,
+    get_summary_totals,
+    get_transactions,
+    initialize_storage,
+    rollup_transactions,
+    search_transactions,
+)
+from ledger import config
 
-# --- Application Entry Point ---
-if __name__ == "__main__":
-    # Ensure the CSV file exists before starting the app
-    initialize_csv()
+
+# --- GUI mode ---
+def run_gui():
+    # Qt is only imported here, so headless commands never load it
+    from PyQt6.QtWidgets import QApplication
+    from GUI import ExpenseTrackerApp
 
     # Create the application object
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1])
 
     # Create an instance of our main window
     main_window = ExpenseTrackerApp()
@@ -20,4 +51,200 @@ if __name__ == "__main__":
     main_window.show()
 
     # Start the application's event loop
-    sys.exit(app.exec())
\ No newline at end of file
+    return app.exec()
+
+
+# --- Output helpers ---
+def _write_rows(rows, fieldnames, output_format, output):
+    """Writes dict rows as a JSON array or as CSV with a header, one row at a time."""
+    if output_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+        return
+    output.write('[')
+    separator = '\n'
+    for row in rows:
+        output.write(separator + json.dumps(dict(row), ensure_ascii=False))
+        separator = ',\n'
+    output.write('\n]\n' if separator != '\n' else ']\n')
+
+
+def _write_json(data, output):
+    json.dump(data, output, indent=2, ensure_ascii=False)
+    output.write('\n')
+
+
+# --- Commands ---
+def cmd_import(args, output):
+    result = bulk_import_csv(args.file, workers=args.workers, skip_malformed=args.skip_malformed)
+    _write_json(result, output)
+
+
+def cmd_search(args, output):
+    rows = search_transactions(keyword=args.keyword, category=args.category, filter_date=args.date,
+                               date_from=args.date_from, date_to=args.date_to, trans_type=args.type)
+    if args.limit is not None:
+        rows = rows[:args.limit]
+    _write_rows(rows, STORAGE_FIELDNAMES, args.format, output)
+
+
+def cmd_summary(args, output):
+    if args.format == 'text':
+        output.write(get_summary_text() + '\n')
+    else:
+        _write_json(get_summary_totals(), output)
+
+
+def cmd_report(args, output):
+    rows = rollup_transactions(args.period, args.by_category, args.date_from, args.date_to)
+    fieldnames = ['Period'] + (['Category'] if args.by_category else []) + ['Income', 'Expense']
+    _write_rows(rows, fieldnames, args.format, output)
+
+
+def cmd_export(args, output):
+    if args.date_from or args.date_to:
+        rows = search_transactions(date_from=args.date_from, date_to=args.date_to)
+    else:
+        rows = get_transactions()
+    _write_rows(rows, STORAGE_FIELDNAMES, args.format, output)
+
+
+# --- Argument parsing ---
+def _iso_date(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {text!r}")
+
+
+def _add_date_range(parser):
+    parser.add_argument('--from', dest='date_from', type=_iso_date, metavar='YYYY-MM-DD',
+                        help="only rows on or after this date")
+    parser.add_argument('--to', dest='date_to', type=_iso_date, metavar='YYYY-MM-DD',
+                        help="only rows on or before this date")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='MoneySpending.py',
+        description="MoneyTracker. Without a command, opens the desktop app.")
+    parser.add_argument('--backend', choices=('csv', 'sqlite', 'partitioned'),
+                        help="storage backend (default: $MONEYTRACKER_BACKEND or csv)")
+    parser.add_argument('--ledger', metavar='PATH',
+                        help="ledger CSV, SQLite database or partition directory to use "
+                             "instead of the default in the current directory")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--output', '-o', metavar='PATH', help="write results here instead of stdout")
+
+    commands.add_parser('gui', help="open the desktop app (the default)")
+
+    importer = commands.add_parser('import', parents=[output], help="append a bank CSV export to the ledger")
+    importer.add_argument('file', help="CSV with Date, Type, Description, Category, Amount columns")
+    importer.add_argument('--workers', type=int, help="parser processes (default: one per CPU)")
+    importer.add_argument('--skip-malformed', action='store_true',
+                          help="drop rows with unparseable dates or amounts, or no category, instead of importing them")
+
+    search = commands.add_parser('search', parents=[output], help="list matching transactions")
+    search.add_argument('--keyword', default='', help="text to find in Description")
+    search.add_argument('--category', default='', help="exact category")
+    search.add_argument('--type', default='', choices=('Income', 'Expense'))
+    search.add_argument('--date', type=_iso_date, metavar='YYYY-MM-DD', help="exact date")
+    _add_date_range(search)
+    search.add_argument('--limit', type=int, help="return at most this many rows")
+    search.add_argument('--format', choices=('json', 'csv'), default='json')
+
+    summary = commands.add_parser('summary', parents=[output], help="overall income, expenses and per-category totals")
+    summary.add_argument('--format', choices=('json', 'text'), default='json')
+
+    report = commands.add_parser('report', parents=[output], help="income vs expense per period over a date range")
+    report.add_argument('--period', choices=Code_Function.ROLLUP_PERIODS, default='month')
+    report.add_argument('--by-category', action='store_true', help="one row per period and category")
+    _add_date_range(report)
+    report.add_argument('--format', choices=('json', 'csv'), default='json')
+
+    export = commands.add_parser('export', parents=[output], help="dump the ledger (or a date range of it)")
+    _add_date_range(export)
+    export.add_argument('--format', choices=('csv', 'json'), default='csv')
+    return parser
+
+
+# Commands that only read the ledger. They leave everything on disk as it is:
+# no ledger is created, and no migration, compaction or cache file is written.
+READ_ONLY_COMMANDS = ('search', 'summary', 'report', 'export')
+
+COMMANDS = {
+    'import': cmd_import,
+    'search': cmd_search,
+    'summary': cmd_summary,
+    'report': cmd_report,
+    'export': cmd_export,
+}
+
+
+def _ledger_path():
+    """Returns the ledger path of the selected backend."""
+    backend = Code_Function.STORAGE_BACKEND
+    if backend == 'sqlite':
+        return Code_Function.SQLITE_FILE
+    if backend == 'partitioned':
+        return Code_Function.PARTITION_DIR
+    return Code_Function.CSV_FILE
+
+
+def _select_storage(args):
+    """
+    Points Code_Function at the requested backend and ledger path.
+    Returns False if a read-only command has no ledger to read.
+    """
+    if args.backend:
+        Code_Function.set_backend(args.backend)
+    if args.ledger:
+        backend = Code_Function.STORAGE_BACKEND
+        if backend == 'sqlite':
+            Code_Function.SQLITE_FILE = args.ledger
+        elif backend == 'partitioned':
+            Code_Function.PARTITION_DIR = args.ledger
+        else:
+            Code_Function.CSV_FILE = args.ledger
+    config.READ_ONLY = args.command in READ_ONLY_COMMANDS
+    # Only an import or the app may start a new ledger; anything else on a missing path is most likely a typo
+    return not config.READ_ONLY or os.path.exists(_ledger_path())
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not _select_storage(args):
+        print(f"MoneySpending.py: no ledger at {_ledger_path()}", file=sys.stderr)
+        return 1
+    # Ensure the storage (CSV file or SQLite database) exists. A SQLite or
+    # partitioned ledger named with --ledger starts empty instead of being
+    # seeded from ./expenses.csv, and is created on its first write.
+    # The read-only commands only ever open an existing one.
+    if not config.READ_ONLY and (not args.ledger or Code_Function.STORAGE_BACKEND == 'csv'):
+        initialize_storage()
+    if args.command in (None, 'gui'):
+        return run_gui()
+
+    try:
+        if args.output:
+            with open(args.output, 'w', newline='', encoding='utf-8') as output:
+                COMMANDS[args.command](args, output)
+        else:
+            COMMANDS[args.command](args, sys.stdout)
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (e.g. `| head`) went away; stop quietly instead of a traceback at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"MoneySpending.py {args.command}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+# --- Application Entry Point ---
+if __name__ == "__main__":
+    sys.exit(main())
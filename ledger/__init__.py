@@ -0,0 +1 @@
+"""Storage and query engines behind Code_Function."""
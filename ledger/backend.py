@@ -0,0 +1,122 @@
+"""Base class of the storage backends, and the registry of open ledgers."""
+import contextlib
+import functools
+import os
+import threading
+
+from ledger.index import _description_tokens, _tokens_match
+from ledger.records import _date_bounds, _filter_transactions, _parse_date_ordinal
+from ledger.totals import _category_totals, _dated_entries, _rollup, _same_totals
+
+
+class LedgerBackend:
+    """Interface shared by the storage backends, with plain linear defaults for the queries."""
+
+    def transactions(self, progress=None):
+        """
+        Returns every stored transaction as a sequence of row mappings
+        (plain dicts, or TransactionRow views). Backends that
+        read incrementally call progress(done, total) as they go; the
+        callback may raise to abandon the read.
+        """
+        raise NotImplementedError
+
+    def append(self, transactions):
+        """Stores new transactions. Returns their IDs."""
+        raise NotImplementedError
+
+    def update(self, transaction_id, transaction):
+        """Replaces the transaction with the given ID. Raises KeyError if it's gone."""
+        raise NotImplementedError
+
+    def delete(self, transaction_id):
+        """Deletes the transaction with the given ID. Raises KeyError if it's gone."""
+        raise NotImplementedError
+
+    def replace_all(self, transactions):
+        """Replaces the whole ledger with the given transactions."""
+        raise NotImplementedError
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Groups the edits made in the with-block. Backends with a write
+        journal commit them as one unit; the others just apply them as they come.
+        """
+        yield self
+
+    def append_parsed(self, parts):
+        """
+        Stores rows that were already parsed and encoded elsewhere, e.g. by
+        bulk_import_csv's worker processes. Each part is (encoded, store):
+        the rows' CSV bytes and a TransactionStore over them whose offsets
+        are relative to those bytes. Returns the number of rows added.
+        """
+        rows = [dict(store.row(p)) for _, store in parts for p in range(len(store))]
+        return len(self.append(rows))
+
+    def search(self, keyword="", category="", filter_date=None, date_from=None, date_to=None,
+               trans_type=""):
+        """Returns the transactions matching every given filter. Date bounds are inclusive."""
+        return _filter_transactions(
+            self.transactions(), keyword, category, filter_date, date_from, date_to, trans_type
+        )
+
+    def prepare_search(self):
+        """Builds whatever keyword-search index the backend keeps in memory; searches use it from then on."""
+
+    def search_terms(self, terms, prefix=True):
+        """Returns the transactions whose Description has every term as a word (or word prefix)."""
+        return [
+            t for t in self.transactions()
+            if _tokens_match(_description_tokens(t.get('Description')), terms, prefix)
+        ]
+
+    def rollup(self, period='month', by_category=False, date_from=None, date_to=None):
+        """Returns per-period income and expense totals; see rollup_transactions()."""
+        low, high = _date_bounds(None, date_from, date_to)
+        dated_rows = []
+        for row in self.transactions():
+            ordinal = _parse_date_ordinal(row.get('Date'))
+            if ordinal is None or (low is not None and ordinal < low) or (high is not None and ordinal > high):
+                continue
+            dated_rows.append((ordinal, row))
+        return _rollup(_dated_entries(dated_rows), period, by_category)
+
+    def summary_totals(self):
+        """Returns (row_count, income_categories, expense_categories) for get_summary_text."""
+        return _category_totals(self.transactions())
+
+    def check_summary_totals(self):
+        """
+        Compares summary_totals() against a full recompute from the stored
+        rows. Returns True when they agree to the cent.
+        """
+        actual = self.summary_totals()
+        expected = _category_totals(self.transactions())
+        return _same_totals(expected, actual)
+
+
+def _synchronized(method):
+    """Runs a ledger method under the ledger's lock, so worker threads can share it."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Open ledgers by absolute path, shared by everything in the process.
+_ledgers = {}
+# Held while looking up or opening a ledger, so two threads asking for the
+# same path at once still share one instance.
+_ledgers_lock = threading.Lock()
+
+
+def shared_ledger(cls, path):
+    """Returns the open `cls` ledger for `path`, opening it on first use."""
+    path = os.path.abspath(path)
+    with _ledgers_lock:
+        if path not in _ledgers:
+            _ledgers[path] = cls(path)
+        return _ledgers[path]
@@ -0,0 +1,163 @@
+"""
+Parallel import of large CSV exports.
+
+A large export is split into byte ranges, each cut where a record
+probably begins (only a few lines around each cut are read), parsed in
+parallel worker processes, and the parsed columns are merged straight into
+the ledger. A chunk whose cut turns out wrong is parsed again. Scripts that import this way must guard their
+entry point with `if __name__ == '__main__':` (worker processes re-import
+the main module on Windows and macOS).
+"""
+import csv
+import itertools
+import mmap
+import os
+
+import Instrumentation as instrumentation
+
+from ledger import config
+from ledger.records import (
+    FIELDNAMES, ID_FIELD, STORAGE_FIELDNAMES, _iter_records, _parse_amount, _parse_date_ordinal,
+    _read_header, new_transaction_id,
+)
+from ledger.store import TransactionStore
+
+
+# _record_cuts tries this many lines past each nominal cut, within this many bytes.
+_CUT_PROBES = 16
+_CUT_WINDOW = 64 * 1024
+
+
+def _chunk_ranges(path, start, chunk_bytes, field_count):
+    """
+    Splits path[start:] into (start, end) byte ranges of about chunk_bytes
+    each, cut where a record probably begins (see _record_cuts).
+    """
+    with open(path, 'rb') as csvfile:
+        size = os.fstat(csvfile.fileno()).st_size
+        if size - start <= chunk_bytes:
+            return [(start, size)] if start < size else []
+        with mmap.mmap(csvfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            cuts = _record_cuts(data, start, chunk_bytes, field_count)
+    bounds = [start] + cuts + [size]
+    return list(zip(bounds, bounds[1:]))
+
+
+def _record_cuts(data, start, chunk_bytes, field_count):
+    """
+    Offsets after `start`, about chunk_bytes apart, where a record probably
+    begins in `data`: the first of the next few lines past each nominal cut
+    that parses as a record of field_count values (a line inside a quoted
+    multi-line field rarely does), or else just the first line. Only those
+    lines are read; import_csv checks every cut against where the records
+    before it really ended.
+    """
+    cuts = []
+    position = start
+    while position + chunk_bytes < len(data):
+        line = data.find(b'\n', position + chunk_bytes - 1) + 1
+        if not line or line >= len(data):
+            break
+        lines = data[line:line + _CUT_WINDOW].split(b'\n')[:_CUT_PROBES + 1]
+        texts = [text.decode('utf-8', 'replace') + '\n' for text in lines]
+        offsets = itertools.accumulate((len(text) + 1 for text in lines), initial=line)
+        cut = line
+        # The window's last line may be cut short, so it is only read as part of an earlier record.
+        for index, offset in zip(range(len(lines) - 1), offsets):
+            if len(next(csv.reader(itertools.islice(texts, index, None)), ())) == field_count:
+                cut = offset
+                break
+        position = cut
+        cuts.append(cut)
+    return cuts
+
+
+def _parse_chunk(path, start, end, header, skip_malformed):
+    """
+    Worker for bulk_import_csv: parses the records of `path` that begin at
+    or after `start` and before `end` into ledger rows with fresh IDs (the
+    last one may run past `end`). Returns (stats, encoded, store_snapshot):
+    the chunk's error counts, the rows as ledger CSV bytes, and a
+    TransactionStore over those bytes (as snapshot() parts, since a store
+    can't be pickled). stats['end'] is where the next record begins.
+
+    Rows get_summary_text would skip (bad Amount or no Category) are counted,
+    and are left out as well when skip_malformed is set. So are rows with a
+    malformed Date.
+    """
+    stats = {'start': start, 'end': end, 'rows': 0, 'imported': 0,
+             'bad_dates': 0, 'bad_amounts': 0, 'missing_categories': 0}
+    lines = []
+    writer = csv.DictWriter(_LineCollector(lines), fieldnames=STORAGE_FIELDNAMES)
+    store = TransactionStore()
+    offset = 0
+    with open(path, 'rb') as source:
+        stats['end'] = os.fstat(source.fileno()).st_size
+        source.seek(start)
+        for record_offset, _, parsed in _iter_records(source, header):
+            if record_offset >= end:
+                stats['end'] = record_offset
+                break
+            stats['rows'] += 1
+            row = {field: parsed.get(field) or '' for field in FIELDNAMES}
+            malformed = False
+            if _parse_date_ordinal(row['Date']) is None:
+                stats['bad_dates'] += 1
+                malformed = True
+            if _parse_amount(row['Amount']) is None:
+                stats['bad_amounts'] += 1
+                malformed = True
+            if not row['Category']:
+                stats['missing_categories'] += 1
+                malformed = True
+            if malformed and skip_malformed:
+                continue
+            row[ID_FIELD] = new_transaction_id()
+            writer.writerow(row)
+            encoded = lines[-1] = lines[-1].encode('utf-8')
+            store.add(row, offset, len(encoded))
+            offset += len(encoded)
+            stats['imported'] += 1
+    return stats, b''.join(lines), store.snapshot()
+
+
+class _LineCollector:
+    """File-like target for csv writers that keeps each written record as one list item."""
+
+    def __init__(self, lines):
+        self.write = lines.append
+
+
+@instrumentation.timed('import.bulk')
+def import_csv(backend, source_path, workers=None, skip_malformed=False):
+    """Appends a CSV export to `backend`, as Code_Function.bulk_import_csv() describes."""
+    workers = workers or os.cpu_count() or 1
+    with open(source_path, 'rb') as source:
+        header = _read_header(source)
+        start = source.tell()
+        size = os.fstat(source.fileno()).st_size
+    chunk_bytes = max(config.IMPORT_MIN_CHUNK_BYTES, min(config.IMPORT_CHUNK_BYTES, -(-(size - start) // workers)))
+    ranges = _chunk_ranges(source_path, start, chunk_bytes, len(header))
+
+    if workers == 1 or len(ranges) <= 1:
+        results = [_parse_chunk(source_path, low, high, header, skip_malformed) for low, high in ranges]
+    else:
+        import concurrent.futures  # imported here so scripts that never bulk-import start faster
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            futures = [pool.submit(_parse_chunk, source_path, low, high, header, skip_malformed)
+                       for low, high in ranges]
+            results = [future.result() for future in futures]
+
+    # A chunk must start where the one before it really ended; one whose cut
+    # was guessed wrong is parsed again from there.
+    for index, (low, high) in enumerate(ranges):
+        if index and results[index][0]['start'] != results[index - 1][0]['end']:
+            instrumentation.count('import.chunks_reparsed')
+            results[index] = _parse_chunk(source_path, results[index - 1][0]['end'], high, header, skip_malformed)
+
+    parts = []
+    for _, encoded, (metadata, columns) in results:
+        parts.append((encoded, TransactionStore.from_snapshot(metadata, columns)))
+    imported = backend.append_parsed(parts)
+    instrumentation.count('import.rows', imported)
+    return {'imported': imported, 'chunks': [stats for stats, _, _ in results]}
@@ -0,0 +1,47 @@
+"""
+Settings the ledger modules read when they run. Assign to them (e.g.
+`config.USE_NUMPY = False`) to change how the ledger behaves.
+"""
+import importlib.util
+import os
+
+# --- Reading and rewriting CSV files ---
+# Records are read from disk in blocks of about this many bytes of whole lines.
+READ_BLOCK = 1024 * 1024
+# Bytes copied at a time when a rewrite carries records over from the old file.
+COPY_BLOCK = 1024 * 1024
+# Edits are logged to a journal next to the CSV (`<file>.journal`) and folded
+# into the file with a full rewrite once the journal holds this many edited
+# rows or this many bytes, and at exit.
+JOURNAL_MAX_EDITS = 1000
+JOURNAL_MAX_BYTES = 1024 * 1024
+# Deleted and replaced rows stay in memory, flagged dead, until there are more
+# of them than live rows (and at least this many); then the file is re-parsed.
+RELOAD_MIN_DEAD_ROWS = 10000
+# Set by callers that only read. Ledgers are then loaded (and journals
+# replayed) in memory only: nothing on disk is created, migrated, compacted
+# or cached.
+READ_ONLY = False
+
+# --- Snapshots ---
+# The parsed ledger is also saved as a binary snapshot next to the CSV
+# (`<file>.snapshot`), so the next start can skip parsing. It is refreshed
+# this many seconds after the last write.
+SNAPSHOT_DELAY = 2.0
+# Bytes hashed from each end of the CSV to tell whether a snapshot still matches it.
+SNAPSHOT_SAMPLE = 64 * 1024
+
+# --- Engines ---
+# Use the vectorized NumPy engine for summaries and filters when NumPy is
+# installed. Set MONEYTRACKER_NUMPY=0 to force the pure-Python path.
+USE_NUMPY = importlib.util.find_spec('numpy') is not None and os.environ.get('MONEYTRACKER_NUMPY', '1') != '0'
+
+# --- Partitions ---
+# Whether a new partitioned ledger gets a file per 'month' or per 'year'.
+PARTITION_PERIOD = 'month'
+
+# --- Bulk import ---
+# bulk_import_csv() hands each worker process about this many bytes of the
+# source file (fewer when that would leave workers idle).
+IMPORT_CHUNK_BYTES = 16 * 1024 * 1024
+IMPORT_MIN_CHUNK_BYTES = 256 * 1024
@@ -0,0 +1,769 @@
+"""
+Ledger kept in one CSV file.
+
+Edits never write to the CSV directly. Each one is applied in memory and
+appended to a journal (`<file>.journal`), one fsynced JSON line per call or
+batch(). The journal is compacted into the file by writing the live rows
+to a temp file and renaming it over the CSV, so a crash leaves either the
+old file and its journal or the new file; loading replays any journal it
+finds. Summary totals (`<file>.summary.json`) and the parsed store
+(`<file>.snapshot`) are cached next to the file, stamped so a stale cache
+is never used.
+"""
+import array
+import bisect
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import threading
+
+import Instrumentation as instrumentation
+
+from ledger import config
+from ledger.backend import LedgerBackend, _synchronized
+from ledger.numpy_engine import _np_filter_positions, _store_totals
+from ledger.records import (
+    ID_FIELD, STORAGE_FIELDNAMES, _copy_range, _date_bounds, _date_text, _encode_rows,
+    _iter_record_blocks, _read_header, _row_from_values, _storage_columns, _with_ids, _write_all,
+    initialize_csv, new_transaction_id,
+)
+from ledger.snapshot import _pack_snapshot, _unpack_snapshot
+from ledger.store import TransactionRows, TransactionStore
+from ledger.totals import CategoryTotals, _rollup
+
+
+class CsvLedger(LedgerBackend):
+    """ID-indexed access to a ledger CSV file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.summary_path = path + '.summary.json'
+        self.snapshot_path = path + '.snapshot'
+        self.journal_path = path + '.journal'
+        self._lock = threading.RLock()
+        self._header = STORAGE_FIELDNAMES
+        self._store = TransactionStore()
+        self._unwritten = {}  # position -> encoded record, for rows only the journal holds
+        self._date_ordinals = array.array('l')
+        self._date_positions = array.array('l')
+        self._dates_stale = False
+        self._signature = None
+        self._totals = None
+        self._totals_signature = None
+        self._snapshot_timer = None
+        self._journal_edits = 0  # rows edited through the journal since the last compaction
+        self._batch_depth = 0
+        self._batch_entries = {}
+
+    def _current_signature(self):
+        """Returns (size, mtime_ns) of the CSV plus the journal's size, or None if there's no CSV."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns, self._journal_size())
+
+    def _journal_size(self):
+        try:
+            return os.stat(self.journal_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    @instrumentation.timed('csv.load')
+    def _load(self, progress=None, use_snapshot=True):
+        """
+        Scans the whole file, rebuilding the store and indexes.
+        progress(bytes_read, total_bytes) is called after every block read.
+        A fresh snapshot is used instead when there is one (and use_snapshot is set).
+        Either way, edits left in the journal are replayed on top.
+        """
+        if use_snapshot and self._restore_snapshot():
+            self._replay_journal()
+            return
+        for _ in range(2):
+            store = TransactionStore()
+            legacy_rows = None
+            with open(self.path, 'rb') as csvfile:
+                total_bytes = os.fstat(csvfile.fileno()).st_size
+                header = _read_header(csvfile)
+                id_column = dict(zip(header, range(len(header)))).get(ID_FIELD)
+                if id_column is None:
+                    legacy_rows = []
+                for offsets, lengths, rows in _iter_record_blocks(csvfile):
+                    if legacy_rows is None:
+                        ids = [values[id_column] if len(values) > id_column else None for values in rows]
+                        if all(ids) and len(set(ids)) == len(ids) and store.positions.keys().isdisjoint(ids):
+                            store.add_records(header, offsets, lengths, rows)
+                        else:
+                            legacy_rows = [dict(store.row(p)) for p in range(len(store))]
+                    if legacy_rows is not None:
+                        legacy_rows.extend(_row_from_values(header, values) for values in rows)
+                    if progress is not None:
+                        progress(offsets[-1] + lengths[-1], total_bytes)
+                size = csvfile.seek(0, os.SEEK_END)
+
+            if legacy_rows is None:
+                break
+            # Legacy file (or hand-edited rows): give every row a unique ID once.
+            seen = set()
+            for row in legacy_rows:
+                if not row.get(ID_FIELD) or row[ID_FIELD] in seen:
+                    row[ID_FIELD] = new_transaction_id()
+                seen.add(row[ID_FIELD])
+            if config.READ_ONLY:
+                store = TransactionStore()
+                for row in legacy_rows:
+                    store.add(row)
+                break
+            _write_all(self.path, legacy_rows, _storage_columns(header))
+
+        instrumentation.count('csv.bytes_read', size)
+        instrumentation.count('csv.rows_parsed', len(store))
+        self._header = header
+        self._store = store
+        self._unwritten = {}
+        self._rebuild_date_index()
+        self._signature = self._current_signature()
+        self._totals = _store_totals(store)
+        self._totals_signature = self._signature
+        self._save_totals()
+        self._schedule_snapshot()
+        self._replay_journal()
+
+    def _snapshot_key(self):
+        """Returns [size, mtime_ns, sampled hash] of the CSV file, or None if it's missing."""
+        try:
+            with open(self.path, 'rb') as csvfile:
+                st = os.fstat(csvfile.fileno())
+                digest = hashlib.blake2b(csvfile.read(config.SNAPSHOT_SAMPLE), digest_size=16)
+                if st.st_size > config.SNAPSHOT_SAMPLE:
+                    csvfile.seek(max(config.SNAPSHOT_SAMPLE, st.st_size - config.SNAPSHOT_SAMPLE))
+                    digest.update(csvfile.read())
+        except FileNotFoundError:
+            return None
+        return [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+
+    @instrumentation.timed('snapshot.restore')
+    def _restore_snapshot(self):
+        """Loads the store and indexes from a snapshot matching the file. Returns False if there is none."""
+        key = self._snapshot_key()
+        if key is None:
+            return False
+        try:
+            with open(self.snapshot_path, 'rb') as snapshot_file, \
+                    mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+                unpacked = _unpack_snapshot(snapshot, key)
+                instrumentation.count('snapshot.bytes_read', len(snapshot))
+            if unpacked is None:
+                instrumentation.cache_miss('snapshot')
+                return False
+            metadata, columns = unpacked
+            store = TransactionStore.from_snapshot(metadata['store'], columns)
+            totals = metadata['totals'] and CategoryTotals.from_dict(metadata['totals'])
+            header = metadata['header']
+            date_ordinals, date_positions = columns['date_ordinals'], columns['date_positions']
+        except (OSError, ValueError, KeyError, TypeError):
+            instrumentation.cache_miss('snapshot')
+            return False
+
+        instrumentation.cache_hit('snapshot')
+        self._header = header
+        self._store = store
+        self._unwritten = {}
+        self._date_ordinals = date_ordinals
+        self._date_positions = date_positions
+        self._dates_stale = False
+        self._signature = (key[0], key[1], self._journal_size())
+        if totals is None:
+            totals = _store_totals(store)
+        self._totals = totals
+        self._totals_signature = self._signature
+        self._save_totals()
+        return True
+
+    def _schedule_snapshot(self):
+        """Refreshes the snapshot SNAPSHOT_DELAY seconds from now, unless a refresh is already due."""
+        if self._snapshot_timer is None and not config.READ_ONLY:
+            self._snapshot_timer = threading.Timer(config.SNAPSHOT_DELAY, self.flush_snapshot)
+            self._snapshot_timer.daemon = True
+            self._snapshot_timer.start()
+
+    @instrumentation.timed('snapshot.write')
+    @_synchronized
+    def flush_snapshot(self):
+        """Writes a pending snapshot now."""
+        if self._snapshot_timer is None:
+            return
+        self._snapshot_timer.cancel()
+        self._snapshot_timer = None
+        key = self._snapshot_key()
+        if key is None or (key[0], key[1], 0) != self._signature:
+            # The file changed behind our back (the next load re-parses it anyway),
+            # or edits are still in the journal (compacting reschedules the snapshot).
+            return
+        metadata, columns = self._store.snapshot()
+        columns['date_ordinals'] = self._date_ordinals
+        columns['date_positions'] = self._date_positions
+        chunks = _pack_snapshot({
+            'key': key,
+            'header': self._header,
+            'totals': self._totals.to_dict() if self._totals_fresh() else None,
+            'store': metadata,
+        }, columns)
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as snapshot_file:
+                snapshot_file.writelines(chunks)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            pass
+        finally:
+            for chunk in chunks:
+                if isinstance(chunk, memoryview):
+                    chunk.release()
+
+    def _discard_unsaved(self):
+        """Forgets in-memory edits the file does not have; the next access reloads from disk."""
+        self._signature = None
+        self._totals = None
+        self._totals_signature = None
+
+    def _totals_fresh(self):
+        return self._totals is not None and self._totals_signature == self._signature
+
+    def _save_totals(self):
+        """Persists the cached totals, if they can be written. They are rebuilt from the file anyway."""
+        if config.READ_ONLY:
+            return
+        data = self._totals.to_dict()
+        data['signature'] = self._totals_signature
+        tmp_path = self.summary_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(data, cache_file)
+            os.replace(tmp_path, self.summary_path)
+        except OSError:
+            pass
+
+    def _read_totals(self):
+        """Returns (signature, CategoryTotals) from the cache file, or (None, None)."""
+        try:
+            with open(self.summary_path) as cache_file:
+                data = json.load(cache_file)
+            return tuple(data['signature']), CategoryTotals.from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, None
+
+    def _ensure_index(self):
+        if self._signature is None or self._signature != self._current_signature():
+            initialize_csv(self.path)
+            self._load()
+
+    def _index_row(self, row, offset, length):
+        """Adds a row to the store and the date index. Returns its position."""
+        position = self._store.add(row, offset, length)
+        ordinal = self._store.dates[position]
+        if ordinal and not self._dates_stale:
+            if self._batch_depth:
+                # Re-sorting once at the end beats an insert per row.
+                self._dates_stale = True
+            else:
+                slot = bisect.bisect_right(self._date_ordinals, ordinal)
+                self._date_ordinals.insert(slot, ordinal)
+                self._date_positions.insert(slot, position)
+        return position
+
+    def _unindex_row(self, transaction_id):
+        """Marks a row dead in the store and removes it from the date index."""
+        position = self._store.positions[transaction_id]
+        self._store.kill(position)
+        ordinal = self._store.dates[position]
+        if ordinal and not self._dates_stale:
+            if self._batch_depth:
+                self._dates_stale = True
+            else:
+                low = bisect.bisect_left(self._date_ordinals, ordinal)
+                high = bisect.bisect_right(self._date_ordinals, ordinal)
+                slot = self._date_positions.index(position, low, high)
+                del self._date_ordinals[slot]
+                del self._date_positions[slot]
+
+    def _rebuild_date_index(self):
+        """Sorts the live rows by date. The sort is stable, so same-day rows keep file order."""
+        dates = self._store.dates
+        dated = sorted((p for p in self._store.positions.values() if dates[p]), key=dates.__getitem__)
+        self._date_positions = array.array('l', dated)
+        self._date_ordinals = array.array('l', (dates[p] for p in dated))
+        self._dates_stale = False
+
+    def _dated_positions(self, low=None, high=None):
+        """Returns store positions in date order for ordinals within [low, high]."""
+        if self._dates_stale:
+            self._rebuild_date_index()
+        start = 0 if low is None else bisect.bisect_left(self._date_ordinals, low)
+        stop = len(self._date_ordinals) if high is None else bisect.bisect_right(self._date_ordinals, high)
+        return self._date_positions[start:stop]
+
+    def _refresh(self, progress=None):
+        """Makes sure the in-memory rows match the file. Returns False if there is no file."""
+        if self._signature is not None and self._signature == self._current_signature():
+            return True
+        try:
+            self._load(progress)
+            return True
+        except FileNotFoundError:
+            self._store = TransactionStore()
+            self._unwritten = {}
+            self._date_ordinals = array.array('l')
+            self._date_positions = array.array('l')
+            self._signature = None
+            return False
+
+    def _live_positions(self):
+        return array.array('l', self._store.positions.values())
+
+    @_synchronized
+    def transactions(self, progress=None):
+        """
+        Returns every live transaction (in file order) as a TransactionRows
+        sequence of read-only row views, rescanning the file only if it changed.
+        """
+        self._refresh(progress)
+        return TransactionRows(self._store, self._live_positions())
+
+    @instrumentation.timed('search')
+    @_synchronized
+    def search(self, keyword="", category="", filter_date=None, date_from=None, date_to=None,
+               trans_type=""):
+        if not self._refresh():
+            return []
+        low, high = _date_bounds(filter_date, date_from, date_to)
+        if config.USE_NUMPY and (category or trans_type):
+            positions = _np_filter_positions(self._store, keyword, category, trans_type, low, high)
+            return TransactionRows(self._store, positions)
+        if low is None and high is None:
+            if keyword:
+                # The description index, once prepared, finds the matches directly.
+                candidates = self._store.keyword_positions(keyword)
+                keyword = ""
+            else:
+                candidates = self._live_positions()
+        else:
+            candidates = self._dated_positions(low, high)
+        instrumentation.count('search.rows_scanned', len(candidates))
+        positions = self._store.filter_positions(candidates, keyword, category, trans_type)
+        return TransactionRows(self._store, positions)
+
+    def prepare_search(self):
+        # Only the refresh holds the ledger lock; the store guards its own
+        # index, so writers aren't blocked while it builds.
+        with self._lock:
+            if not self._refresh():
+                return
+            store = self._store
+        store.description_index()
+
+    @instrumentation.timed('search.terms')
+    @_synchronized
+    def search_terms(self, terms, prefix=True):
+        if not self._refresh():
+            return []
+        return TransactionRows(self._store, self._store.term_positions(terms, prefix))
+
+    @instrumentation.timed('rollup')
+    @_synchronized
+    def rollup(self, period='month', by_category=False, date_from=None, date_to=None):
+        if not self._refresh():
+            return []
+        low, high = _date_bounds(None, date_from, date_to)
+        dates = self._store.dates
+        entries = (
+            (dates[p], is_income, category, units)
+            for p, is_income, category, units in self._store.summary_entries(self._dated_positions(low, high))
+        )
+        return _rollup(entries, period, by_category)
+
+    @_synchronized
+    def append(self, transactions):
+        """
+        Adds a batch of transactions as one journal record (one write and one
+        fsync), so a failed batch is all-or-nothing. Rows without an ID are
+        given one. Returns the IDs of the appended rows.
+        """
+        rows = _with_ids(transactions)
+        if not rows:
+            return []
+
+        self._ensure_index()
+        for row in rows:
+            if row[ID_FIELD] in self._store.positions:
+                raise ValueError(f"Duplicate transaction ID: {row[ID_FIELD]}")
+        self._edit([(row[ID_FIELD], row) for row in rows])
+        return [row[ID_FIELD] for row in rows]
+
+    @instrumentation.timed('csv.append')
+    def _write_at_end(self, data):
+        """
+        Appends raw record bytes to the file with one write and one fsync,
+        truncating back on failure. Returns the offset the data starts at.
+        """
+        instrumentation.count('csv.bytes_written', len(data))
+        with open(self.path, 'r+b') as csvfile:
+            start = csvfile.seek(0, os.SEEK_END)
+            # A file that doesn't end in a newline (hand-edited, or an old torn
+            # write) would glue our first row onto its last one.
+            prefix = b''
+            if start > 0:
+                csvfile.seek(start - 1)
+                if csvfile.read(1) != b'\n':
+                    prefix = b'\r\n'
+            try:
+                csvfile.write(prefix + data)
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+            except BaseException:
+                csvfile.truncate(start)
+                raise
+        return start + len(prefix)
+
+    @_synchronized
+    def append_parsed(self, parts):
+        """
+        Writes pre-encoded parts with a single append and splices their
+        stores into ours, so the rows are never parsed again here. Imports
+        go straight to the end of the file rather than through the journal,
+        and _write_at_end truncates a failed append back. The journal is
+        compacted first, so its rows stay ahead of the imported ones.
+
+        Inside a batch() the rows are journaled with the batch's other edits
+        instead, so a batch that raises drops them too.
+        """
+        parts = [(encoded, store) for encoded, store in parts if len(store)]
+        if not parts:
+            return 0
+        if self._batch_depth:
+            return super().append_parsed(parts)
+        self._ensure_index()
+        self._fold_journal()
+        totals_fresh = self._totals_fresh()
+        for _, store in parts:
+            if not self._store.positions.keys().isdisjoint(store.positions):
+                raise ValueError("Duplicate transaction ID in imported rows")
+        data = b''.join(encoded for encoded, _ in parts)
+        offset = self._write_at_end(data)
+
+        first = len(self._store)
+        for encoded, store in parts:
+            self._store.extend(store, offset)
+            offset += len(encoded)
+        self._rebuild_date_index()
+
+        self._signature = self._current_signature()
+        if totals_fresh:
+            for _, store in parts:
+                self._totals.merge(_store_totals(store))
+            self._totals_signature = self._signature
+            self._save_totals()
+        self._schedule_snapshot()
+        return len(self._store) - first
+
+    @_synchronized
+    def update(self, transaction_id, transaction):
+        """Replaces the transaction with the given ID by journaling its new version under the same ID."""
+        self._ensure_index()
+        if transaction_id not in self._store.positions:
+            raise KeyError(transaction_id)
+        row = dict(transaction)
+        row[ID_FIELD] = transaction_id
+        self._edit([(transaction_id, row)])
+
+    @_synchronized
+    def delete(self, transaction_id):
+        """Deletes the transaction with the given ID by journaling its removal."""
+        self._ensure_index()
+        if transaction_id not in self._store.positions:
+            raise KeyError(transaction_id)
+        self._edit([(transaction_id, None)])
+
+    @_synchronized
+    def replace_all(self, transactions):
+        if self._batch_depth:
+            raise RuntimeError("Can't replace the ledger inside batch()")
+        rows = _with_ids(transactions)
+        # Compact first, so no journaled edit can be replayed onto the new rows.
+        self._fold_journal()
+        _write_all(self.path, rows, _storage_columns(self._header))
+        self._load()
+
+    @_synchronized
+    def compact(self):
+        """Folds the journal into the file now, dropping the space left by deleted rows."""
+        if self._batch_depth:
+            # The file would get the batch's edits before it commits.
+            raise RuntimeError("Can't compact the ledger inside batch()")
+        if self._refresh():
+            self._rewrite()
+
+    # --- Journal ---
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Holds the ledger for a group of edits and journals them as a single
+        record (one write, one fsync) when the outermost batch ends. Repeated
+        edits to a row are coalesced to the last one. If the with-block
+        raises, none of its edits are kept.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            completed = False
+            try:
+                yield self
+                completed = True
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    entries, self._batch_entries = self._batch_entries, {}
+                    if not completed:
+                        if entries:
+                            self._discard_unsaved()
+                    else:
+                        if self._dates_stale:
+                            self._rebuild_date_index()
+                        if entries:
+                            self._commit(list(entries.items()))
+
+    def _edit(self, entries):
+        """
+        Applies (ID, row) edits in memory and journals them: at once, or when
+        the enclosing batch() ends. A row adds or replaces, None deletes.
+        """
+        self._apply(entries)
+        if self._batch_depth:
+            self._batch_entries.update(entries)
+        else:
+            self._commit(entries)
+
+    def _apply(self, entries):
+        """Applies (ID, row) edits to the store, the indexes and the cached totals."""
+        encoded = [None if row is None else _encode_rows([row], self._header) for _, row in entries]
+        totals = self._totals if self._totals_fresh() else None
+        store = self._store
+        for (transaction_id, row), data in zip(entries, encoded):
+            position = store.positions.get(transaction_id)
+            if position is not None:
+                if totals is not None:
+                    totals.add(store.row(position), sign=-1)
+                self._unwritten.pop(position, None)
+                self._unindex_row(transaction_id)
+            if data is not None:
+                self._unwritten[self._index_row(row, 0, len(data))] = data
+                if totals is not None:
+                    totals.add(row)
+
+    @instrumentation.timed('journal.write')
+    def _commit(self, entries):
+        """
+        Appends applied edits to the journal as one JSON line, with one write
+        and one fsync. If that fails, the in-memory edits are dropped too.
+        """
+        totals_fresh = self._totals_fresh()
+        try:
+            record = json.dumps(entries, separators=(',', ':')).encode('utf-8') + b'\n'
+            with open(self.journal_path, 'ab') as journal:
+                start = journal.tell()
+                try:
+                    journal.write(record)
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                except BaseException:
+                    journal.truncate(start)
+                    raise
+        except BaseException:
+            self._discard_unsaved()
+            raise
+        instrumentation.count('journal.bytes_written', len(record))
+        self._signature = self._current_signature()
+        if totals_fresh:
+            self._totals_signature = self._signature
+            self._save_totals()
+        self._journal_edits += len(entries)
+        if self._journal_edits >= config.JOURNAL_MAX_EDITS or self._signature[2] >= config.JOURNAL_MAX_BYTES:
+            # The edits are safe in the journal; a failed compaction is retried on the next edit.
+            with contextlib.suppress(OSError):
+                self._rewrite()
+
+    def _replay_journal(self):
+        """
+        Re-applies the journal left by a session that ended before compacting
+        (e.g. a crash), then compacts unless READ_ONLY or inside a batch().
+        A torn last line is ignored.
+        """
+        try:
+            with open(self.journal_path, 'rb') as journal:
+                lines = journal.read().splitlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                entries = json.loads(line)
+            except ValueError:
+                break
+            self._apply(entries)
+        if not config.READ_ONLY and not self._batch_depth:
+            self._rewrite()
+
+    @_synchronized
+    def flush_journal(self):
+        """
+        Compacts now if this session has journaled edits that aren't in the
+        file yet. Does nothing inside a batch(); the edits stay in the journal.
+        """
+        if self._journal_edits and not self._batch_depth:
+            self._fold_journal()
+
+    def _fold_journal(self):
+        """Compacts if the journal holds edits."""
+        if self._signature is not None and self._signature == self._current_signature():
+            if self._signature[2]:
+                self._rewrite()
+        elif self._journal_size():
+            self._refresh()  # reloading replays the journal and compacts
+
+    @instrumentation.timed('csv.compact')
+    def _rewrite(self):
+        """
+        Writes every live row, journaled ones included, to a temp file in
+        store order and renames it over the CSV, then deletes the journal.
+        Records already in the file are copied over in runs, not re-encoded.
+        """
+        store, unwritten = self._store, self._unwritten
+        positions = array.array('q', store.positions.values())
+        new_offsets = array.array('q')
+        totals_fresh = self._totals_fresh()
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(self.path, 'rb') as old, open(tmp_path, 'wb') as new:
+                _read_header(old)
+                out = old.tell()
+                size = os.fstat(old.fileno()).st_size
+                old.seek(max(size - 1, 0))
+                # A last record without a newline gets one once something follows it.
+                unterminated = size > 0 and old.read(1) != b'\n'
+
+                pieces = [[0, out]]  # [start, end] byte ranges of the old file, or encoded rows
+                if out == size and unterminated:
+                    out += 2
+                for p in positions:
+                    new_offsets.append(out)
+                    data = unwritten.get(p)
+                    if data is not None:
+                        pieces.append(data)
+                        out += len(data)
+                        continue
+                    start = store.offsets[p]
+                    end = start + store.lengths[p]
+                    if isinstance(pieces[-1], list) and pieces[-1][1] == start:
+                        pieces[-1][1] = end
+                    else:
+                        pieces.append([start, end])
+                    out += end - start
+                    if end == size and unterminated:
+                        out += 2
+
+                for piece in pieces:
+                    if isinstance(piece, list):
+                        _copy_range(old, new, piece[0], piece[1])
+                        if piece[1] == size and unterminated:
+                            new.write(b'\r\n')
+                    else:
+                        new.write(piece)
+                new.flush()
+                os.fsync(new.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.journal_path)
+        self._journal_edits = 0
+
+        offsets = store.offsets
+        for p, offset in zip(positions, new_offsets):
+            offsets[p] = offset
+        self._unwritten = {}
+        self._signature = self._current_signature()
+        if totals_fresh:
+            self._totals_signature = self._signature
+            self._save_totals()
+        if len(store) - len(positions) > max(len(positions), config.RELOAD_MIN_DEAD_ROWS):
+            self._load(use_snapshot=False)  # let go of the dead rows
+        else:
+            self._schedule_snapshot()
+
+    @_synchronized
+    def contains(self, transaction_id, load=True):
+        """
+        Whether a live row has this ID. With load=False, a ledger whose rows
+        aren't in memory yet says False instead of reading the file.
+        """
+        if not load and self._signature is None:
+            return False
+        return self._refresh() and transaction_id in self._store.positions
+
+    @_synchronized
+    def partition_stats(self):
+        """
+        Returns the file's row count, first and last date, category totals
+        and the signature they were taken at, as a PartitionedLedger manifest
+        entry. None if there is no file.
+        """
+        if not self._refresh():
+            return None
+        if not self._totals_fresh():
+            self._totals = _store_totals(self._store)
+            self._totals_signature = self._signature
+        if self._dates_stale:
+            self._rebuild_date_index()
+        ordinals = self._date_ordinals
+        return {
+            'rows': len(self._store.positions),
+            'first': _date_text(ordinals[0]) if ordinals else None,
+            'last': _date_text(ordinals[-1]) if ordinals else None,
+            'totals': self._totals.to_dict(),
+            'signature': list(self._signature),
+        }
+
+    @_synchronized
+    def remove(self):
+        """Deletes the file with its journal, snapshot and totals cache, and forgets its rows."""
+        if self._snapshot_timer is not None:
+            self._snapshot_timer.cancel()
+            self._snapshot_timer = None
+        self._journal_edits = 0
+        for path in (self.path, self.journal_path, self.snapshot_path, self.summary_path):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        self._refresh()
+
+    @instrumentation.timed('summary.totals')
+    @_synchronized
+    def summary_totals(self):
+        """Answers from the cached totals, rebuilding them only if the file changed."""
+        signature = self._current_signature()
+        if signature is None:
+            return 0, {}, {}
+        if self._totals is None or self._totals_signature != signature:
+            cached_signature, cached_totals = self._read_totals()
+            if cached_signature == signature:
+                instrumentation.cache_hit('summary_cache')
+                self._totals = cached_totals
+                self._totals_signature = signature
+            else:
+                instrumentation.cache_miss('summary_cache')
+                self._load()
+        else:
+            instrumentation.cache_hit('summary_cache')
+        return self._totals.summary()
@@ -0,0 +1,127 @@
+"""
+Trigram and word index over Description, for keyword search. Postings are
+append-only arrays in store position order; dead rows stay in them and are
+skipped by the caller.
+"""
+import array
+import bisect
+import re
+
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _description_tokens(text):
+    """Returns the set of lowercased word tokens in a Description."""
+    return set(_TOKEN_RE.findall((text or '').lower()))
+
+
+def _tokens_match(tokens, terms, prefix=True):
+    """True if every term is one of the tokens (or, with prefix, starts one of them)."""
+    if prefix:
+        return all(any(token.startswith(term) for token in tokens) for term in terms)
+    return all(term in tokens for term in terms)
+
+
+def _sorted_contains(values, value):
+    slot = bisect.bisect_left(values, value)
+    return slot < len(values) and values[slot] == value
+
+
+class DescriptionIndex:
+    """Inverted index over the Description column of a TransactionStore."""
+
+    GRAM = 3
+
+    def __init__(self):
+        self.grams = {}
+        self.tokens = {}
+        self.vocabulary = []
+        self.short = {}  # position -> lowercased description, for those too short to have a trigram
+        self.size = 0
+
+    def add(self, position, description):
+        self.size = position + 1
+        text = description.lower()
+        if len(text) < self.GRAM:
+            self.short[position] = text
+        grams = self.grams
+        for gram in {text[i:i + self.GRAM] for i in range(len(text) - self.GRAM + 1)}:
+            postings = grams.get(gram)
+            if postings is None:
+                postings = grams[gram] = array.array('l')
+            postings.append(position)
+        for token in _description_tokens(text):
+            postings = self.tokens.get(token)
+            if postings is None:
+                postings = self.tokens[token] = array.array('l')
+                bisect.insort(self.vocabulary, token)
+            postings.append(position)
+
+    def candidate_bound(self, text):
+        """
+        Upper bound on how many descriptions have to be read to find `text`:
+        none if exact_positions() answers it, else how many positions
+        substring_candidates(text) returns at most.
+        """
+        if len(text) <= self.GRAM or _TOKEN_RE.fullmatch(text):
+            return 0
+        return min(
+            (len(self.grams.get(text[i:i + self.GRAM], ())) for i in range(len(text) - self.GRAM + 1)),
+            default=0,
+        )
+
+    def substring_candidates(self, text):
+        """
+        Positions whose description may contain `text` (lowercased, at least
+        GRAM characters long): the intersection of its trigrams' postings.
+        Callers still have to check the description itself.
+        """
+        postings = []
+        for gram in {text[i:i + self.GRAM] for i in range(len(text) - self.GRAM + 1)}:
+            found = self.grams.get(gram)
+            if found is None:
+                return []
+            postings.append(found)
+        postings.sort(key=len)
+        if len(postings) == 1:
+            return postings[0]
+        return sorted(set(postings[0]).intersection(*postings[1:]))
+
+    def exact_positions(self, text):
+        """
+        Sorted positions whose description contains `text` (lowercased), if
+        the index can tell without reading descriptions; None otherwise.
+        Word characters only ever occur inside a word, so such text is looked
+        up in the vocabulary. Other text of up to GRAM characters is looked up
+        in the trigrams, plus the descriptions too short to have one.
+        """
+        if _TOKEN_RE.fullmatch(text):
+            postings = [self.tokens[token] for token in self.vocabulary if text in token]
+        elif len(text) == self.GRAM:
+            return self.grams.get(text, ())
+        elif len(text) < self.GRAM:
+            postings = [found for gram, found in self.grams.items() if text in gram]
+            postings.append([p for p, short in self.short.items() if text in short])
+        else:
+            return None
+        if not postings:
+            return ()
+        if len(postings) == 1:
+            return postings[0]
+        return sorted(set().union(*postings))
+
+    def term_positions(self, term, prefix=True):
+        """Sorted positions that have the word `term` (or, with prefix, a word starting with it)."""
+        if not prefix:
+            return self.tokens.get(term, ())
+        start = bisect.bisect_left(self.vocabulary, term)
+        stop = start
+        while stop < len(self.vocabulary) and self.vocabulary[stop].startswith(term):
+            stop += 1
+        if stop == start + 1:
+            return self.tokens[self.vocabulary[start]]
+        merged = set()
+        for token in self.vocabulary[start:stop]:
+            merged.update(self.tokens[token])
+        return sorted(merged)
@@ -0,0 +1,105 @@
+"""
+Vectorized summaries and filters over a TransactionStore, used when NumPy is
+installed. NumPy is imported inside the _np_* helpers, which only run when
+config.USE_NUMPY is set, so the rest of the ledger loads without it.
+"""
+import array
+
+from ledger import config
+from ledger.store import TransactionStore
+from ledger.totals import CategoryTotals
+
+
+def _np_column(values):
+    """Zero-copy NumPy view of an array.array / bytearray column. Don't keep it past the call."""
+    import numpy as np
+    if isinstance(values, bytearray):
+        return np.frombuffer(values, dtype=np.uint8)
+    return np.frombuffer(values, dtype=np.dtype(values.typecode))
+
+
+def _np_widen(column, typecode):
+    """Copies an array.array column into a new one of a wider `typecode`."""
+    import numpy as np
+    widened = array.array(typecode)
+    widened.frombytes(_np_column(column).astype(np.dtype(typecode)).tobytes())
+    return widened
+
+
+def _np_live_mask(store):
+    return (_np_column(store.flags) & TransactionStore.LIVE) != 0
+
+
+def _np_category_totals(store):
+    """
+    Vectorized CategoryTotals over all live rows of a store: one np.bincount
+    over (category code, is_income) keys, with the units summed exactly in int64.
+    """
+    import numpy as np
+    totals = CategoryTotals()
+    if not len(store):
+        return totals
+    flags = _np_column(store.flags)
+    live = (flags & TransactionStore.LIVE) != 0
+    totals.row_count = int(np.count_nonzero(live))
+
+    categories = _np_column(store.categories)
+    named = np.array([bool(name) for name in store.category_names], dtype=bool)
+    income_types = np.array([name == 'Income' for name in store.type_names], dtype=bool)
+    counted = live & ((flags & TransactionStore.AMOUNT_OK) != 0) & named[categories]
+
+    keys = categories[counted] * 2 + income_types[_np_column(store.types)[counted]]
+    sums = np.zeros(2 * len(named), dtype=np.int64)
+    np.add.at(sums, keys, _np_column(store.units)[counted])
+    counts = np.bincount(keys, minlength=2 * len(named))
+    for key in np.flatnonzero(counts):
+        category = store.category_names[key // 2]
+        bucket = totals.income if key % 2 else totals.expense
+        bucket[category] = [int(sums[key]), int(counts[key])]
+    return totals
+
+
+def _store_totals(store):
+    """CategoryTotals over every live row of a store, vectorized when NumPy is enabled."""
+    if config.USE_NUMPY:
+        return _np_category_totals(store)
+    totals = CategoryTotals()
+    totals.row_count = len(store.positions)
+    for _, is_income, category, units in store.summary_entries(store.positions.values()):
+        totals.add_entry(is_income, category, units)
+    return totals
+
+
+def _np_filter_positions(store, keyword="", category="", trans_type="", low=None, high=None):
+    """
+    Evaluates the category, type and date filters as one boolean mask over
+    the store. Returns matching live positions (in date order when a date
+    bound is given, like the date index would), with the keyword filter
+    applied last to just those rows.
+    """
+    import numpy as np
+    if not len(store):
+        return []
+    mask = _np_live_mask(store)
+    dates = _np_column(store.dates)
+    if low is not None or high is not None:
+        mask &= dates != 0
+        if low is not None:
+            mask &= dates >= low
+        if high is not None:
+            mask &= dates <= high
+    if category:
+        wanted = category.lower()
+        codes = [code for code, name in enumerate(store.category_names) if name.lower() == wanted]
+        mask &= np.isin(_np_column(store.categories), codes)
+    if trans_type:
+        wanted = trans_type.lower()
+        codes = [code for code, name in enumerate(store.type_names) if name.lower() == wanted]
+        mask &= np.isin(_np_column(store.types), codes)
+    positions = np.flatnonzero(mask)
+    if low is not None or high is not None:
+        positions = positions[np.argsort(dates[positions], kind='stable')]
+    positions = positions.tolist()
+    if keyword:
+        positions = store.filter_positions(positions, keyword)
+    return positions
@@ -0,0 +1,312 @@
+"""
+Ledger split by date into one CSV file per month or year, e.g.
+`expenses/2024-03.csv`, plus an 'undated' file for rows whose Date doesn't
+parse. Each file is a CsvLedger. `manifest.json` keeps every file's row
+count, date range and category totals, so date filters only open the files
+they overlap and summaries open none.
+"""
+import contextlib
+import json
+import os
+import threading
+
+import Instrumentation as instrumentation
+
+from ledger import config
+from ledger.backend import LedgerBackend, shared_ledger
+from ledger.csv_backend import CsvLedger
+from ledger.records import (
+    AMOUNT_SCALE, ID_FIELD, _date_bounds, _parse_date_ordinal, _with_ids, initialize_csv,
+)
+from ledger.store import ChainedRows
+from ledger.totals import CategoryTotals, _period_key
+
+
+class PartitionedLedger(LedgerBackend):
+    """Ledger split by date into one CSV file per month (or per year) in a directory."""
+
+    UNDATED = 'undated'
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, directory, period=None):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, self.MANIFEST)
+        self._lock = threading.RLock()
+        self._manifest = self._read_manifest()
+        # A directory keeps the period it was created with.
+        self.period = self._manifest.get('period') or period or config.PARTITION_PERIOD
+        if self.period not in ('month', 'year'):
+            raise ValueError(f"Unknown partition period: {self.period!r}")
+        self._batch = None  # ExitStack of the partitions' batches while batch() is open
+        self._touched = set()
+
+    # --- Partitions ---
+    def _key(self, row):
+        """Names the partition a row belongs in: '2024-03' (or '2024'), or 'undated'."""
+        ordinal = _parse_date_ordinal(row.get('Date'))
+        return _period_key(ordinal, self.period) if ordinal else self.UNDATED
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.csv')
+
+    def _ledger(self, key):
+        """Returns the CsvLedger of a partition."""
+        return shared_ledger(CsvLedger, self._path(key))
+
+    def _keys(self):
+        """Returns the keys of the partition files on disk, in date order ('undated' last)."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith('.csv'))
+
+    def _partition(self, key, create=False):
+        """Returns the CsvLedger of a partition, joining it to an open batch()."""
+        path = self._path(key)
+        if create:
+            os.makedirs(self.directory, exist_ok=True)
+            initialize_csv(path)
+        ledger = self._ledger(key)
+        if self._batch is not None and key not in self._touched:
+            self._batch.enter_context(ledger.batch())
+            self._touched.add(key)
+        return ledger
+
+    def _find(self, transaction_id):
+        """
+        Returns the key of the partition holding an ID. Partitions already in
+        memory are checked first, then the rest from the newest back.
+        KeyError if no partition has it.
+        """
+        keys = self._keys()
+        for key in keys:
+            if self._ledger(key).contains(transaction_id, load=False):
+                return key
+        for key in reversed(keys):
+            if self._ledger(key).contains(transaction_id):
+                return key
+        raise KeyError(transaction_id)
+
+    # --- Manifest ---
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            # Entries whose totals are in other amount units are recomputed from their partition.
+            manifest['partitions'] = {
+                key: entry for key, entry in dict(manifest['partitions']).items()
+                if entry['totals'].get('scale') == AMOUNT_SCALE
+            }
+            return manifest
+        except (OSError, ValueError, KeyError, TypeError):
+            return {'partitions': {}}
+
+    def _save_manifest(self):
+        """Persists the manifest, if it can be written."""
+        if config.READ_ONLY:
+            return
+        self._manifest['period'] = self.period
+        tmp_path = self.manifest_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as manifest_file:
+                json.dump(self._manifest, manifest_file)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            pass
+
+    def _record(self, keys):
+        """Refreshes the manifest entries of partitions that were just written."""
+        if self._batch is None:  # otherwise batch() records them once it has committed
+            self._update_entries(keys)
+
+    def _update_entries(self, keys):
+        partitions = self._manifest['partitions']
+        for key in keys:
+            stats = self._ledger(key).partition_stats()
+            if stats is None:
+                partitions.pop(key, None)
+            else:
+                partitions[key] = stats
+        self._save_manifest()
+
+    def _entries(self):
+        """
+        Returns {key: manifest entry} for every partition file, in key order,
+        recomputing the entries that are missing or don't match their file.
+        """
+        partitions = self._manifest['partitions']
+        keys = self._keys()
+        stale = [
+            key for key in keys
+            if key not in self._touched and (
+                key not in partitions
+                or tuple(partitions[key]['signature']) != self._ledger(key)._current_signature()
+            )
+        ]
+        gone = partitions.keys() - set(keys)
+        for key in gone:
+            del partitions[key]
+        if stale:
+            self._update_entries(stale)
+        elif gone:
+            self._save_manifest()
+        # Partitions in an open batch() answer from memory; their edits
+        # reach the manifest file only once committed.
+        return {
+            key: self._ledger(key).partition_stats() if key in self._touched else partitions[key]
+            for key in keys if key in partitions or key in self._touched
+        }
+
+    def flush_manifest(self):
+        """Brings every manifest entry up to date with its partition file (e.g. after compactions)."""
+        with self._lock:
+            self._entries()
+
+    def _keys_between(self, low, high):
+        """Keys of the partitions that can hold rows dated within [low, high] (either may be None)."""
+        if low is None and high is None:
+            return self._keys()
+        keys = []
+        for key, entry in self._entries().items():
+            if entry['first'] is None:
+                continue  # undated rows never match a date filter
+            if high is not None and _parse_date_ordinal(entry['first']) > high:
+                continue
+            if low is not None and _parse_date_ordinal(entry['last']) < low:
+                continue
+            keys.append(key)
+        return keys
+
+    # --- Reads ---
+    def transactions(self, progress=None):
+        with self._lock:
+            paths = [self._path(key) for key in self._keys()]
+        sizes = [os.path.getsize(path) for path in paths]
+        total = sum(sizes)
+        parts = []
+        done = 0
+        for path, size in zip(paths, sizes):
+            report = None
+            if progress is not None:
+                def report(read, _, done=done):
+                    progress(done + read, total)
+            parts.append(shared_ledger(CsvLedger, path).transactions(report))
+            done += size
+        return ChainedRows(parts)
+
+    def search(self, keyword="", category="", filter_date=None, date_from=None, date_to=None,
+               trans_type=""):
+        low, high = _date_bounds(filter_date, date_from, date_to)
+        with self._lock:
+            keys = self._keys_between(low, high)
+        instrumentation.count('partitions.searched', len(keys))
+        return ChainedRows([
+            self._ledger(key).search(keyword, category, filter_date, date_from, date_to, trans_type)
+            for key in keys
+        ])
+
+    def prepare_search(self):
+        for key in self._keys():
+            self._ledger(key).prepare_search()
+
+    def search_terms(self, terms, prefix=True):
+        return ChainedRows([self._ledger(key).search_terms(terms, prefix) for key in self._keys()])
+
+    def rollup(self, period='month', by_category=False, date_from=None, date_to=None):
+        low, high = _date_bounds(None, date_from, date_to)
+        with self._lock:
+            keys = self._keys_between(low, high)
+        # A week or year can span partitions: add their totals up again, in units.
+        groups = {}
+        for key in keys:
+            for item in self._ledger(key).rollup(period, by_category, date_from, date_to):
+                group = (item['Period'], item['Category']) if by_category else (item['Period'],)
+                totals = groups.setdefault(group, [0, 0])
+                totals[0] += round(item['Income'] * AMOUNT_SCALE)
+                totals[1] += round(item['Expense'] * AMOUNT_SCALE)
+        result = []
+        for group in sorted(groups):
+            income, expense = groups[group]
+            item = {'Period': group[0]}
+            if by_category:
+                item['Category'] = group[1]
+            item['Income'] = income / AMOUNT_SCALE
+            item['Expense'] = expense / AMOUNT_SCALE
+            result.append(item)
+        return result
+
+    def summary_totals(self):
+        """Adds up the manifest's per-partition totals; no partition is read unless its entry is stale."""
+        with self._lock:
+            totals = CategoryTotals()
+            for entry in self._entries().values():
+                totals.merge(CategoryTotals.from_dict(entry['totals']))
+        return totals.summary()
+
+    # --- Writes ---
+    def append(self, transactions):
+        rows = _with_ids(transactions)
+        groups = {}
+        for row in rows:
+            groups.setdefault(self._key(row), []).append(row)
+        with self._lock:
+            for key, group in groups.items():
+                self._partition(key, create=True).append(group)
+            self._record(groups)
+        return [row[ID_FIELD] for row in rows]
+
+    def update(self, transaction_id, transaction):
+        row = dict(transaction)
+        row[ID_FIELD] = transaction_id
+        with self._lock:
+            key = self._find(transaction_id)
+            new_key = self._key(row)
+            if new_key == key:
+                self._partition(key).update(transaction_id, row)
+                self._record([key])
+                return
+            # The date moved it to another partition. Append first: a crash
+            # in between leaves a duplicate, never a lost row.
+            self._partition(new_key, create=True).append([row])
+            self._partition(key).delete(transaction_id)
+            self._record([new_key, key])
+
+    def delete(self, transaction_id):
+        with self._lock:
+            key = self._find(transaction_id)
+            self._partition(key).delete(transaction_id)
+            self._record([key])
+
+    def replace_all(self, transactions):
+        groups = {}
+        for row in _with_ids(transactions):
+            groups.setdefault(self._key(row), []).append(row)
+        with self._lock:
+            for key in self._keys():
+                if key not in groups:
+                    self._ledger(key).remove()
+            for key, group in groups.items():
+                self._partition(key, create=True).replace_all(group)
+            self._manifest['partitions'] = {}
+            self._entries()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Opens a batch() on each partition the with-block writes to. They
+        commit when the block ends, one partition after another, and all
+        drop their edits if it raises.
+        """
+        with self._lock:
+            if self._batch is not None:
+                yield self
+                return
+            self._batch = contextlib.ExitStack()
+            try:
+                with self._batch:
+                    yield self
+            finally:
+                self._batch = None
+                touched, self._touched = self._touched, set()
+                self._record(touched)
@@ -0,0 +1,91 @@
+"""
+Streaming pipelines over rows.
+
+These work on any iterable of rows and never hold more than one row at a
+time (plus the group-by state of an aggregate), so multi-GB exports can be
+summarized in batch mode. A pipeline is a source, any number of stages
+(callables from an iterable of rows to an iterable of rows) and optionally
+an aggregate at the end:
+
+    rows = run_pipeline('export.csv', filter_stage(category='Food'),
+                        map_stage(lambda row: dict(row, Category='Groceries')))
+    row_count, income, expense = summary_aggregate(rows)
+"""
+import os
+
+import Instrumentation as instrumentation
+
+from ledger.records import (
+    _date_bounds, _iter_records, _parse_date_ordinal, _read_header, _transaction_matches,
+)
+from ledger.totals import CategoryTotals, _dated_entries, _rollup
+
+
+def iter_transactions(path):
+    """Yields the rows of a ledger CSV one at a time, without loading the whole file."""
+    rows = 0
+    with open(path, 'rb') as csvfile:
+        try:
+            header = _read_header(csvfile)
+            for _, _, row in _iter_records(csvfile, header):
+                rows += 1
+                yield row
+        finally:
+            instrumentation.count('stream.rows_read', rows)
+            instrumentation.count('stream.bytes_read', csvfile.tell())
+
+
+def iter_records(source):
+    """Turns a CSV path into a row stream; any other iterable of rows is passed through."""
+    if isinstance(source, (str, os.PathLike)):
+        return iter_transactions(source)
+    return iter(source)
+
+
+def filter_stage(keyword="", category="", filter_date=None, date_from=None, date_to=None,
+                 trans_type="", predicate=None):
+    """
+    Returns a stage that keeps the rows matching the search_transactions
+    filters, and `predicate(row)` if one is given.
+    """
+    low, high = _date_bounds(filter_date, date_from, date_to)
+
+    def stage(rows):
+        for row in rows:
+            if not _transaction_matches(row, keyword, category, low, high, trans_type):
+                continue
+            if predicate is not None and not predicate(row):
+                continue
+            yield row
+    return stage
+
+
+def map_stage(fn):
+    """Returns a stage that replaces every row with fn(row)."""
+    def stage(rows):
+        for row in rows:
+            yield fn(row)
+    return stage
+
+
+def run_pipeline(source, *stages):
+    """Chains stages over a source (CSV path or iterable of rows). Returns a lazy row iterator."""
+    rows = iter_records(source)
+    for stage in stages:
+        rows = stage(rows)
+    return rows
+
+
+def summary_aggregate(rows):
+    """Folds a row stream into (row_count, income_categories, expense_categories)."""
+    totals = CategoryTotals()
+    for row in rows:
+        totals.add(row)
+    return totals.summary()
+
+
+def rollup_aggregate(rows, period='month', by_category=False):
+    """Folds a row stream into rollup_transactions()-style period totals."""
+    dated_rows = ((_parse_date_ordinal(row.get('Date')), row) for row in rows)
+    return _rollup(_dated_entries((ordinal, row) for ordinal, row in dated_rows if ordinal is not None),
+                   period, by_category)
@@ -0,0 +1,342 @@
+"""
+The ledger's CSV format: field names, reading and writing records, and
+parsing a row's dates and amounts.
+"""
+import contextlib
+import csv
+import datetime
+import functools
+import io
+import itertools
+import math
+import operator
+import os
+import re
+import uuid
+
+import Instrumentation as instrumentation
+
+from ledger import config
+
+FIELDNAMES = ['Date', 'Type', 'Description', 'Category', 'Amount']
+
+# Every stored row also carries a persistent ID. It lives in its own column at
+# the end so the visible FIELDNAMES (and their column positions) don't change.
+ID_FIELD = 'ID'
+STORAGE_FIELDNAMES = FIELDNAMES + [ID_FIELD]
+
+# Amounts are held as integer units of a millionth of an RM, so totals are
+# exact sums of what the rows say; they are only rounded to cents for display.
+AMOUNT_DECIMALS = 6
+AMOUNT_SCALE = 10 ** AMOUNT_DECIMALS
+
+# Older versions deleted rows by blanking them out in place: the record's bytes
+# were overwritten with this marker followed by spaces. Such records are
+# skipped. Having no commas, a tombstone can't be mistaken for a real row.
+TOMBSTONE = '#'
+
+
+def initialize_csv(path):
+    """Creates the CSV file with headers if it doesn't exist."""
+    if not os.path.exists(path):
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=STORAGE_FIELDNAMES)
+            writer.writeheader()
+
+
+def new_transaction_id():
+    """Returns a fresh, globally unique transaction ID."""
+    return uuid.uuid4().hex
+
+
+def _with_ids(transactions):
+    """Copies transactions into plain dicts, giving any row without an ID a new one."""
+    rows = []
+    for transaction in transactions:
+        row = dict(transaction)
+        if not row.get(ID_FIELD):
+            row[ID_FIELD] = new_transaction_id()
+        rows.append(row)
+    return rows
+
+
+def _storage_columns(header):
+    """
+    The columns to write a ledger with: the file's own header (extra columns
+    such as a bank's Balance included), plus any of STORAGE_FIELDNAMES it lacks.
+    """
+    return list(dict.fromkeys([field for field in header if field] + STORAGE_FIELDNAMES))
+
+
+def _encode_rows(transactions, fieldnames=STORAGE_FIELDNAMES):
+    """
+    Serializes transactions to CSV bytes, exactly as DictWriter would write
+    them. Values with no column (e.g. the overflow DictReader files under
+    None) are left out.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writerows(transactions)
+    return buffer.getvalue().encode('utf-8')
+
+
+@instrumentation.timed('csv.rewrite')
+def _write_all(path, transactions, fieldnames=STORAGE_FIELDNAMES):
+    """
+    Replaces `path` with a header plus the given transactions. The rows go to
+    a temp file that is renamed over `path`, so a crash never leaves it half
+    written. Values with no column are left out, as in _encode_rows.
+    """
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(transactions)
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def _copy_range(source, target, start, end):
+    """Copies bytes [start, end) of one binary file to the current position of another."""
+    source.seek(start)
+    while start < end:
+        block = source.read(min(config.COPY_BLOCK, end - start))
+        if not block:
+            raise ValueError("File ended before the expected record")
+        target.write(block)
+        start += len(block)
+
+
+def _is_tombstone(values):
+    return len(values) == 1 and values[0].rstrip(' ') == TOMBSTONE
+
+
+def _row_from_values(header, values):
+    """Builds a row dict the same way csv.DictReader does."""
+    row = dict(zip(header, values))
+    if len(values) > len(header):
+        row[None] = values[len(header):]
+    elif len(values) < len(header):
+        for key in header[len(values):]:
+            row[key] = None
+    return row
+
+
+def _read_header(csvfile):
+    """
+    Reads the header record from the start of a binary CSV file, leaving the
+    file positioned just after it.
+    """
+    csvfile.seek(0)
+
+    def lines():
+        # One line at a time: reading ahead would move the file past the header
+        for line in iter(csvfile.readline, b''):
+            yield line.decode('utf-8')
+
+    return next(csv.reader(lines()), [])
+
+
+def _iter_record_blocks(csvfile):
+    """
+    Yields the live CSV records of a binary file, from the current position,
+    a block of about READ_BLOCK bytes at a time, as (offsets, lengths, rows)
+    lists where rows are the records' values. Tombstones are skipped; blank
+    lines are skipped like DictReader does.
+
+    csv.reader decides where a record ends (a quoted field may span several
+    lines); since it never reads past the record it returns, its line_num
+    gives the lines, and so the bytes, of each record. A block's last record
+    may go on in the next block, so it is parsed again with that one. A
+    record the csv module rejects is split on commas instead, so one bad
+    line can't stop the rest of the file from loading.
+    """
+    offset = csvfile.tell()
+    texts, sizes = [], []  # the lines to parse, and their lengths in bytes
+    while True:
+        block = csvfile.readlines(config.READ_BLOCK)
+        texts.extend(line.decode('utf-8') for line in block)
+        sizes.extend(map(len, block))
+        if not texts:
+            return
+        reader = csv.reader(texts)
+        rows, ends = [], []
+        while True:
+            try:
+                for values in reader:
+                    rows.append(values)
+                    ends.append(reader.line_num)
+                break
+            except csv.Error:
+                start = ends[-1] if ends else 0
+                rows.append(''.join(texts[start:reader.line_num]).rstrip('\r\n').split(','))
+                ends.append(reader.line_num)
+        if block and rows:
+            rows.pop()
+            ends.pop()
+        line_offsets = list(itertools.accumulate(sizes, initial=offset))
+        offsets = list(map(line_offsets.__getitem__, [0] + ends[:-1]))
+        lengths = list(map(operator.sub, map(line_offsets.__getitem__, ends), offsets))
+        if ends:
+            offset = line_offsets[ends[-1]]
+            del texts[:ends[-1]], sizes[:ends[-1]]
+        if min(map(len, rows), default=2) < 2:
+            live = [values and not _is_tombstone(values) for values in rows]
+            offsets, lengths, rows = (list(itertools.compress(column, live)) for column in (offsets, lengths, rows))
+        if rows:
+            yield offsets, lengths, rows
+        if not block:
+            return
+
+
+def _iter_records(csvfile, header):
+    """Yields (offset, length, row) for every live record after the header."""
+    for offsets, lengths, rows in _iter_record_blocks(csvfile):
+        for offset, length, values in zip(offsets, lengths, rows):
+            yield offset, length, _row_from_values(header, values)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _parse_date_ordinal(date_str):
+    """
+    Returns the ordinal of a 'YYYY-MM-DD' date, or None if it doesn't parse.
+    strptime is slow and ledgers repeat the same few thousand dates, so
+    results are memoized.
+    """
+    try:
+        return datetime.datetime.strptime(date_str, '%Y-%m-%d').toordinal()
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_amount(amount_str):
+    """Returns an Amount string as a float, or None if it isn't a number."""
+    try:
+        amount = float(amount_str)
+    except (ValueError, TypeError):
+        return None
+    return amount if math.isfinite(amount) else None
+
+
+def _amount_to_units(amount_str):
+    """
+    Converts an Amount string to integer units (see AMOUNT_SCALE). Raises
+    ValueError if it isn't a finite number that fits a 64-bit integer.
+    """
+    amount = float(amount_str)
+    if not math.isfinite(amount):
+        raise ValueError(f"Amount is not a finite number: {amount_str!r}")
+    units = round(amount * AMOUNT_SCALE)
+    if not -2 ** 63 < units < 2 ** 63:
+        raise ValueError(f"Amount is out of range: {amount_str!r}")
+    return units
+
+
+def _summary_entry(row):
+    """
+    Returns (is_income, category, units) for a row that counts towards the
+    summary, or None for rows the summary skips (missing or invalid data).
+    """
+    # Check for empty or invalid data BEFORE trying to use it
+    amount_str = row.get('Amount')
+    category = row.get('Category')
+    if not amount_str or not category:
+        return None  # Skip rows with missing essential data
+    try:
+        units = _amount_to_units(amount_str)
+    except (ValueError, TypeError):
+        return None
+    return row.get('Type', 'Expense') == 'Income', category, units
+
+
+def _date_bounds(filter_date=None, date_from=None, date_to=None):
+    """
+    Folds an exact date and an inclusive from/to range into one ordinal range.
+    Returns (low, high); either end may be None for an open range.
+    """
+    low = date_from.toordinal() if date_from else None
+    high = date_to.toordinal() if date_to else None
+    if filter_date:
+        day = filter_date.toordinal()
+        low = day if low is None else max(low, day)
+        high = day if high is None else min(high, day)
+    return low, high
+
+
+# Marks a field that a row doesn't have at all (as opposed to one that is None).
+_ABSENT = object()
+
+
+def _date_text(ordinal):
+    """Formats a date ordinal as 'YYYY-MM-DD' (0 means no valid date)."""
+    return datetime.date.fromordinal(ordinal).isoformat() if ordinal else ''
+
+
+# Amounts written as plain cents ('12.50', '-3.05') and small enough that
+# _amount_to_units is exact for them; _units_text formats them back unchanged.
+_CENTS_AMOUNT_RE = re.compile(r'-?(?:0|[1-9][0-9]{0,8})\.[0-9][0-9]')
+
+
+def _units_text(units):
+    """Formats integer units as an Amount string with two decimals, or more if they aren't whole cents."""
+    sign = '-' if units < 0 else ''
+    whole, fraction = divmod(abs(units), AMOUNT_SCALE)
+    digits = f"{fraction:0{AMOUNT_DECIMALS}d}".rstrip('0')
+    return f"{sign}{whole}.{digits:0<2}"
+
+
+def _transaction_matches(transaction, keyword, category, low=None, high=None, trans_type=""):
+    """
+    Checks one transaction against the keyword, category and type filters
+    and an inclusive date-ordinal range (either end may be None).
+    """
+    # Keyword, Category and Type checks
+    if keyword and keyword.lower() not in (transaction.get('Description') or '').lower():
+        return False
+    if category and category.lower() != (transaction.get('Category') or '').lower():
+        return False
+    if trans_type and trans_type.lower() != (transaction.get('Type') or '').lower():
+        return False
+
+    if low is not None or high is not None:
+        # A missing or malformed date in the CSV cannot match
+        ordinal = _parse_date_ordinal(transaction.get('Date'))
+        if ordinal is None:
+            return False
+        if (low is not None and ordinal < low) or (high is not None and ordinal > high):
+            return False
+
+    return True
+
+
+def _filter_transactions(transactions, keyword="", category="", filter_date=None,
+                         date_from=None, date_to=None, trans_type=""):
+    """Returns the transactions matching every given filter."""
+    low, high = _date_bounds(filter_date, date_from, date_to)
+    # Check if any filter is active
+    if not keyword and not category and not trans_type and low is None and high is None:
+        return transactions
+    return [t for t in transactions if _transaction_matches(t, keyword, category, low, high, trans_type)]
+
+
+def _sort_key(row, field):
+    """
+    Sort key of one field of a row: the date ordinal for Date (0 if it
+    doesn't parse), units for Amount (infinity if it isn't a number, so those
+    sort last) and case-folded text for anything else.
+    """
+    value = row.get(field)
+    if field == 'Date':
+        return _parse_date_ordinal(value) or 0
+    if field == 'Amount':
+        try:
+            return _amount_to_units(value)
+        except (ValueError, TypeError):
+            return math.inf
+    return (value or '').casefold()
@@ -0,0 +1,98 @@
+"""Binary snapshot of a parsed ledger, read back through mmap."""
+import array
+import json
+import struct
+import sys
+
+from ledger import config
+from ledger.numpy_engine import _np_widen
+
+
+SNAPSHOT_MAGIC = b'MTSNAP2\n'
+
+
+def _narrowest(column):
+    """
+    Returns an integer array column converted to the smallest signed type that
+    holds all its values, or the column itself if it can't get any smaller.
+    """
+    if not column:
+        return column
+    low, high = min(column), max(column)
+    for typecode in 'bhi':
+        if array.array(typecode).itemsize >= column.itemsize:
+            break
+        limit = 1 << (8 * array.array(typecode).itemsize - 1)
+        if -limit <= low and high < limit:
+            return array.array(typecode, column)
+    return column
+
+
+def _pack_snapshot(metadata, columns):
+    """
+    Lays out a snapshot as a list of byte chunks: the magic, the JSON
+    metadata (with a table of where each column sits), then every column's
+    raw bytes, 8-byte aligned. Integer columns are stored in the narrowest
+    type that fits and widened again on load. Columns must not be resized
+    until the returned chunks are released.
+    """
+    layout = {}
+    chunks = []
+    offset = 0
+    for name, column in columns.items():
+        typecode = getattr(column, 'typecode', 'B')
+        if isinstance(column, array.array):
+            column = _narrowest(column)
+        data = memoryview(column).cast('B')
+        layout[name] = [typecode, getattr(column, 'typecode', 'B'), offset, data.nbytes]
+        padding = -data.nbytes % 8
+        chunks.extend([data, b'\0' * padding])
+        offset += data.nbytes + padding
+    metadata = dict(
+        metadata,
+        columns=layout,
+        byteorder=sys.byteorder,
+        itemsizes={code: array.array(code).itemsize for code in 'lq'},
+    )
+    head = json.dumps(metadata).encode('utf-8')
+    head += b' ' * (-(len(SNAPSHOT_MAGIC) + 8 + len(head)) % 8)
+    return [SNAPSHOT_MAGIC, struct.pack('<Q', len(head)), head] + chunks
+
+
+def _unpack_snapshot(buffer, key):
+    """
+    Reads a snapshot from a buffer (usually an mmap). Returns (metadata,
+    columns) with each column copied into a growable array, or None if the
+    snapshot was taken of a different file state than `key`. Raises
+    ValueError for anything that isn't a readable snapshot from this platform.
+    """
+    with memoryview(buffer) as view:
+        if bytes(view[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+            raise ValueError("Not a ledger snapshot")
+        (length,) = struct.unpack_from('<Q', view, len(SNAPSHOT_MAGIC))
+        start = len(SNAPSHOT_MAGIC) + 8
+        metadata = json.loads(bytes(view[start:start + length]))
+        if metadata.get('key') != key:
+            return None
+        if metadata['byteorder'] != sys.byteorder or any(
+                array.array(code).itemsize != size for code, size in metadata['itemsizes'].items()):
+            raise ValueError("Snapshot was written on another platform")
+
+        base = start + length
+        columns = {}
+        for name, (typecode, stored, offset, nbytes) in metadata['columns'].items():
+            with view[base + offset:base + offset + nbytes] as data:
+                if len(data) != nbytes:
+                    raise ValueError("Snapshot is truncated")
+                if typecode == 'B':
+                    columns[name] = bytearray(data)
+                    continue
+                column = array.array(stored)
+                column.frombytes(data)
+                if stored != typecode:
+                    if config.USE_NUMPY:
+                        column = _np_widen(column, typecode)
+                    else:
+                        column = array.array(typecode, column)
+                columns[name] = column
+    return metadata, columns
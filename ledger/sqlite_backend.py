@@ -0,0 +1,211 @@
+"""Ledger stored in a SQLite database."""
+import datetime
+import sqlite3
+import threading
+import urllib.parse
+
+import Instrumentation as instrumentation
+
+from ledger import config
+from ledger.backend import LedgerBackend
+from ledger.records import (
+    AMOUNT_SCALE, ID_FIELD, STORAGE_FIELDNAMES, _amount_to_units, _date_bounds, _parse_date_ordinal,
+    _with_ids,
+)
+from ledger.totals import _dated_entries, _rollup
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    date TEXT,
+    type TEXT,
+    description TEXT,
+    category TEXT,
+    amount TEXT,
+    date_ordinal INTEGER,
+    category_key TEXT,
+    type_key TEXT,
+    amount_units INTEGER
+);
+"""
+
+
+# Columns added after the first release, with the SQL that fills them in for
+# existing rows. They are added before the indexes are created.
+_SQLITE_ADDED_COLUMNS = (
+    ('amount_units', 'INTEGER', 'py_amount_units(amount)'),
+    ('type_key', 'TEXT', 'CASE WHEN type IS NOT NULL THEN py_lower(type) END'),
+)
+
+
+_SQLITE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date_ordinal);
+CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category_key);
+DROP INDEX IF EXISTS idx_transactions_type;
+CREATE INDEX IF NOT EXISTS idx_transactions_type_key ON transactions(type_key);
+"""
+
+
+_SQLITE_COLUMNS = "date, type, description, category, amount, id"
+
+
+def _sqlite_params(row):
+    category = row.get('Category')
+    trans_type = row.get('Type')
+    return (
+        row.get('Date'), trans_type, row.get('Description'), category, row.get('Amount'),
+        _parse_date_ordinal(row.get('Date')),
+        category.lower() if category is not None else None,
+        trans_type.lower() if trans_type is not None else None,
+        _sqlite_amount_units(row.get('Amount')),
+        row[ID_FIELD],
+    )
+
+
+def _sqlite_amount_units(amount_str):
+    """The amount_units column: integer units, or NULL if the Amount doesn't parse."""
+    try:
+        return _amount_to_units(amount_str)
+    except (ValueError, TypeError):
+        return None
+
+
+class SqliteLedger(LedgerBackend):
+    """Ledger stored in a SQLite database (WAL mode)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        if config.READ_ONLY:
+            self._conn = sqlite3.connect(f"file:{urllib.parse.quote(path)}?mode=ro", uri=True,
+                                         check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Python's lower() rather than SQLite's ASCII-only one, so keyword
+        # matches agree with the CSV backend for non-ASCII descriptions.
+        self._conn.create_function(
+            "py_lower", 1, lambda value: value.lower() if value is not None else '', deterministic=True
+        )
+        self._conn.create_function("py_amount_units", 1, _sqlite_amount_units, deterministic=True)
+        if config.READ_ONLY:
+            existing = {info[1] for info in self._conn.execute("PRAGMA table_info(transactions)")}
+            if not existing.issuperset(column for column, _, _ in _SQLITE_ADDED_COLUMNS):
+                raise ValueError(
+                    f"{path} was written by an older version; open it in the app or import into it once to upgrade it"
+                )
+            return
+        with self._conn:
+            self._conn.executescript(_SQLITE_SCHEMA)
+            existing = {info[1] for info in self._conn.execute("PRAGMA table_info(transactions)")}
+            for column, declaration, value in _SQLITE_ADDED_COLUMNS:
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE transactions ADD COLUMN {column} {declaration}")
+                    self._conn.execute(f"UPDATE transactions SET {column} = {value}")
+            self._conn.executescript(_SQLITE_INDEXES)
+
+    @instrumentation.timed('sqlite.query')
+    def _rows(self, where="", params=()):
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {_SQLITE_COLUMNS} FROM transactions {where} ORDER BY seq", params
+            )
+            rows = [dict(zip(STORAGE_FIELDNAMES, values)) for values in cursor]
+        instrumentation.count('sqlite.rows_read', len(rows))
+        return rows
+
+    def transactions(self, progress=None):
+        return self._rows()
+
+    def _insert(self, rows):
+        try:
+            self._conn.executemany(
+                "INSERT INTO transactions (date, type, description, category, amount, "
+                "date_ordinal, category_key, type_key, amount_units, id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [_sqlite_params(row) for row in rows],
+            )
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Duplicate transaction ID: {e}") from e
+
+    def append(self, transactions):
+        rows = _with_ids(transactions)
+        with self._lock, self._conn:
+            self._insert(rows)
+        return [row[ID_FIELD] for row in rows]
+
+    def update(self, transaction_id, transaction):
+        row = dict(transaction)
+        row[ID_FIELD] = transaction_id
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE transactions SET date = ?, type = ?, description = ?, category = ?, "
+                "amount = ?, date_ordinal = ?, category_key = ?, type_key = ?, amount_units = ? WHERE id = ?",
+                _sqlite_params(row),
+            )
+        if cursor.rowcount == 0:
+            raise KeyError(transaction_id)
+
+    def delete(self, transaction_id):
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(transaction_id)
+
+    def replace_all(self, transactions):
+        rows = _with_ids(transactions)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transactions")
+            self._insert(rows)
+
+    def search(self, keyword="", category="", filter_date=None, date_from=None, date_to=None,
+               trans_type=""):
+        clauses = []
+        params = []
+        if keyword:
+            clauses.append("instr(py_lower(description), ?) > 0")
+            params.append(keyword.lower())
+        if category:
+            clauses.append("category_key = ?")
+            params.append(category.lower())
+        if trans_type:
+            clauses.append("type_key = ?")
+            params.append(trans_type.lower())
+        low, high = _date_bounds(filter_date, date_from, date_to)
+        if low is not None:
+            clauses.append("date_ordinal >= ?")
+            params.append(low)
+        if high is not None:
+            clauses.append("date_ordinal <= ?")
+            params.append(high)
+        where = "WHERE " + " AND ".join(clauses) if clauses else ""
+        return self._rows(where, params)
+
+    def rollup(self, period='month', by_category=False, date_from=None, date_to=None):
+        low, high = _date_bounds(None, date_from, date_to)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT date_ordinal, {_SQLITE_COLUMNS} FROM transactions "
+                "WHERE date_ordinal BETWEEN ? AND ? ORDER BY date_ordinal, seq",
+                (low if low is not None else 0, high if high is not None else datetime.date.max.toordinal()),
+            )
+            dated_rows = [(values[0], dict(zip(STORAGE_FIELDNAMES, values[1:]))) for values in cursor]
+        return _rollup(_dated_entries(dated_rows), period, by_category)
+
+    def summary_totals(self):
+        with self._lock:
+            row_count = self._conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            cursor = self._conn.execute(
+                "SELECT COALESCE(type = 'Income', 0), category, "
+                "SUM(amount_units) FROM transactions "
+                "WHERE amount_units IS NOT NULL AND category IS NOT NULL AND category != '' "
+                "GROUP BY 1, 2"
+            )
+            income_categories = {}
+            expense_categories = {}
+            for is_income, category, total in cursor:
+                target = income_categories if is_income else expense_categories
+                target[category] = total / AMOUNT_SCALE
+        return row_count, income_categories, expense_categories
@@ -0,0 +1,539 @@
+"""
+Column store holding a parsed ledger in memory, and row views over it.
+
+Dates are ordinals and amounts integer units in typed arrays, Category and
+Type are dictionary-encoded and descriptions are packed into one UTF-8
+buffer. Values the columns can't reproduce exactly (e.g. '2024-1-5') are
+kept verbatim as overrides. Positions never move; deleted rows are only
+flagged dead until the next full load.
+"""
+import array
+import bisect
+import itertools
+import math
+import re
+import threading
+from collections.abc import Mapping, Sequence
+
+import Instrumentation as instrumentation
+
+from ledger.index import DescriptionIndex, _description_tokens, _sorted_contains, _tokens_match
+from ledger.records import (
+    AMOUNT_SCALE, ID_FIELD, STORAGE_FIELDNAMES, _ABSENT, _CENTS_AMOUNT_RE, _amount_to_units,
+    _date_text, _parse_date_ordinal, _row_from_values, _sort_key, _units_text,
+)
+
+# What snapshot() looks for before packing IDs as 16 raw bytes each.
+_HEX_ID_RE = re.compile(r'[0-9a-f]+')
+
+
+class TransactionStore:
+    """Typed, column-oriented storage for parsed ledger rows."""
+
+    LIVE = 1
+    AMOUNT_OK = 2
+    # Per-row typed columns, plus the description buffer, as saved in snapshots.
+    COLUMNS = ('offsets', 'lengths', 'flags', 'dates', 'units', 'categories', 'types',
+               'description_ends', 'description_buffer')
+    # Below this many candidate rows a keyword is checked by scanning them.
+    KEYWORD_SCAN_LIMIT = 256
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}  # ID -> position, live rows only (in file order)
+        self.offsets = array.array('q')  # where the record sits in the CSV file
+        self.lengths = array.array('q')
+        self.flags = bytearray()
+        self.dates = array.array('l')
+        self.units = array.array('q')
+        self.categories = array.array('l')
+        self.category_names = []
+        self.types = array.array('l')
+        self.type_names = []
+        self.description_ends = array.array('q')
+        self.description_buffer = bytearray()
+        self.overrides = {}
+        self._codes = ({}, {})
+        self._date_texts = {}
+        self._description_index = None
+        self._index_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _encode(self, names, codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def add(self, row, offset=0, length=0):
+        """Appends a row (any mapping with an ID). Returns its position."""
+        position = len(self.ids)
+        overrides = {}
+
+        def text(field):
+            value = row.get(field, _ABSENT)
+            if value is None or value is _ABSENT:
+                overrides[field] = value
+                return ''
+            return value
+
+        date = text('Date')
+        ordinal = _parse_date_ordinal(date) or 0
+        if 'Date' not in overrides and self._date_text(ordinal) != date:
+            overrides['Date'] = date
+
+        amount = text('Amount')
+        flags = self.LIVE
+        try:
+            units = _amount_to_units(amount)
+            flags |= self.AMOUNT_OK
+        except (ValueError, TypeError):
+            units = 0
+        if 'Amount' not in overrides and (_units_text(units) if flags & self.AMOUNT_OK else '') != amount:
+            overrides['Amount'] = amount
+
+        description = text('Description').encode('utf-8')
+        for field, value in row.items():
+            if field not in STORAGE_FIELDNAMES:
+                overrides[field] = value
+
+        trans_id = row[ID_FIELD]
+        self.ids.append(trans_id)
+        self.positions[trans_id] = position
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.flags.append(flags)
+        self.dates.append(ordinal)
+        self.units.append(units)
+        self.categories.append(self._encode(self.category_names, self._codes[0], text('Category')))
+        self.types.append(self._encode(self.type_names, self._codes[1], text('Type')))
+        self.description_buffer += description
+        self.description_ends.append(len(self.description_buffer))
+        if overrides:
+            self.overrides[position] = overrides
+        return position
+
+    def add_records(self, header, offsets, lengths, rows):
+        """
+        Appends CSV records (their offsets, lengths and values in header
+        order) as add() would append the rows csv.DictReader makes of them,
+        but a column at a time. Their IDs must be present and new. Records
+        with missing or extra values, or a header with other fields, go
+        through add() one by one.
+        """
+        fields = dict(zip(header, range(len(header))))
+        if len(header) != len(STORAGE_FIELDNAMES) or fields.keys() != set(STORAGE_FIELDNAMES):
+            for offset, length, values in zip(offsets, lengths, rows):
+                self.add(_row_from_values(header, values), offset, length)
+            return
+        start = 0
+        for index, values in enumerate(rows):
+            if len(values) != len(header):
+                self._add_columns(fields, offsets[start:index], lengths[start:index], rows[start:index])
+                self.add(_row_from_values(header, values), offsets[index], lengths[index])
+                start = index + 1
+        self._add_columns(fields, offsets[start:], lengths[start:], rows[start:])
+
+    def _add_columns(self, fields, offsets, lengths, rows):
+        """add_records() for complete records, given {field: index in values}."""
+        if not rows:
+            return
+        base = len(self.ids)
+        columns = list(zip(*rows))
+        ids, dates, types, descriptions, categories, amounts = (
+            columns[fields[field]] for field in (ID_FIELD, 'Date', 'Type', 'Description', 'Category', 'Amount')
+        )
+
+        # Each distinct Date and Amount is parsed once.
+        ordinals = {date: _parse_date_ordinal(date) or 0 for date in set(dates)}
+        odd_dates = {date for date, ordinal in ordinals.items() if self._date_text(ordinal) != date}
+        distinct = set(amounts)
+        plain = set(filter(_CENTS_AMOUNT_RE.fullmatch, distinct))
+        plain.discard('-0.00')
+        units = {amount: int(amount.replace('.', '')) * (AMOUNT_SCALE // 100) for amount in plain}
+        invalid = set()
+        odd_amounts = set()
+        for amount in distinct - plain:
+            try:
+                units[amount] = _amount_to_units(amount)
+            except (ValueError, TypeError):
+                units[amount] = 0
+                invalid.add(amount)
+            if (_units_text(units[amount]) if amount not in invalid else '') != amount:
+                odd_amounts.add(amount)
+        if invalid:
+            amount_flags = bytes(self.LIVE if amount in invalid else self.LIVE | self.AMOUNT_OK for amount in amounts)
+        else:
+            amount_flags = bytes([self.LIVE | self.AMOUNT_OK]) * len(amounts)
+        category_codes = {name: self._encode(self.category_names, self._codes[0], name)
+                          for name in dict.fromkeys(categories)}
+        type_codes = {name: self._encode(self.type_names, self._codes[1], name) for name in dict.fromkeys(types)}
+        encoded = [description.encode('utf-8') for description in descriptions]
+
+        self.ids.extend(ids)
+        self.positions.update(zip(ids, range(base, base + len(ids))))
+        self.offsets.extend(array.array('q', offsets))
+        self.lengths.extend(array.array('q', lengths))
+        self.flags.extend(amount_flags)
+        self.dates.extend(array.array('l', map(ordinals.__getitem__, dates)))
+        self.units.extend(array.array('q', map(units.__getitem__, amounts)))
+        self.categories.extend(array.array('l', map(category_codes.__getitem__, categories)))
+        self.types.extend(array.array('l', map(type_codes.__getitem__, types)))
+        ends = itertools.accumulate(map(len, encoded), initial=len(self.description_buffer))
+        next(ends)
+        self.description_buffer += b''.join(encoded)
+        self.description_ends.extend(array.array('q', ends))
+        if odd_dates or odd_amounts:
+            for position, date, amount in zip(itertools.count(base), dates, amounts):
+                if date in odd_dates:
+                    self.overrides.setdefault(position, {})['Date'] = date
+                if amount in odd_amounts:
+                    self.overrides.setdefault(position, {})['Amount'] = amount
+
+    def extend(self, other, offset_shift=0):
+        """
+        Appends every row of another store (e.g. one parsed in a worker
+        process), shifting its file offsets by offset_shift.
+        """
+        base = len(self.ids)
+        category_codes = [self._encode(self.category_names, self._codes[0], name) for name in other.category_names]
+        type_codes = [self._encode(self.type_names, self._codes[1], name) for name in other.type_names]
+        self.ids.extend(other.ids)
+        live = other.flags.translate(bytes(flag & self.LIVE for flag in range(256)))
+        self.positions.update(zip(itertools.compress(other.ids, live),
+                                  itertools.compress(range(base, base + len(other.ids)), live)))
+        self.offsets.extend(array.array('q', (offset + offset_shift for offset in other.offsets)))
+        self.lengths.extend(other.lengths)
+        self.flags.extend(other.flags)
+        self.dates.extend(other.dates)
+        self.units.extend(other.units)
+        self.categories.extend(array.array('l', map(category_codes.__getitem__, other.categories)))
+        self.types.extend(array.array('l', map(type_codes.__getitem__, other.types)))
+        shift = len(self.description_buffer)
+        self.description_buffer += other.description_buffer
+        self.description_ends.extend(array.array('q', (end + shift for end in other.description_ends)))
+        self.overrides.update((base + position, fields) for position, fields in other.overrides.items())
+
+    def kill(self, position):
+        """Marks a row as deleted and drops its ID from the lookup."""
+        self.flags[position] &= ~self.LIVE
+        trans_id = self.ids[position]
+        if self.positions.get(trans_id) == position:
+            del self.positions[trans_id]
+
+    def live_positions(self, positions):
+        """Returns those of `positions` whose rows are still live, in the same order."""
+        live = self.flags.translate(bytes(flag & self.LIVE for flag in range(256)))
+        return list(itertools.compress(positions, map(live.__getitem__, positions)))
+
+    def _date_text(self, ordinal):
+        text = self._date_texts.get(ordinal)
+        if text is None:
+            text = self._date_texts[ordinal] = _date_text(ordinal)
+        return text
+
+    def description(self, position):
+        start = self.description_ends[position - 1] if position else 0
+        return self.description_buffer[start:self.description_ends[position]].decode('utf-8')
+
+    def value(self, position, field):
+        """Returns one field of a row, exactly as it was parsed. KeyError if the row lacks it."""
+        overrides = self.overrides.get(position)
+        if overrides and field in overrides:
+            value = overrides[field]
+            if value is _ABSENT:
+                raise KeyError(field)
+            return value
+        if field == 'Date':
+            return self._date_text(self.dates[position])
+        if field == 'Type':
+            return self.type_names[self.types[position]]
+        if field == 'Description':
+            return self.description(position)
+        if field == 'Category':
+            return self.category_names[self.categories[position]]
+        if field == 'Amount':
+            return _units_text(self.units[position]) if self.flags[position] & self.AMOUNT_OK else ''
+        if field == ID_FIELD:
+            return self.ids[position]
+        raise KeyError(field)
+
+    def sort_keys(self, positions, field):
+        """
+        _sort_key() of one field for each of `positions`, read straight from
+        the typed columns instead of through row views.
+        """
+        if field == 'Date':
+            dates = self.dates
+            return [dates[p] for p in positions]
+        if field == 'Amount':
+            units, flags, amount_ok = self.units, self.flags, self.AMOUNT_OK
+            return [units[p] if flags[p] & amount_ok else math.inf for p in positions]
+        if field == 'Category':
+            names, codes = self.category_names, self.categories
+        elif field == 'Type':
+            names, codes = self.type_names, self.types
+        elif field == 'Description':
+            return [self.description(p).casefold() for p in positions]
+        else:
+            return [_sort_key(self.row(p), field) for p in positions]
+        folded = [name.casefold() for name in names]
+        return [folded[codes[p]] for p in positions]
+
+    def fields(self, position):
+        """Returns the field names a row has, in CSV column order."""
+        overrides = self.overrides.get(position)
+        if not overrides:
+            return STORAGE_FIELDNAMES
+        fields = [f for f in STORAGE_FIELDNAMES if overrides.get(f, None) is not _ABSENT]
+        fields.extend(f for f in overrides if f not in STORAGE_FIELDNAMES)
+        return fields
+
+    def row(self, position):
+        return TransactionRow(self, position)
+
+    def snapshot(self):
+        """Returns (metadata, columns) describing the store, for _pack_snapshot."""
+        columns = {name: getattr(self, name) for name in self.COLUMNS}
+        id_text = ''.join(self.ids)
+        if set(map(len, self.ids)) == {32} and _HEX_ID_RE.fullmatch(id_text):
+            # Generated IDs are uuid4 hex: store them as 16 raw bytes each.
+            # Every ID must be exactly 32 characters, or the split on load would be wrong.
+            columns['id_bytes'] = bytes.fromhex(id_text)
+        else:
+            id_ends = array.array('q')
+            end = 0
+            for trans_id in self.ids:
+                end += len(trans_id)
+                id_ends.append(end)
+            columns['id_ends'] = id_ends
+            columns['id_text'] = id_text.encode('utf-8')
+        # Absent fields are saved as [] and present ones as [value].
+        overrides = [
+            [position, [[field, [] if value is _ABSENT else [value]] for field, value in fields.items()]]
+            for position, fields in self.overrides.items()
+        ]
+        metadata = {
+            'category_names': self.category_names,
+            'type_names': self.type_names,
+            'overrides': overrides,
+        }
+        return metadata, columns
+
+    @classmethod
+    def from_snapshot(cls, metadata, columns):
+        """Rebuilds a store from what snapshot() returned. ValueError if the parts don't fit."""
+        store = cls()
+        for name in cls.COLUMNS:
+            setattr(store, name, columns[name])
+        if 'id_bytes' in columns:
+            text = columns['id_bytes'].hex('\n', 16)
+            store.ids = text.split('\n') if text else []
+        else:
+            text = columns['id_text'].decode('utf-8')
+            start = 0
+            for end in columns['id_ends']:
+                store.ids.append(text[start:end])
+                start = end
+            if start != len(text):
+                raise ValueError("Snapshot IDs don't line up")
+        count = len(store.ids)
+        if any(len(columns[name]) != count for name in cls.COLUMNS[:-1]):
+            raise ValueError("Snapshot columns don't line up")
+
+        live = store.flags.translate(bytes(flag & cls.LIVE for flag in range(256)))
+        store.positions = dict(zip(itertools.compress(store.ids, live), itertools.compress(range(count), live)))
+        store.category_names = metadata['category_names']
+        store.type_names = metadata['type_names']
+        store._codes = (
+            {name: code for code, name in enumerate(store.category_names)},
+            {name: code for code, name in enumerate(store.type_names)},
+        )
+        store.overrides = {
+            position: {field: value[0] if value else _ABSENT for field, value in fields}
+            for position, fields in metadata['overrides']
+        }
+        return store
+
+    def description_index(self):
+        """Returns the store's DescriptionIndex, building it (or indexing rows it hasn't seen yet) first."""
+        with self._index_lock:
+            return self._catch_up_index()
+
+    def ready_index(self):
+        """
+        Returns the DescriptionIndex if description_index() has built one and
+        isn't building it right now, else None. Searches then scan the rows
+        rather than pay for (or wait on) a build.
+        """
+        if self._description_index is None or not self._index_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._catch_up_index()
+        finally:
+            self._index_lock.release()
+
+    def _catch_up_index(self):
+        """Indexes the rows added since the last call. The caller holds _index_lock."""
+        index = self._description_index
+        if index is None:
+            index = self._description_index = DescriptionIndex()
+        # Writers may append while this runs without the ledger lock; a
+        # row's description end is stored last, so only rows up to it are complete.
+        count = len(self.description_ends)
+        if index.size < count:
+            with instrumentation.span('search.index_build'):
+                instrumentation.count('search.rows_indexed', count - index.size)
+                description = self.description
+                while index.size < count:
+                    index.add(index.size, description(index.size))
+        return index
+
+    def keyword_positions(self, keyword):
+        """
+        Returns the live positions, in file order, whose Description contains
+        keyword (case-insensitive). With a ready index (see ready_index) the
+        index answers, or at least narrows down the rows to check; without
+        one the whole store is scanned.
+        """
+        wanted = keyword.lower()
+        flags, live, description = self.flags, self.LIVE, self.description
+        index = self.ready_index()
+        if index is None:
+            candidates = range(len(self.ids))
+        else:
+            found = index.exact_positions(wanted)
+            if found is not None:
+                return self.live_positions(found)
+            candidates = index.substring_candidates(wanted)
+        instrumentation.count('search.rows_scanned', len(candidates))
+        return [p for p in candidates if flags[p] & live and wanted in description(p).lower()]
+
+    def term_positions(self, terms, prefix=True):
+        """
+        Returns the live positions, in file order, whose Description has every
+        one of the (lowercased) terms as a word, or as a word prefix.
+        Without a ready index every description is checked.
+        """
+        index = self.ready_index()
+        if index is None:
+            description = self.description
+            return [p for p in self.positions.values()
+                    if _tokens_match(_description_tokens(description(p)), terms, prefix)]
+        postings = sorted((index.term_positions(term, prefix) for term in terms), key=len)
+        if not postings:
+            return list(self.positions.values())
+        smallest, others = postings[0], postings[1:]
+        flags, live = self.flags, self.LIVE
+        return [p for p in smallest if flags[p] & live and all(_sorted_contains(other, p) for other in others)]
+
+    def filter_positions(self, positions, keyword="", category="", trans_type=""):
+        """Applies the keyword, category and type filters of search_transactions to positions."""
+        if category:
+            wanted = category.lower()
+            codes = {code for code, name in enumerate(self.category_names) if name.lower() == wanted}
+            categories = self.categories
+            positions = [p for p in positions if categories[p] in codes]
+        if trans_type:
+            wanted = trans_type.lower()
+            codes = {code for code, name in enumerate(self.type_names) if name.lower() == wanted}
+            types = self.types
+            positions = [p for p in positions if types[p] in codes]
+        if keyword:
+            wanted = keyword.lower()
+            index = self.ready_index() if len(positions) > self.KEYWORD_SCAN_LIMIT else None
+            if index is not None and index.candidate_bound(wanted) < len(positions):
+                hits = set(self.keyword_positions(wanted))
+                positions = list(itertools.compress(positions, map(hits.__contains__, positions)))
+            else:
+                description = self.description
+                positions = [p for p in positions if wanted in description(p).lower()]
+        return positions
+
+    def summary_entries(self, positions):
+        """
+        Yields (position, is_income, category, units) for the rows that count
+        towards the summary, the same rows _summary_entry accepts.
+        """
+        flags, units, categories, types = self.flags, self.units, self.categories, self.types
+        names = self.category_names
+        income_codes = {code for code, name in enumerate(self.type_names) if name == 'Income'}
+        amount_ok = self.AMOUNT_OK
+        for p in positions:
+            if not flags[p] & amount_ok:
+                continue
+            category = names[categories[p]]
+            if not category:
+                continue
+            yield p, types[p] in income_codes, category, units[p]
+
+
+class TransactionRow(Mapping):
+    """Read-only, dict-like view of one row in a TransactionStore."""
+
+    __slots__ = ('_store', '_position')
+
+    def __init__(self, store, position):
+        self._store = store
+        self._position = position
+
+    def __getitem__(self, field):
+        return self._store.value(self._position, field)
+
+    def __iter__(self):
+        return iter(self._store.fields(self._position))
+
+    def __len__(self):
+        return len(self._store.fields(self._position))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TransactionRows(Sequence):
+    """A list-like sequence of TransactionRow views over selected store positions."""
+
+    def __init__(self, store, positions):
+        self.store = store
+        self.positions = positions
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TransactionRows(self.store, self.positions[index])
+        return TransactionRow(self.store, self.positions[index])
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class ChainedRows(Sequence):
+    """A list-like sequence over several row sequences back to back, without copying them."""
+
+    def __init__(self, parts):
+        self.parts = [part for part in parts if len(part)]
+        self._ends = list(itertools.accumulate(len(part) for part in self.parts))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        part = bisect.bisect_right(self._ends, index)
+        return self.parts[part][index - (self._ends[part - 1] if part else 0)]
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.parts)
+
+    def __len__(self):
+        return self._ends[-1] if self._ends else 0
+
+    def __repr__(self):
+        return repr(list(self))
@@ -0,0 +1,138 @@
+"""Per-category totals and per-period rollups."""
+import datetime
+
+from ledger.records import AMOUNT_SCALE, _summary_entry
+
+
+class CategoryTotals:
+    """Per-category Amount totals split by Type, as used by get_summary_text."""
+
+    def __init__(self):
+        self.row_count = 0
+        self.income = {}  # category -> [units, rows]
+        self.expense = {}
+
+    def add(self, row, sign=1):
+        """Adds a row's contribution (or removes it, with sign=-1)."""
+        self.row_count += sign
+        entry = _summary_entry(row)
+        if entry is not None:
+            self.add_entry(*entry, sign=sign)
+
+    def add_entry(self, is_income, category, units, sign=1):
+        """Adds one summary entry without touching row_count."""
+        bucket = self.income if is_income else self.expense
+        total = bucket.setdefault(category, [0, 0])
+        total[0] += sign * units
+        total[1] += sign
+        if total[1] == 0:
+            del bucket[category]
+
+    def merge(self, other):
+        """Adds another CategoryTotals (e.g. one built in a worker process) into this one."""
+        self.row_count += other.row_count
+        for mine, theirs in ((self.income, other.income), (self.expense, other.expense)):
+            for category, (units, rows) in theirs.items():
+                total = mine.setdefault(category, [0, 0])
+                total[0] += units
+                total[1] += rows
+
+    def summary(self):
+        """Returns (row_count, income_categories, expense_categories) with totals in RM."""
+        return (
+            self.row_count,
+            {category: total[0] / AMOUNT_SCALE for category, total in self.income.items()},
+            {category: total[0] / AMOUNT_SCALE for category, total in self.expense.items()},
+        )
+
+    def to_dict(self):
+        return {'scale': AMOUNT_SCALE, 'row_count': self.row_count, 'income': self.income, 'expense': self.expense}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('scale') != AMOUNT_SCALE:
+            raise ValueError("Totals were saved in other amount units")
+        totals = cls()
+        totals.row_count = data['row_count']
+        totals.income = {category: list(total) for category, total in data['income'].items()}
+        totals.expense = {category: list(total) for category, total in data['expense'].items()}
+        return totals
+
+
+def _same_totals(expected, actual):
+    """Compares two summary_totals() results to the cent."""
+    if expected[0] != actual[0]:
+        return False
+    for want, got in zip(expected[1:], actual[1:]):
+        if want.keys() != got.keys():
+            return False
+        if any(abs(want[category] - got[category]) >= 0.005 for category in want):
+            return False
+    return True
+
+
+ROLLUP_PERIODS = ('day', 'week', 'month', 'year')
+
+
+def _period_key(ordinal, period):
+    """Labels a date ordinal with its rollup period, e.g. '2024-03' for a month."""
+    date = datetime.date.fromordinal(ordinal)
+    if period == 'month':
+        return f"{date.year:04d}-{date.month:02d}"
+    if period == 'year':
+        return f"{date.year:04d}"
+    if period == 'week':
+        year, week, _ = date.isocalendar()
+        return f"{year:04d}-W{week:02d}"
+    if period == 'day':
+        return date.isoformat()
+    raise ValueError(f"Unknown rollup period: {period!r}")
+
+
+def _rollup(dated_entries, period='month', by_category=False):
+    """
+    Sums income and expense per period (and optionally per category) over
+    (ordinal, is_income, category, units) entries, i.e. only rows the summary
+    counts. Returns a list of dicts sorted by period (then category).
+    """
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"Unknown rollup period: {period!r}")
+    labels = {}
+    groups = {}
+    for ordinal, is_income, category, units in dated_entries:
+        label = labels.get(ordinal)
+        if label is None:
+            label = labels[ordinal] = _period_key(ordinal, period)
+        key = (label, category) if by_category else (label,)
+        totals = groups.setdefault(key, [0, 0])
+        totals[0 if is_income else 1] += units
+
+    result = []
+    for key in sorted(groups):
+        income, expense = groups[key]
+        item = {'Period': key[0]}
+        if by_category:
+            item['Category'] = key[1]
+        item['Income'] = income / AMOUNT_SCALE
+        item['Expense'] = expense / AMOUNT_SCALE
+        result.append(item)
+    return result
+
+
+def _dated_entries(dated_rows):
+    """Turns (ordinal, row) pairs into rollup entries, dropping rows the summary skips."""
+    for ordinal, row in dated_rows:
+        entry = _summary_entry(row)
+        if entry is not None:
+            yield (ordinal,) + entry
+
+
+def _category_totals(transactions):
+    """
+    Sums Amount per category, split by Type. Returns
+    (row_count, income_categories, expense_categories).
+    """
+    totals = CategoryTotals()
+    for row in transactions:
+        totals.add(row)
+    return totals.summary()
@@ -0,0 +1,77 @@
+"""Shared fixtures: each test runs against its own ledger directory."""
+import csv
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Code_Function  # noqa: E402
+from ledger import config  # noqa: E402
+
+DESCRIPTIONS = [
+    'Kopi O', 'Nasi lemak', 'GROCERY supplies', 'Rent, March', 'Book "Dune"',
+    'Café au lait', 'İstanbul trip', 'straße cleaning', '', 'x', 'Petrol Shell',
+]
+CATEGORIES = ['Food', 'food', 'Rent', 'Travel', 'Café', '']
+DATES = ['2024-01-05', '2024-1-6', '2023-12-31', '2024-02-29', 'not a date', '']
+AMOUNTS = ['12.50', '3', '-4.10', '1000000.005', '0.10', 'abc', '']
+
+
+def make_rows(count, seed=0):
+    """Returns `count` varied rows, malformed dates and amounts included."""
+    rng = random.Random(seed)
+    return [{
+        'Date': rng.choice(DATES),
+        'Type': rng.choice(['Income', 'Expense']),
+        'Description': f"{rng.choice(DESCRIPTIONS)} {rng.randrange(1000)}".strip(),
+        'Category': rng.choice(CATEGORIES),
+        'Amount': rng.choice(AMOUNTS),
+        Code_Function.ID_FIELD: Code_Function.new_transaction_id(),
+    } for _ in range(count)]
+
+
+def write_ledger(rows, path=None):
+    """Writes rows to the ledger CSV the way the app stores them."""
+    with open(path or Code_Function.CSV_FILE, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=Code_Function.STORAGE_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def stored_rows():
+    """Returns the ledger's rows as plain dicts, in order."""
+    return [dict(row) for row in Code_Function.get_transactions()]
+
+
+def _drop_ledgers():
+    for ledger in Code_Function._ledgers.values():
+        timer = getattr(ledger, '_snapshot_timer', None)
+        if timer is not None:
+            timer.cancel()
+            ledger._snapshot_timer = None
+    Code_Function._ledgers.clear()
+
+
+@pytest.fixture
+def ledger_dir(tmp_path, monkeypatch):
+    """A fresh working directory for the default CSV ledger."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Code_Function, 'STORAGE_BACKEND', 'csv')
+    monkeypatch.setattr(Code_Function, '_backend_override', None)
+    monkeypatch.setattr(config, 'READ_ONLY', False)
+    _drop_ledgers()
+    yield tmp_path
+    _drop_ledgers()
+
+
+@pytest.fixture
+def restart():
+    """
+    Returns a function that ends the "session" the way a crash would: the
+    shared ledgers are forgotten without compacting or snapshotting, so the
+    next call loads everything from disk again.
+    """
+    return _drop_ledgers
@@ -0,0 +1,131 @@
+"""A bulk import must store exactly what a serial parse of the export gives, wherever the chunks are cut."""
+import csv
+import mmap
+
+import pytest
+
+import Code_Function
+from ledger import bulk_import, config
+from ledger.records import FIELDNAMES, _iter_records, _parse_amount, _parse_date_ordinal, _read_header
+from conftest import make_rows, stored_rows, write_ledger
+
+MULTI_LINE = ['Dinner\nwith "friends"', 'Refund\n\nof deposit', 'note:\n  "quoted", line']
+# Its second line, with the Category and Amount after it, parses as a whole record.
+RECORD_LIKE = 'Transfer\n2024-01-01,Expense,looks like a record'
+# Quotes inside unquoted fields are plain text to csv.reader.
+STRAY_QUOTES = ['2024-01-07,Expense,5" screen,Tech,99.00\n', '2024-01-08,Income,it\'s "fine,Misc,1\n']
+
+
+def _write_export(path, count, quoting=csv.QUOTE_ALL, extra=()):
+    """Writes a bank-style export of `count` rows, with multi-line Descriptions and stray quotes."""
+    rows = make_rows(count, seed=3)
+    for number, row in enumerate(rows):
+        if number % 5 == 0:
+            row['Description'] = MULTI_LINE[number % len(MULTI_LINE)]
+        elif number % 17 == 0:
+            row['Description'] = extra[number % len(extra)] if extra else row['Description']
+    with open(path, 'w', newline='', encoding='utf-8') as export:
+        writer = csv.writer(export, quoting=quoting)
+        writer.writerow(FIELDNAMES)
+        for number, row in enumerate(rows):
+            if quoting != csv.QUOTE_ALL and number % 13 == 0:
+                export.write(STRAY_QUOTES[number % len(STRAY_QUOTES)])
+            writer.writerow([row[field] for field in FIELDNAMES])
+
+
+def _record_starts(path):
+    with open(path, 'rb') as export:
+        header = _read_header(export)
+        start = export.tell()
+        return start, {offset for offset, _, _ in _iter_records(export, header)}
+
+
+def _expected(path):
+    return [{field: row.get(field) or '' for field in FIELDNAMES} for row in Code_Function.iter_transactions(path)]
+
+
+@pytest.mark.parametrize('quoting', [csv.QUOTE_ALL, csv.QUOTE_MINIMAL], ids=['quoted', 'minimal'])
+def test_cuts_land_on_record_starts(tmp_path, quoting):
+    path = str(tmp_path / 'export.csv')
+    _write_export(path, 400, quoting)
+    start, starts = _record_starts(path)
+    with open(path, 'rb') as export, mmap.mmap(export.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for chunk_bytes in (64, 200, 333, 1000, 4096):
+            cuts = bulk_import._record_cuts(data, start, chunk_bytes, len(FIELDNAMES))
+            assert cuts and set(cuts) <= starts, chunk_bytes
+            assert cuts == sorted(set(cuts))
+
+
+def test_chunk_ranges_cover_the_file(tmp_path):
+    path = str(tmp_path / 'export.csv')
+    _write_export(path, 400, csv.QUOTE_MINIMAL)
+    start, _ = _record_starts(path)
+    with open(path, 'rb') as export:
+        size = len(export.read())
+    ranges = bulk_import._chunk_ranges(path, start, 500, len(FIELDNAMES))
+    assert len(ranges) > 10
+    assert ranges[0][0] == start and ranges[-1][1] == size
+    assert all(previous[1] == following[0] for previous, following in zip(ranges, ranges[1:]))
+    assert bulk_import._chunk_ranges(path, start, size, len(FIELDNAMES)) == [(start, size)]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('quoting', [csv.QUOTE_ALL, csv.QUOTE_MINIMAL], ids=['quoted', 'minimal'])
+def test_import_matches_serial_parse(ledger_dir, restart, monkeypatch, workers, quoting):
+    _write_export('export.csv', 600, quoting, extra=[RECORD_LIKE])
+    monkeypatch.setattr(config, 'IMPORT_CHUNK_BYTES', 700)
+    monkeypatch.setattr(config, 'IMPORT_MIN_CHUNK_BYTES', 300)
+    seed = make_rows(5)
+    write_ledger(seed)
+    expected = _expected('export.csv')
+
+    report = Code_Function.bulk_import_csv('export.csv', workers=workers)
+    assert len(report['chunks']) > 10
+    assert sum(chunk['rows'] for chunk in report['chunks']) == len(expected)
+    assert report['imported'] == len(expected)
+    imported = stored_rows()
+    assert imported[:5] == seed
+    assert [{field: row[field] for field in FIELDNAMES} for row in imported[5:]] == expected
+    assert len({row['ID'] for row in imported}) == len(imported)
+    assert Code_Function.verify_summary_cache()
+    restart()
+    assert stored_rows() == imported
+
+
+def test_wrong_cut_is_parsed_again(ledger_dir, monkeypatch):
+    # Every row's Description holds a line that looks like a record, so some cuts guess wrong.
+    _write_export('export.csv', 300, extra=[RECORD_LIKE])
+    with open('export.csv', newline='', encoding='utf-8') as export:
+        rows = list(csv.DictReader(export))
+    with open('export.csv', 'w', newline='', encoding='utf-8') as export:
+        writer = csv.DictWriter(export, fieldnames=FIELDNAMES, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        writer.writerows({**row, 'Description': RECORD_LIKE} for row in rows)
+    start, starts = _record_starts('export.csv')
+    with open('export.csv', 'rb') as export:
+        cuts = bulk_import._record_cuts(export.read(), start, 300, len(FIELDNAMES))
+    assert not set(cuts) <= starts
+
+    monkeypatch.setattr(config, 'IMPORT_CHUNK_BYTES', 300)
+    monkeypatch.setattr(config, 'IMPORT_MIN_CHUNK_BYTES', 300)
+    Code_Function.initialize_csv()
+    report = Code_Function.bulk_import_csv('export.csv', workers=1)
+    assert report['imported'] == len(rows)
+    assert [{field: row[field] for field in FIELDNAMES} for row in stored_rows()] == _expected('export.csv')
+
+
+def test_skip_malformed(ledger_dir):
+    _write_export('export.csv', 300, csv.QUOTE_MINIMAL)
+    expected = _expected('export.csv')
+    Code_Function.initialize_csv()
+    report = Code_Function.bulk_import_csv('export.csv', workers=1, skip_malformed=True)
+    chunk = report['chunks'][0]
+    assert chunk['rows'] == len(expected)
+    assert chunk['bad_dates'] and chunk['bad_amounts'] and chunk['missing_categories']
+    kept = [
+        row for row in expected
+        if _parse_date_ordinal(row['Date']) is not None
+        and _parse_amount(row['Amount']) is not None and row['Category']
+    ]
+    assert report['imported'] == len(kept)
+    assert [{field: row[field] for field in FIELDNAMES} for row in stored_rows()] == kept
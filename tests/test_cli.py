@@ -0,0 +1,107 @@
+"""The read-only commands (search, summary, report, export) must leave every file on disk as they found it."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import Code_Function
+import MoneySpending
+from ledger import config
+from conftest import make_rows, write_ledger
+
+READS = [
+    ['search', '--keyword', 'a'],
+    ['search', '--category', 'Food', '--from', '2024-01-01', '--format', 'csv'],
+    ['summary'],
+    ['summary', '--format', 'text'],
+    ['report', '--by-category'],
+    ['export', '--format', 'json'],
+]
+
+
+@pytest.fixture
+def cli(ledger_dir, monkeypatch, capsys):
+    """Runs MoneySpending.py in-process; the paths and settings it changes are put back afterwards."""
+    for name in ('CSV_FILE', 'SQLITE_FILE', 'PARTITION_DIR'):
+        monkeypatch.setattr(Code_Function, name, getattr(Code_Function, name))
+
+    def run(*argv):
+        capsys.readouterr()
+        status = MoneySpending.main(list(argv))
+        return status, capsys.readouterr().out
+    return run
+
+
+def _tree(root='.'):
+    """
+    Every file under `root` with its size and modification time, except
+    SQLite's -shm file: any reader of a WAL database updates that shared
+    memory index, and it holds no ledger data.
+    """
+    found = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith('-shm'):
+                continue
+            info = os.stat(os.path.join(directory, name))
+            found[os.path.join(directory, name)] = (info.st_size, info.st_mtime_ns)
+    return found
+
+
+def _read_everything(cli, restart, *options):
+    before = _tree()
+    for argv in READS:
+        restart()
+        status, _ = cli(*options, *argv)
+        assert status == 0, argv
+        assert _tree() == before, argv
+    restart()
+    status, out = cli(*options, 'summary')
+    return json.loads(out)
+
+
+def test_legacy_csv_is_not_rewritten(cli, restart):
+    with open('legacy.csv', 'w', newline='', encoding='utf-8') as legacy:
+        legacy.write('Date,Type,Description,Category,Amount\r\n'
+                     '2024-01-01,Expense,a,Food,1.00\r\n2024-01-02,Income,b,Pay,2.50\r\n')
+    summary = _read_everything(cli, restart, '--ledger', 'legacy.csv')
+    assert summary['rows'] == 2 and summary['net_balance'] == 1.5
+
+
+def test_pending_journal_is_not_folded(cli, restart, monkeypatch):
+    rows = make_rows(50)
+    write_ledger(rows)
+    monkeypatch.setattr(config, 'JOURNAL_MAX_EDITS', 1000)
+    Code_Function.delete_transaction_by_id(rows[0]['ID'])
+    restart()  # without the compaction a clean exit would do
+    assert os.path.exists(Code_Function.CSV_FILE + '.journal')
+    monkeypatch.setattr(config, 'READ_ONLY', True)
+    assert _read_everything(cli, restart)['rows'] == 49
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'partitioned'])
+def test_other_backends_are_not_written(cli, restart, backend):
+    write_ledger(make_rows(100), 'export.csv')
+    assert cli('--backend', backend, '--ledger', 'store', 'import', 'export.csv')[0] == 0
+    restart()
+    assert _read_everything(cli, restart, '--backend', backend, '--ledger', 'store')['rows'] == 100
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite', 'partitioned'])
+def test_missing_ledger_is_not_created(cli, backend):
+    status, out = cli('--backend', backend, '--ledger', 'missing', 'summary')
+    assert status == 1 and not out
+    assert _tree() == {}
+
+
+def test_numpy_is_not_imported_until_used(ledger_dir):
+    write_ledger(make_rows(50))
+    program = (
+        "import sys, MoneySpending; from ledger import config; config.USE_NUMPY = False; "
+        "MoneySpending.main(['summary']); MoneySpending.main(['search', '--category', 'Food']); "
+        "sys.exit('numpy' in sys.modules)"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert subprocess.run([sys.executable, '-c', program], env=env, capture_output=True).returncode == 0
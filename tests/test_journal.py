@@ -0,0 +1,129 @@
+"""Edits are journaled before they reach the CSV; a crash or a failure must not lose or half-apply them."""
+import csv
+import os
+
+import pytest
+
+import Code_Function
+from conftest import make_rows, stored_rows, write_ledger
+
+NEW_ROW = {'Date': '2024-03-01', 'Type': 'Income', 'Description': 'Pay', 'Category': 'Salary', 'Amount': '10.00'}
+
+
+def _edit(rows):
+    """Appends, updates and deletes a row through the API. Returns the expected ledger."""
+    new_id = Code_Function.append_transaction(NEW_ROW)
+    changed = {**NEW_ROW, 'Description': 'Changed', 'Amount': '7.25'}
+    Code_Function.update_transaction_by_id(rows[3]['ID'], changed)
+    Code_Function.delete_transaction_by_id(rows[5]['ID'])
+    expected = [row for row in rows if row['ID'] not in (rows[3]['ID'], rows[5]['ID'])]
+    return expected + [{**NEW_ROW, 'ID': new_id}, {**changed, 'ID': rows[3]['ID']}]
+
+
+def _on_disk():
+    with open(Code_Function.CSV_FILE, 'rb') as csvfile:
+        return csvfile.read()
+
+
+def test_replay_after_crash(ledger_dir, restart):
+    rows = make_rows(100)
+    write_ledger(rows)
+    stored_rows()
+    before = _on_disk()
+    expected = _edit(rows)
+    assert _on_disk() == before  # the edits are only in the journal so far
+    assert os.path.exists(Code_Function.get_ledger().journal_path)
+
+    restart()
+    assert stored_rows() == expected
+    assert Code_Function.verify_summary_cache()
+    # Replaying compacted the journal into the file
+    assert not os.path.exists(Code_Function.get_ledger().journal_path)
+    restart()
+    with open(Code_Function.CSV_FILE, newline='', encoding='utf-8') as csvfile:
+        assert [dict(row) for row in csv.DictReader(csvfile)] == expected
+
+
+def test_torn_journal_tail_is_ignored(ledger_dir, restart):
+    rows = make_rows(20)
+    write_ledger(rows)
+    stored_rows()
+    expected = _edit(rows)
+    with open(Code_Function.get_ledger().journal_path, 'ab') as journal:
+        journal.write(b'[["abc",{"Date":"20')  # the crash hit mid-write
+    restart()
+    assert stored_rows() == expected
+
+
+def test_replay_after_snapshot_restore(ledger_dir, restart):
+    rows = make_rows(100)
+    write_ledger(rows)
+    stored_rows()
+    Code_Function.get_ledger().flush_snapshot()
+    expected = _edit(rows)
+    restart()
+    assert stored_rows() == expected
+
+
+def test_failed_batch_rolls_back(ledger_dir):
+    rows = make_rows(100)
+    write_ledger(rows)
+    before = stored_rows()
+    totals = Code_Function.get_summary_totals()
+    with pytest.raises(RuntimeError):
+        with Code_Function.batch():
+            _edit(rows)
+            raise RuntimeError('boom')
+    assert stored_rows() == before
+    assert Code_Function.get_summary_totals() == totals
+    assert Code_Function.verify_summary_cache()
+    assert not os.path.exists(Code_Function.get_ledger().journal_path)
+
+
+def test_failed_batch_rolls_back_bulk_import(ledger_dir, restart):
+    rows = make_rows(100)
+    write_ledger(rows)
+    write_ledger(make_rows(50, seed=1), 'export.csv')
+    Code_Function.append_transaction(NEW_ROW)  # leaves an edit in the journal
+    before = stored_rows()
+    with pytest.raises(RuntimeError):
+        with Code_Function.batch():
+            Code_Function.delete_transaction_by_id(rows[0]['ID'])
+            Code_Function.bulk_import_csv('export.csv', workers=1)
+            raise RuntimeError('boom')
+    assert stored_rows() == before
+    assert Code_Function.verify_summary_cache()
+    restart()
+    assert stored_rows() == before
+
+
+def test_rewrites_refused_inside_batch(ledger_dir):
+    rows = make_rows(20)
+    write_ledger(rows)
+    with Code_Function.batch():
+        Code_Function.delete_transaction_by_id(rows[0]['ID'])
+        with pytest.raises(RuntimeError):
+            Code_Function.compact_transactions()
+        with pytest.raises(RuntimeError):
+            Code_Function.save_all_transactions(rows)
+    assert stored_rows() == rows[1:]
+
+
+def test_failed_journal_write_drops_edit(ledger_dir, monkeypatch):
+    rows = make_rows(100)
+    write_ledger(rows)
+    before = stored_rows()
+    totals = Code_Function.get_summary_totals()
+
+    def fail(fd):
+        raise OSError('disk full')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'fsync', fail)
+        with pytest.raises(OSError):
+            Code_Function.append_transaction(NEW_ROW)
+        with pytest.raises(OSError):
+            Code_Function.delete_transaction_by_id(rows[0]['ID'])
+    assert stored_rows() == before
+    assert Code_Function.get_summary_totals() == totals
+    assert Code_Function.verify_summary_cache()
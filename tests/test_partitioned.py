@@ -0,0 +1,137 @@
+"""The partitioned ledger must hold the same rows as one CSV file, and prune by date without losing any."""
+import datetime
+import json
+import os
+
+import pytest
+
+import Code_Function
+from ledger.csv_backend import CsvLedger
+from conftest import make_rows, write_ledger
+
+NEW_ROW = {'Date': '2024-01-20', 'Type': 'Expense', 'Description': 'Moved', 'Category': 'Food', 'Amount': '4.00'}
+
+
+@pytest.fixture
+def partitioned(ledger_dir, monkeypatch):
+    monkeypatch.setattr(Code_Function, 'STORAGE_BACKEND', 'partitioned')
+    return Code_Function.get_partitioned_ledger()
+
+
+def _rows():
+    return sorted((dict(row) for row in Code_Function.get_transactions()), key=lambda row: row['ID'])
+
+
+def _flat_totals(rows):
+    """Summary totals of the same rows kept in a single CSV file."""
+    write_ledger(rows, 'flat.csv')
+    return CsvLedger('flat.csv').summary_totals()
+
+
+def _totals():
+    return Code_Function.get_backend().summary_totals()
+
+
+def _manifest():
+    with open(os.path.join(Code_Function.PARTITION_DIR, 'manifest.json')) as manifest_file:
+        return json.load(manifest_file)['partitions']
+
+
+def test_rows_split_by_month(partitioned):
+    rows = make_rows(300)
+    Code_Function.append_transactions(rows)
+    assert sorted(name for name in os.listdir(Code_Function.PARTITION_DIR) if name.endswith('.csv')) == [
+        '2023-12.csv', '2024-01.csv', '2024-02.csv', 'undated.csv',
+    ]
+    assert _rows() == sorted(rows, key=lambda row: row['ID'])
+    assert _totals() == _flat_totals(rows)
+    assert sum(entry['rows'] for entry in _manifest().values()) == len(rows)
+
+
+def test_date_filters_only_open_overlapping_partitions(partitioned):
+    rows = make_rows(300)
+    Code_Function.append_transactions(rows)
+    low, high = datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)
+    assert partitioned._keys_between(low.toordinal(), high.toordinal()) == ['2024-01']
+    # Pruning goes by the dates actually stored: January holds only the 5th and 6th.
+    assert partitioned._keys_between(datetime.date(2024, 1, 6).toordinal(), None) == ['2024-01', '2024-02']
+    assert partitioned._keys_between(datetime.date(2024, 1, 7).toordinal(), None) == ['2024-02']
+    assert partitioned._keys_between(None, datetime.date(2024, 1, 5).toordinal()) == ['2023-12', '2024-01']
+    assert partitioned._keys_between(None, None)[-1] == 'undated'
+
+    found = Code_Function.search_transactions(date_from=low, date_to=high)
+    expected = [
+        row['ID'] for row in rows
+        if (ordinal := Code_Function.records._parse_date_ordinal(row['Date']))
+        and low.toordinal() <= ordinal <= high.toordinal()
+    ]
+    assert sorted(row['ID'] for row in found) == sorted(expected)
+
+
+def test_stale_manifest_entries_are_recomputed(partitioned, restart):
+    rows = make_rows(200)
+    Code_Function.append_transactions(rows)
+    totals = Code_Function.get_summary_totals()
+
+    # A restart answers from the manifest without reading any partition.
+    restart()
+    assert Code_Function.get_summary_totals() == totals
+    assert all(ledger._signature is None for ledger in Code_Function._ledgers.values()
+               if isinstance(ledger, CsvLedger))
+
+    # A partition changed behind the manifest's back is read again.
+    extra = make_rows(1, seed=9)[0]
+    extra.update(Date='2024-02-29', Amount='5.00', Category='Rent')
+    restart()
+    Code_Function.get_ledger(os.path.join(Code_Function.PARTITION_DIR, '2024-02.csv')).append([extra])
+    restart()
+    assert _totals() == _flat_totals(rows + [extra])
+
+    # So is one whose file is gone.
+    os.remove(os.path.join(Code_Function.PARTITION_DIR, '2023-12.csv'))
+    restart()
+    kept = [row for row in rows + [extra] if not row['Date'].startswith('2023-12')]
+    assert _totals() == _flat_totals(kept)
+    assert '2023-12' not in _manifest()
+
+
+def test_update_moves_row_to_its_new_partition(partitioned, restart):
+    rows = make_rows(100)
+    Code_Function.append_transactions(rows)
+    moved = next(row for row in rows if row['Date'] == '2023-12-31')
+    Code_Function.update_transaction_by_id(moved['ID'], NEW_ROW)
+
+    january = Code_Function.get_ledger(os.path.join(Code_Function.PARTITION_DIR, '2024-01.csv'))
+    december = Code_Function.get_ledger(os.path.join(Code_Function.PARTITION_DIR, '2023-12.csv'))
+    assert january.contains(moved['ID']) and not december.contains(moved['ID'])
+    expected = sorted((row if row is not moved else {**NEW_ROW, 'ID': moved['ID']} for row in rows),
+                      key=lambda row: row['ID'])
+    assert _rows() == expected
+    restart()
+    assert _rows() == expected
+    assert _totals() == _flat_totals(expected)
+
+
+def test_batch_commits_together_and_rolls_back(partitioned, restart):
+    rows = make_rows(100)
+    Code_Function.append_transactions(rows)
+    with Code_Function.batch():
+        Code_Function.delete_transaction_by_id(rows[0]['ID'])
+        Code_Function.delete_transaction_by_id(rows[1]['ID'])
+        new_id = Code_Function.append_transaction(NEW_ROW)
+    expected = sorted(rows[2:] + [{**NEW_ROW, 'ID': new_id}], key=lambda row: row['ID'])
+    assert _rows() == expected
+    assert sum(entry['rows'] for entry in _manifest().values()) == len(expected)
+
+    totals = _totals()
+    with pytest.raises(RuntimeError):
+        with Code_Function.batch():
+            Code_Function.delete_transaction_by_id(rows[2]['ID'])
+            Code_Function.update_transaction_by_id(rows[3]['ID'], NEW_ROW)
+            Code_Function.append_transaction(NEW_ROW)
+            raise RuntimeError('boom')
+    assert _rows() == expected
+    assert _totals() == totals
+    restart()
+    assert _rows() == expected
+    assert _totals() == totals
@@ -0,0 +1,118 @@
+"""Searches answered from the description index must match a plain scan of the rows."""
+import datetime
+import importlib.util
+
+import pytest
+
+import Code_Function
+from ledger import config
+from ledger.index import _TOKEN_RE
+from conftest import make_rows, stored_rows, write_ledger
+
+KEYWORDS = ['', 'k', 'KO', 'kop', 'kopi o', 'sup', 'rent, m', '"dune"', 'café', 'i̇stanbul', 'STRASSE',
+            'straße', ' 1', '12', '999', 'no such text', 'x 1', ',', 'é', 'e ']
+
+
+def _scan(rows, keyword='', category=''):
+    return [
+        row['ID'] for row in rows
+        if keyword.lower() in row['Description'].lower()
+        and (not category or row['Category'].lower() == category.lower())
+    ]
+
+
+def _ids(rows):
+    return [row['ID'] for row in rows]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def engine(request, monkeypatch):
+    if request.param and importlib.util.find_spec('numpy') is None:
+        pytest.skip("NumPy is not installed")
+    monkeypatch.setattr(config, 'USE_NUMPY', request.param)
+
+
+@pytest.fixture(params=[True, False], ids=['indexed', 'scan'])
+def indexed(request):
+    return request.param
+
+
+def _load(rows, indexed):
+    write_ledger(rows)
+    if indexed:
+        Code_Function.prepare_search()
+    return stored_rows()
+
+
+def test_keyword_search_matches_scan(ledger_dir, engine, indexed):
+    rows = _load(make_rows(3000), indexed)
+    for keyword in KEYWORDS:
+        assert _ids(Code_Function.search_transactions(keyword=keyword)) == _scan(rows, keyword), keyword
+        for category in ('food', 'Café'):
+            found = Code_Function.search_transactions(keyword=keyword, category=category)
+            assert _ids(found) == _scan(rows, keyword, category), (keyword, category)
+
+
+def test_filters_match_streaming_scan(ledger_dir, engine):
+    write_ledger(make_rows(3000))
+    date_from, date_to = datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)
+    for keyword in KEYWORDS:
+        for query in ({}, {'date_from': date_from, 'date_to': date_to}, {'trans_type': 'Income'},
+                      {'filter_date': datetime.date(2024, 1, 6), 'category': 'rent'}):
+            found = Code_Function.search_transactions(keyword=keyword, **query)
+            # With a source the same filters run as one pass over every row.
+            # Date ranges come back in date order, so only the rows found are compared.
+            scanned = Code_Function.search_transactions(keyword=keyword, source=Code_Function.CSV_FILE, **query)
+            assert sorted(_ids(found)) == sorted(_ids(scanned)), (keyword, query)
+
+
+def test_index_follows_edits(ledger_dir):
+    rows = make_rows(2000)
+    write_ledger(rows)
+    Code_Function.prepare_search()
+    for number in range(0, 2000, 7):
+        Code_Function.delete_transaction_by_id(rows[number]['ID'])
+    for number in range(1, 2000, 11):
+        if number % 7 == 0:
+            continue
+        Code_Function.update_transaction_by_id(rows[number]['ID'], {**rows[number], 'Description': 'Kopi renamed'})
+    for row in make_rows(300, seed=1):
+        Code_Function.append_transaction(row)
+    rows = stored_rows()
+    for keyword in KEYWORDS + ['renamed', 'kopi r']:
+        assert _ids(Code_Function.search_transactions(keyword=keyword)) == _scan(rows, keyword), keyword
+
+
+def test_search_does_not_build_index(ledger_dir):
+    write_ledger(make_rows(300))
+    Code_Function.search_transactions(keyword='kopi')
+    Code_Function.search_description_terms('kopi')
+    assert Code_Function.get_transactions().store.ready_index() is None
+    Code_Function.prepare_search()
+    store = Code_Function.get_transactions().store
+    assert store.ready_index() is not None
+    # A search during a build scans instead of waiting for it.
+    with store._index_lock:
+        assert _ids(Code_Function.search_transactions(keyword='kopi')) == _scan(stored_rows(), 'kopi')
+
+
+def test_refine_matches_fresh_search(ledger_dir, indexed):
+    _load(make_rows(3000), indexed)
+    earlier = Code_Function.search_transactions(keyword='k')
+    for keyword in ('ko', 'kop', 'kopi o 1'):
+        refined = Code_Function.refine_search(earlier, keyword=keyword, category='FOOD')
+        assert _ids(refined) == _ids(Code_Function.search_transactions(keyword=keyword, category='food'))
+
+
+def test_word_search_matches_scan(ledger_dir, indexed):
+    rows = _load(make_rows(3000), indexed)
+    for query in ('gro sup', 'kopi', 'k', 'nasi lemak 1', 'caf', 'straße', 'rent march'):
+        terms = query.lower().split()
+        for prefix in (True, False):
+            expected = [
+                row['ID'] for row in rows
+                if all(any(word == term or prefix and word.startswith(term)
+                           for word in _TOKEN_RE.findall(row['Description'].lower()))
+                       for term in terms)
+            ]
+            assert _ids(Code_Function.search_description_terms(query, prefix)) == expected, (query, prefix)
@@ -0,0 +1,31 @@
+"""Every caller asking for the same ledger path must get the same open ledger, even from several threads at once."""
+import threading
+import time
+
+from ledger import backend
+
+
+class SlowLedger(backend.LedgerBackend):
+    opened = 0
+
+    def __init__(self, path):
+        time.sleep(0.01)  # long enough for the other threads to reach the registry
+        type(self).opened += 1
+        self.path = path
+
+
+def test_threads_share_one_ledger(ledger_dir):
+    start = threading.Barrier(8)
+    found = []
+
+    def open_ledger():
+        start.wait()
+        found.append(backend.shared_ledger(SlowLedger, 'racy.csv'))
+
+    threads = [threading.Thread(target=open_ledger) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SlowLedger.opened == 1
+    assert len(found) == 8 and all(ledger is found[0] for ledger in found)
@@ -0,0 +1,82 @@
+"""The binary snapshot must restore exactly what parsing the CSV gives."""
+import os
+
+import pytest
+
+import Code_Function
+from conftest import make_rows, stored_rows, write_ledger
+
+
+def _snapshot_now():
+    """Loads the ledger and writes its snapshot without waiting for the timer."""
+    Code_Function.get_transactions()
+    ledger = Code_Function.get_ledger()
+    ledger.flush_snapshot()
+    assert os.path.exists(ledger.snapshot_path)
+
+
+@pytest.mark.parametrize('ids', ['generated', 'custom'])
+def test_round_trip(ledger_dir, restart, ids):
+    rows = make_rows(500)
+    if ids == 'custom':
+        # Not 32 hex digits, so they can't be stored packed
+        for number, row in enumerate(rows):
+            row['ID'] = f"row-{number}" if number % 2 else 'ABCDEF' * number
+        rows[0]['ID'] = 'Z'
+    write_ledger(rows)
+    parsed = stored_rows()
+    totals = Code_Function.get_summary_totals()
+    _snapshot_now()
+
+    restart()
+    assert Code_Function.get_ledger()._restore_snapshot()
+    restart()
+    assert stored_rows() == parsed == rows
+    assert Code_Function.get_summary_totals() == totals
+    assert Code_Function.verify_summary_cache()
+    found = [row['ID'] for row in Code_Function.search_transactions(keyword='kopi')]
+    assert found == [row['ID'] for row in rows if 'kopi' in row['Description'].lower()]
+
+
+def test_edits_after_restore(ledger_dir, restart):
+    write_ledger(make_rows(200))
+    _snapshot_now()
+    restart()
+    new_id = Code_Function.append_transaction(
+        {'Date': '2024-03-01', 'Type': 'Income', 'Description': 'Pay', 'Category': 'Salary', 'Amount': '10.00'})
+    first = stored_rows()[0]['ID']
+    Code_Function.delete_transaction_by_id(first)
+    expected = stored_rows()
+    Code_Function.compact_transactions()
+    _snapshot_now()
+
+    restart()
+    assert stored_rows() == expected
+    assert expected[-1]['ID'] == new_id and first not in {row['ID'] for row in expected}
+
+
+def test_stale_snapshot_is_ignored(ledger_dir, restart):
+    rows = make_rows(50)
+    write_ledger(rows)
+    _snapshot_now()
+    restart()
+
+    # Another program edits the CSV: same size, different text
+    with open(Code_Function.CSV_FILE, 'r+b') as csvfile:
+        data = csvfile.read()
+        at = data.rindex(rows[-1]['ID'].encode())
+        csvfile.seek(at)
+        csvfile.write(b'f' * len(rows[-1]['ID']))
+    rows[-1]['ID'] = 'f' * len(rows[-1]['ID'])
+    assert not Code_Function.get_ledger()._restore_snapshot()
+    assert stored_rows() == rows
+
+
+def test_unreadable_snapshot_falls_back_to_parsing(ledger_dir, restart):
+    rows = make_rows(50)
+    write_ledger(rows)
+    _snapshot_now()
+    restart()
+    with open(Code_Function.get_ledger().snapshot_path, 'r+b') as snapshot:
+        snapshot.truncate(100)
+    assert stored_rows() == rows
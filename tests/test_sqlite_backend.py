@@ -0,0 +1,81 @@
+"""A database from before type_key and amount_units must upgrade on open and then answer like the CSV ledger."""
+import sqlite3
+
+import pytest
+
+import Code_Function
+from ledger import config
+from ledger.csv_backend import CsvLedger
+from conftest import make_rows, write_ledger
+
+# The transactions table as the first release created it.
+OLD_SCHEMA = """
+CREATE TABLE transactions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    date TEXT,
+    type TEXT,
+    description TEXT,
+    category TEXT,
+    amount TEXT,
+    date_ordinal INTEGER,
+    category_key TEXT
+);
+CREATE INDEX idx_transactions_date ON transactions(date_ordinal);
+CREATE INDEX idx_transactions_category ON transactions(category_key);
+CREATE INDEX idx_transactions_type ON transactions(type);
+"""
+
+
+def _write_old_database(path, rows):
+    with sqlite3.connect(path) as conn:
+        conn.executescript(OLD_SCHEMA)
+        conn.executemany(
+            "INSERT INTO transactions (date, type, description, category, amount, date_ordinal, category_key, id) "
+            "VALUES (?, ?, ?, ?, ?, NULL, ?, ?)",
+            [(row['Date'], row['Type'], row['Description'], row['Category'], row['Amount'],
+              row['Category'].lower(), row['ID']) for row in rows],
+        )
+    conn.close()
+
+
+def _columns(path):
+    with sqlite3.connect(path) as conn:
+        columns = {info[1] for info in conn.execute("PRAGMA table_info(transactions)")}
+        indexes = {info[1] for info in conn.execute("PRAGMA index_list(transactions)")}
+    conn.close()
+    return columns, indexes
+
+
+@pytest.fixture
+def old_database(ledger_dir, monkeypatch):
+    monkeypatch.setattr(Code_Function, 'STORAGE_BACKEND', 'sqlite')
+    rows = make_rows(200)
+    rows[0]['Type'] = 'INCOME'  # stored case differs from what filters ask for
+    _write_old_database(Code_Function.SQLITE_FILE, rows)
+    return rows
+
+
+def test_old_database_gains_new_columns(old_database):
+    rows = old_database
+    ledger = Code_Function.get_sqlite_ledger()
+    columns, indexes = _columns(Code_Function.SQLITE_FILE)
+    assert {'type_key', 'amount_units'} <= columns
+    assert 'idx_transactions_type' not in indexes and 'idx_transactions_type_key' in indexes
+    assert [dict(row) for row in ledger.transactions()] == rows
+
+    write_ledger(rows, 'flat.csv')
+    assert ledger.summary_totals() == CsvLedger('flat.csv').summary_totals()
+    assert ledger.check_summary_totals()
+    incomes = Code_Function.search_transactions(trans_type='Income')
+    assert sorted(row['ID'] for row in incomes) == sorted(
+        row['ID'] for row in rows if row['Type'].lower() == 'income'
+    )
+    assert rows[0]['ID'] in {row['ID'] for row in incomes}
+
+
+def test_read_only_refuses_old_database(old_database, monkeypatch):
+    monkeypatch.setattr(config, 'READ_ONLY', True)
+    with pytest.raises(ValueError, match='older version'):
+        Code_Function.get_sqlite_ledger()
+    assert not {'type_key', 'amount_units'} & _columns(Code_Function.SQLITE_FILE)[0]
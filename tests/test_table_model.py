@@ -0,0 +1,79 @@
+"""The table model's cached sort orders must stay what a fresh sort would give as rows are inserted and removed."""
+import os
+import random
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtCore = pytest.importorskip('PyQt6.QtCore')
+
+import Code_Function  # noqa: E402
+from GUI import TransactionTableModel  # noqa: E402
+from conftest import make_rows  # noqa: E402
+
+ASCENDING = QtCore.Qt.SortOrder.AscendingOrder
+DESCENDING = QtCore.Qt.SortOrder.DescendingOrder
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+def _keys(model, column):
+    field = Code_Function.FIELDNAMES[column]
+    return Code_Function.sort_keys(list(model._rows) + model._added, field)
+
+
+def _check(model, shown):
+    """Compares every cached column and the view with a sort of the rows in `shown` from scratch."""
+    for column, (keys, order) in model._columns.items():
+        assert keys == _keys(model, column)
+        assert order == sorted(shown, key=lambda n: (keys[n], n))
+    columns, descending = model.sort_key()
+    keys = [_keys(model, column) for column in columns]
+    expected = sorted(shown, key=lambda n: (tuple(column[n] for column in keys), n))
+    if descending:
+        expected.reverse()
+    assert model.rowCount() == len(shown)
+    assert [model.transaction_id(row) for row in range(model.rowCount())] == [
+        model._row(n)[Code_Function.ID_FIELD] for n in expected
+    ]
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_edits_keep_sort_orders(app, seed):
+    rng = random.Random(seed)
+    rows = make_rows(200, seed=seed)
+    model = TransactionTableModel()
+    model.set_transactions(rows)
+    shown = set(range(len(rows)))
+    for step in range(60):
+        action = rng.random()
+        if action < 0.2:
+            model.sort(rng.randrange(len(Code_Function.FIELDNAMES)), rng.choice([ASCENDING, DESCENDING]))
+        elif action < 0.6:
+            transaction = make_rows(1, seed=1000 * seed + step)[0]
+            row = model.insert_transaction(transaction)
+            assert model.transaction_id(row) == transaction[Code_Function.ID_FIELD]
+            shown.add(len(rows) + len(model._added) - 1)
+        else:
+            view_rows = rng.sample(range(model.rowCount()), rng.randint(1, 5))
+            numbers = {model._order[model._order_index(row)] for row in view_rows}
+            model.remove_rows(view_rows)
+            shown -= numbers
+        _check(model, shown)
+
+
+def test_column_skips_removed_rows(app):
+    rows = make_rows(50)
+    model = TransactionTableModel()
+    model.set_transactions(rows)
+    model.remove_rows([0, 3, 4])
+    model.insert_transaction(make_rows(1, seed=7)[0])
+    # A column first sorted on after the edits is computed without the removed rows
+    assert not model._columns.keys() - {0}
+    model.sort(4)
+    model.sort(2, DESCENDING)
+    assert {2, 4} <= model._columns.keys()
+    _check(model, set(range(51)) - model._removed)